@@ -1,6 +1,7 @@
 """Telegram bot using polling for local development."""
 from __future__ import annotations
 
+import asyncio
 import os
 import logging
 from datetime import datetime, timedelta, timezone
@@ -8,33 +9,34 @@ from datetime import datetime, timedelta, timezone
 import jwt
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-from config.settings import JWT_SECRET, APP_URL
+from config.settings import JWT_SECRET, APP_URL, DISPATCH_MAX_CONCURRENT, DISPATCH_MAX_PENDING, UPDATE_QUEUE_SIZE
 from services.claude_service import extract_log
-from services.supabase_service import create_pending_log, confirm_log, delete_pending_log, get_client
+from services.dispatcher import LaneDispatcher, LaneUpdateProcessor
+from services.supabase_service import (
+    confirm_batch,
+    confirm_log,
+    create_pending_batch,
+    create_pending_log,
+    delete_pending_batch,
+    delete_pending_log,
+    execute,
+    get_client,
+    get_pending_batch,
+    get_user_profile,
+    set_pending_message_id,
+    set_symptoms_mode,
+    upsert_user,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("nutriclaude.bot")
 
 
-def _upsert_user(telegram_id: str, display_name: str) -> None:
-    """Create or update user in users table."""
-    client = get_client()
-    existing = client.table("users").select("id").eq("telegram_id", telegram_id).execute()
-    if not existing.data:
-        client.table("users").insert({
-            "telegram_id": telegram_id,
-            "display_name": display_name,
-        }).execute()
-    elif display_name:
-        client.table("users").update({
-            "display_name": display_name,
-        }).eq("telegram_id", telegram_id).execute()
-
-
 def format_confirmation(log_type: str, data: dict) -> str:
     """Format a confirmation message based on log type."""
     if log_type == "meal":
@@ -82,7 +84,7 @@ async def start_command(update: Update, context) -> None:
     telegram_id = str(user.id)
     display_name = user.full_name or user.username or ""
 
-    _upsert_user(telegram_id, display_name)
+    await upsert_user(telegram_id, display_name)
 
     await update.message.reply_text(
         f"Welcome to Nutriclaude, {display_name}!\n\n"
@@ -102,7 +104,7 @@ async def login_command(update: Update, context) -> None:
     telegram_id = str(user.id)
     display_name = user.full_name or user.username or ""
 
-    _upsert_user(telegram_id, display_name)
+    await upsert_user(telegram_id, display_name)
 
     # Generate magic link JWT (5 min expiry)
     token_payload = {
@@ -122,13 +124,12 @@ async def login_command(update: Update, context) -> None:
 async def symptoms_command(update: Update, context) -> None:
     """Toggle symptoms tracking mode on/off."""
     user_id = str(update.effective_user.id)
-    client = get_client()
 
-    row = client.table("users").select("symptoms_mode").eq("telegram_id", user_id).execute()
-    current = row.data[0].get("symptoms_mode", False) if row.data else False
+    profile = await get_user_profile(user_id)
+    current = profile["symptoms_mode"] if profile else False
     new_val = not current
 
-    client.table("users").update({"symptoms_mode": new_val}).eq("telegram_id", user_id).execute()
+    await set_symptoms_mode(user_id, new_val)
 
     status = "enabled" if new_val else "disabled"
     await update.message.reply_text(f"Symptom tracking {status}.")
@@ -140,51 +141,99 @@ async def handle_message(update: Update, context) -> None:
     chat_id = str(update.effective_chat.id)
 
     message_text = update.message.text
-    await update.message.reply_text("Processing...")
+    processing = await update.message.reply_text("Processing...")
 
     # Check if user has symptoms_mode enabled
-    client = get_client()
-    user_row = client.table("users").select("symptoms_mode").eq("telegram_id", user_id).execute()
-    symptoms_mode = user_row.data[0].get("symptoms_mode", False) if user_row.data else False
+    profile = await get_user_profile(user_id)
+    symptoms_mode = profile["symptoms_mode"] if profile else False
+
+    # Show each entry in the "Processing..." message as soon as Claude has
+    # streamed it; the buttons are added once the extraction is complete.
+    previews = []
+
+    async def show_entry(log, data: dict) -> None:
+        previews.append(f"{len(previews) + 1}. {format_confirmation(log.type, data)}")
+        try:
+            await processing.edit_text("Processing...\n\n" + "\n\n".join(previews))
+        except TelegramError as e:
+            logger.warning(f"Could not update processing message: {e}")
 
     # Send to Claude
-    success, logs, raw_dicts, error = await extract_log(message_text, symptoms_mode=symptoms_mode)
+    success, logs, raw_dicts, error = await extract_log(
+        message_text, symptoms_mode=symptoms_mode, user_id=user_id, on_entry=show_entry,
+    )
 
     if not success:
-        await update.message.reply_text(f"Error: {error}")
+        await processing.edit_text(f"Error: {error}")
         return
 
     # Filter out unknown types
     valid = [(log, data) for log, data in zip(logs, raw_dicts) if log.type != "unknown"]
 
     if not valid:
-        await update.message.reply_text(
+        await processing.edit_text(
             "I couldn't classify that as a meal, workout, weight, or wellness entry. "
             "Try rephrasing."
         )
         return
 
-    # Send a confirmation message for each entry
-    for log, data in valid:
-        pending = create_pending_log(
+    # Some entries stayed invalid after the repair attempt and were dropped
+    note = f"\n\nNote: {error}" if error else ""
+
+    if len(valid) == 1:
+        log, data = valid[0]
+        pending = await create_pending_log(
             user_id=user_id,
             telegram_chat_id=chat_id,
             log_type=log.type,
             payload=data,
         )
-        pending_id = pending["id"]
+        confirmation_text = _entry_confirmation_text(log.type, data, note)
+        await processing.edit_text(confirmation_text, reply_markup=_entry_keyboard(pending["id"]))
+        await set_pending_message_id(processing.message_id, confirmation_text, ids=[pending["id"]])
+        return
+
+    # Several entries: one insert, one grouped message
+    batch_id, _ = await create_pending_batch(
+        user_id, chat_id, [(log.type, data) for log, data in valid],
+    )
+    sections = [
+        f"{i}. {format_confirmation(log.type, data)}"
+        for i, (log, data) in enumerate(valid, 1)
+    ]
+    confirmation_text = f"{len(valid)} entries detected:\n\n" + "\n\n".join(sections)
+    confirmation_text += note + "\n\nSave all?"
+
+    keyboard = InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("Confirm all", callback_data=f"confirm_batch:{batch_id}"),
+            InlineKeyboardButton("Pick", callback_data=f"pick:{batch_id}"),
+            InlineKeyboardButton("Discard all", callback_data=f"reject_batch:{batch_id}"),
+        ]
+    ])
+
+    await processing.edit_text(confirmation_text, reply_markup=keyboard)
+    await set_pending_message_id(processing.message_id, confirmation_text, batch_id=batch_id)
+
+
+def _entry_confirmation_text(log_type: str, data: dict, note: str = "") -> str:
+    return format_confirmation(log_type, data) + note + "\n\nConfirm save?"
+
 
-        confirmation_text = format_confirmation(log.type, data)
-        confirmation_text += "\n\nConfirm save?"
+def _entry_keyboard(pending_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("Yes", callback_data=f"confirm:{pending_id}"),
+            InlineKeyboardButton("No", callback_data=f"reject:{pending_id}"),
+        ]
+    ])
 
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton("Yes", callback_data=f"confirm:{pending_id}"),
-                InlineKeyboardButton("No", callback_data=f"reject:{pending_id}"),
-            ]
-        ])
 
-        await update.message.reply_text(confirmation_text, reply_markup=keyboard)
+async def _send_entry_confirmation(message, pending_id: str, log_type: str, data: dict) -> None:
+    """Reply with one entry and its Yes/No buttons."""
+    text = _entry_confirmation_text(log_type, data)
+    sent = await message.reply_text(text, reply_markup=_entry_keyboard(pending_id))
+    await set_pending_message_id(sent.message_id, text, ids=[pending_id])
 
 
 async def feedback_command(update: Update, context) -> None:
@@ -199,30 +248,74 @@ async def feedback_command(update: Update, context) -> None:
 
     user_id = str(update.effective_user.id)
     client = get_client()
-    client.table("feedback").insert({
+    await execute(client.table("feedback").insert({
         "user_id": user_id,
         "message": message,
-    }).execute()
+    }))
 
     await update.message.reply_text("Thanks for the feedback!")
 
 
 async def handle_callback(update: Update, context) -> None:
-    """Handle Yes/No button presses."""
+    """Handle Yes/No and batch Confirm all/Pick/Discard all button presses."""
     query = update.callback_query
     await query.answer()
 
     action, pending_id = query.data.split(":", 1)
 
     if action == "confirm":
-        result = confirm_log(pending_id)
+        result = await confirm_log(pending_id)
         if result:
             await query.edit_message_text(query.message.text + "\n\nSaved!")
         else:
             await query.edit_message_text(query.message.text + "\n\nEntry not found or already processed.")
     elif action == "reject":
-        delete_pending_log(pending_id)
+        await delete_pending_log(pending_id)
         await query.edit_message_text(query.message.text + "\n\nDiscarded.")
+    elif action == "confirm_batch":
+        saved = await confirm_batch(pending_id)
+        if saved:
+            await query.edit_message_text(query.message.text + f"\n\nSaved {len(saved)} entries!")
+        else:
+            await query.edit_message_text(query.message.text + "\n\nEntries not found or already processed.")
+    elif action == "reject_batch":
+        await delete_pending_batch(pending_id)
+        await query.edit_message_text(query.message.text + "\n\nDiscarded.")
+    elif action == "pick":
+        # Fall back to per-entry Yes/No for whatever is left in the batch
+        pendings = await get_pending_batch(pending_id)
+        if not pendings:
+            await query.edit_message_text(query.message.text + "\n\nEntries not found or already processed.")
+            return
+        await query.edit_message_text(query.message.text + "\n\nConfirm each entry below.")
+        for pending in pendings:
+            await _send_entry_confirmation(query.message, pending["id"], pending["type"], pending["payload"])
+
+
+def build_application(token: str, dispatcher: LaneDispatcher, polling: bool = True) -> Application:
+    """Build the bot application with all handlers registered.
+
+    Updates are processed through `dispatcher`, which keeps each user's
+    messages in order while running different users concurrently. When
+    polling, at most UPDATE_QUEUE_SIZE fetched updates wait for the
+    dispatcher; beyond that the Updater stops fetching (see
+    LaneUpdateProcessor). Webhook deployments pass polling=False so no
+    Updater is created.
+    """
+    builder = Application.builder().token(token).concurrent_updates(LaneUpdateProcessor(dispatcher))
+    if polling:
+        builder = builder.update_queue(asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE))
+    else:
+        builder = builder.updater(None)
+    app = builder.build()
+
+    app.add_handler(CommandHandler("start", start_command))
+    app.add_handler(CommandHandler("login", login_command))
+    app.add_handler(CommandHandler("feedback", feedback_command))
+    app.add_handler(CommandHandler("symptoms", symptoms_command))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    app.add_handler(CallbackQueryHandler(handle_callback))
+    return app
 
 
 def main():
@@ -232,14 +325,7 @@ def main():
         logger.error("TELEGRAM_BOT_TOKEN not set")
         return
 
-    app = Application.builder().token(token).build()
-
-    app.add_handler(CommandHandler("start", start_command))
-    app.add_handler(CommandHandler("login", login_command))
-    app.add_handler(CommandHandler("feedback", feedback_command))
-    app.add_handler(CommandHandler("symptoms", symptoms_command))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-    app.add_handler(CallbackQueryHandler(handle_callback))
+    app = build_application(token, LaneDispatcher(DISPATCH_MAX_CONCURRENT, DISPATCH_MAX_PENDING))
 
     logger.info("Bot starting with polling...")
     app.run_polling()
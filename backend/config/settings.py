@@ -10,3 +10,70 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
 JWT_SECRET = os.getenv("JWT_SECRET", "")
 APP_URL = os.getenv("APP_URL", "http://localhost:5173")
+
+# Claude client tuning
+ANTHROPIC_TIMEOUT_SECONDS = float(os.getenv("ANTHROPIC_TIMEOUT_SECONDS", "30"))
+ANTHROPIC_MAX_RETRIES = int(os.getenv("ANTHROPIC_MAX_RETRIES", "2"))
+ANTHROPIC_MAX_CONCURRENCY = int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", "8"))
+
+# Size of the thread pool that runs blocking Supabase queries
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", "16"))
+
+# Per-user dashboard query cache
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+DASHBOARD_CACHE_MAXSIZE = int(os.getenv("DASHBOARD_CACHE_MAXSIZE", "4096"))
+
+# Normalized-message -> extraction cache (set EXTRACTION_CACHE_PATH to persist to SQLite)
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "10000"))
+EXTRACTION_CACHE_TTL_SECONDS = float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", "")
+
+# Uvicorn worker processes (the Dockerfile passes it to --workers). With
+# more than one, cache invalidations, token revocations and webhook updates
+# go through Postgres (see "Running several workers" in archtecture.md).
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# How often each worker process applies other processes' cache
+# invalidations and token revocations; the interval doubles while nothing
+# changes, up to the max. Not polled with a single worker.
+SHARED_STATE_POLL_SECONDS = float(os.getenv("SHARED_STATE_POLL_SECONDS", "1"))
+SHARED_STATE_MAX_POLL_SECONDS = float(os.getenv("SHARED_STATE_MAX_POLL_SECONDS", "5"))
+
+# Telegram update ingestion: "polling" (one elected process polls) or
+# "webhook". The "memory" queue backend is only for a single worker process;
+# "postgres" keeps each user's updates in order across all of them, and is
+# the default with several. An idle postgres queue polls every
+# UPDATE_QUEUE_POLL_SECONDS, doubling up to the max while the table is empty.
+# When polling, UPDATE_QUEUE_SIZE bounds the fetched updates waiting for the
+# dispatcher; once it is full, getUpdates waits.
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling")
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+UPDATE_QUEUE_BACKEND = os.getenv("UPDATE_QUEUE_BACKEND", "postgres" if WEB_CONCURRENCY > 1 else "memory")
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+UPDATE_QUEUE_LEASE_SECONDS = float(os.getenv("UPDATE_QUEUE_LEASE_SECONDS", "60"))
+UPDATE_QUEUE_POLL_SECONDS = float(os.getenv("UPDATE_QUEUE_POLL_SECONDS", "0.5"))
+UPDATE_QUEUE_MAX_POLL_SECONDS = float(os.getenv("UPDATE_QUEUE_MAX_POLL_SECONDS", "2"))
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "8"))
+POLLING_LEASE_SECONDS = float(os.getenv("POLLING_LEASE_SECONDS", "30"))
+
+# Per-user ordered, cross-user parallel update processing
+DISPATCH_MAX_CONCURRENT = int(os.getenv("DISPATCH_MAX_CONCURRENT", "16"))
+DISPATCH_MAX_PENDING = int(os.getenv("DISPATCH_MAX_PENDING", "1000"))
+
+# Cached users rows (symptoms_mode, display_name) read on every message
+USER_PROFILE_CACHE_TTL_SECONDS = float(os.getenv("USER_PROFILE_CACHE_TTL_SECONDS", "300"))
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+
+# Background expiry of pending_logs whose confirm buttons were never tapped
+PENDING_LOG_TTL_SECONDS = float(os.getenv("PENDING_LOG_TTL_SECONDS", str(24 * 3600)))
+PENDING_REAPER_INTERVAL_SECONDS = float(os.getenv("PENDING_REAPER_INTERVAL_SECONDS", "600"))
+PENDING_REAPER_BATCH_SIZE = int(os.getenv("PENDING_REAPER_BATCH_SIZE", "500"))
+PENDING_REAPER_EDIT_MESSAGES = os.getenv("PENDING_REAPER_EDIT_MESSAGES", "true").lower() == "true"
+
+# Verified session tokens kept until their exp so repeat requests skip jwt.decode
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# Optional micro-batching of concurrent Claude extractions (1 = off)
+EXTRACTION_BATCH_SIZE = int(os.getenv("EXTRACTION_BATCH_SIZE", "1"))
+EXTRACTION_BATCH_WAIT_MS = float(os.getenv("EXTRACTION_BATCH_WAIT_MS", "50"))
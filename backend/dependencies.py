@@ -1,16 +1,84 @@
+import hashlib
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
 import jwt
+from cachetools import TLRUCache
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
-from config.settings import JWT_SECRET
+from config.settings import AUTH_CACHE_SIZE, JWT_SECRET
 
 security = HTTPBearer()
 
 
+def _until_exp(key, value, now) -> float:
+    return value[1]
+
+
+# sha256(token) -> (user, exp). Entries expire exactly when the token does,
+# so a cached token is never honoured past its exp.
+_verified: TLRUCache = TLRUCache(maxsize=AUTH_CACHE_SIZE, ttu=_until_exp, timer=time.time)
+
+# sha256(token) -> exp for revoked tokens. Deliberately not size-bounded:
+# evicting an entry would make its token valid again, so entries only leave
+# once the token has expired anyway. Revocations made by other worker
+# processes arrive through apply_revocation (see services/shared_state.py).
+_revoked: Dict[str, float] = {}
+_revoked_by_exp: List[Tuple[float, str]] = []
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _prune_revoked(now: float) -> None:
+    while _revoked_by_exp and _revoked_by_exp[0][0] <= now:
+        _, key = heapq.heappop(_revoked_by_exp)
+        _revoked.pop(key, None)
+
+
+def apply_revocation(key: str, exp: float) -> bool:
+    """Reject the token whose sha256 is `key` until `exp`; False if it already was."""
+    _prune_revoked(time.time())
+    _verified.pop(key, None)
+    if key in _revoked:
+        return False
+    _revoked[key] = exp
+    heapq.heappush(_revoked_by_exp, (exp, key))
+    return True
+
+
+def revoke_token(token: str) -> Optional[Tuple[str, float]]:
+    """Reject `token` from now on, even though its signature and exp are still valid.
+
+    Returns the (key, exp) to store so other processes revoke it too, or
+    None for a token that is invalid anyway.
+    """
+    try:
+        exp = jwt.decode(token, JWT_SECRET, algorithms=["HS256"]).get("exp")
+    except jwt.InvalidTokenError:
+        return None
+    key = _token_key(token)
+    # A token without exp stays revoked for good
+    exp = exp if exp is not None else float("inf")
+    apply_revocation(key, exp)
+    return key, exp
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> dict:
     """Extract and validate user from JWT Bearer token."""
+    key = _token_key(credentials.credentials)
+    if key in _revoked:
+        raise HTTPException(status_code=401, detail="Token revoked")
+
+    cached = _verified.get(key)
+    if cached is not None:
+        return dict(cached[0])
+
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
@@ -21,7 +89,11 @@ async def get_current_user(
     if payload.get("type") != "session":
         raise HTTPException(status_code=401, detail="Invalid token type")
 
-    return {
+    user = {
         "telegram_id": payload["telegram_id"],
         "display_name": payload.get("display_name", ""),
     }
+    # Tokens without exp are still accepted but never cached
+    if "exp" in payload:
+        _verified[key] = (user, payload["exp"])
+    return dict(user)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -11,43 +12,190 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from config.settings import (
+    ANTHROPIC_API_KEY,
+    DISPATCH_MAX_CONCURRENT,
+    DISPATCH_MAX_PENDING,
+    PENDING_LOG_TTL_SECONDS,
+    PENDING_REAPER_BATCH_SIZE,
+    PENDING_REAPER_EDIT_MESSAGES,
+    PENDING_REAPER_INTERVAL_SECONDS,
+    POLLING_LEASE_SECONDS,
+    SHARED_STATE_MAX_POLL_SECONDS,
+    SHARED_STATE_POLL_SECONDS,
+    TELEGRAM_MODE,
+    TELEGRAM_WEBHOOK_URL,
+    TELEGRAM_WEBHOOK_SECRET,
+    UPDATE_QUEUE_BACKEND,
+    UPDATE_QUEUE_SIZE,
+    UPDATE_WORKERS,
+    WEB_CONCURRENCY,
+)
+from dependencies import apply_revocation
 from routes.auth import router as auth_router
 from routes.telegram import router as telegram_router
 from routes.confirm import router as confirm_router
 from routes.dashboard import router as dashboard_router
 from routes.goals import router as goals_router
+from services.cache_service import get_cache_stats, invalidate_user_table
+from services.claude_service import (
+    count_prompt_prefix,
+    extraction_cache,
+    get_extraction_stats,
+    get_fast_path_stats,
+    get_usage_stats,
+)
+from services.dispatcher import LaneDispatcher, lane_key
+from services.leases import Lease, LeaseKeeper
+from services.pending_reaper import PendingLogReaper
+from services.shared_state import SharedStateSync
+from services.supabase_service import invalidate_user_profile
+from services.update_queue import UpdateWorkerPool, create_update_queue
 
 logger = logging.getLogger("nutriclaude")
 
 
+def apply_invalidation(user_id: str, table: str) -> None:
+    """Drop this process's cached reads after a write made by any process."""
+    if table == "users":
+        invalidate_user_profile(user_id)
+    else:
+        invalidate_user_table(user_id, table)
+
+
 @asynccontextmanager
 async def lifespan(app_instance: FastAPI):
-    """Start Telegram bot polling on startup, stop on shutdown."""
+    """Start the Telegram bot on startup, stop on shutdown.
+
+    Safe to run in several uvicorn worker processes at once (WEB_CONCURRENCY
+    > 1): state they have to agree on lives in Postgres (migration 009).
+    Each process tails the shared cache invalidations and revoked tokens. In
+    polling mode only the process holding the polling lease polls Telegram.
+    In webhook mode every process accepts updates on /api/log into the
+    shared queue and drains it with a pool of worker coroutines; the queue
+    hands out a user's updates one at a time, so per-user order holds across
+    processes. A single worker skips the tailing and the leases, and queues
+    updates in memory unless UPDATE_QUEUE_BACKEND says otherwise. A
+    background reaper expires pending logs that were never confirmed.
+    """
+    shared = WEB_CONCURRENCY > 1
+    shared_state = SharedStateSync(
+        SHARED_STATE_POLL_SECONDS, apply_invalidation, apply_revocation, SHARED_STATE_MAX_POLL_SECONDS,
+    )
+    # Revocations outlive restarts, so even a single worker loads them
+    await shared_state.load()
+    shared_state.start(tail=shared)
+    app_instance.state.shared_state = shared_state
+
+    # Logs whether the extraction prompt is long enough to be cached;
+    # startup doesn't wait for it
+    prefix_count = asyncio.create_task(count_prompt_prefix()) if ANTHROPIC_API_KEY else None
+
     token = os.getenv("TELEGRAM_BOT_TOKEN", "")
-    if token:
-        from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
-        from bot import start_command, login_command, feedback_command, symptoms_command, handle_message, handle_callback
-
-        bot_app = Application.builder().token(token).build()
-        bot_app.add_handler(CommandHandler("start", start_command))
-        bot_app.add_handler(CommandHandler("login", login_command))
-        bot_app.add_handler(CommandHandler("feedback", feedback_command))
-        bot_app.add_handler(CommandHandler("symptoms", symptoms_command))
-        bot_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-        bot_app.add_handler(CallbackQueryHandler(handle_callback))
-
-        await bot_app.initialize()
-        await bot_app.start()
-        await bot_app.updater.start_polling()
-        logger.info("Telegram bot started")
-        yield
-        await bot_app.updater.stop()
-        await bot_app.stop()
-        await bot_app.shutdown()
-        logger.info("Telegram bot stopped")
-    else:
+    if not token:
         logger.warning("TELEGRAM_BOT_TOKEN not set, bot disabled")
         yield
+        if prefix_count is not None:
+            prefix_count.cancel()
+        app_instance.state.shared_state = None
+        await shared_state.stop()
+        return
+
+    from telegram import Update
+    from bot import build_application
+
+    webhook = TELEGRAM_MODE == "webhook"
+    dispatcher = LaneDispatcher(DISPATCH_MAX_CONCURRENT, DISPATCH_MAX_PENDING)
+    app_instance.state.dispatcher = dispatcher
+    bot_app = build_application(token, dispatcher, polling=not webhook)
+    await bot_app.initialize()
+    await bot_app.start()
+
+    if webhook:
+        if not TELEGRAM_WEBHOOK_SECRET:
+            logger.warning("TELEGRAM_WEBHOOK_SECRET not set, /api/log will reject every update")
+
+        update_queue = create_update_queue(UPDATE_QUEUE_BACKEND, UPDATE_QUEUE_SIZE, DISPATCH_MAX_CONCURRENT)
+
+        async def run(data: dict, update: Update) -> None:
+            try:
+                await bot_app.process_update(update)
+            finally:
+                # Acknowledge only once processed, which releases the user's
+                # next update in the shared queue
+                await update_queue.done(data)
+
+        async def process(data: dict) -> None:
+            # Hand off to the user's lane and return; the worker only blocks
+            # when the dispatcher is at its pending limit.
+            try:
+                update = Update.de_json(data, bot_app.bot)
+            except Exception:
+                await update_queue.done(data)
+                raise
+            await dispatcher.submit(lane_key(update), run(data, update))
+
+        workers = UpdateWorkerPool(update_queue, process, UPDATE_WORKERS)
+        workers.start()
+        app_instance.state.update_queue = update_queue
+        if TELEGRAM_WEBHOOK_URL:
+            await bot_app.bot.set_webhook(
+                TELEGRAM_WEBHOOK_URL,
+                secret_token=TELEGRAM_WEBHOOK_SECRET or None,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        logger.info(f"Telegram bot started (webhook, {UPDATE_QUEUE_BACKEND} queue, {UPDATE_WORKERS} workers)")
+    else:
+        async def start_polling() -> None:
+            await bot_app.updater.start_polling()
+            logger.info("Telegram bot polling")
+
+        async def stop_polling() -> None:
+            if bot_app.updater.running:
+                await bot_app.updater.stop()
+
+        if shared:
+            poller = LeaseKeeper(Lease("telegram-polling", POLLING_LEASE_SECONDS), start_polling, stop_polling)
+            poller.start()
+            app_instance.state.poller = poller
+            logger.info("Telegram bot started (polling, while this process holds the polling lease)")
+        else:
+            await start_polling()
+            logger.info("Telegram bot started (polling)")
+
+    reaper = PendingLogReaper(
+        PENDING_LOG_TTL_SECONDS,
+        PENDING_REAPER_INTERVAL_SECONDS,
+        PENDING_REAPER_BATCH_SIZE,
+        bot=bot_app.bot if PENDING_REAPER_EDIT_MESSAGES else None,
+        # Outlives the interval, so the holder keeps it from pass to pass
+        lease=Lease("pending-reaper", 2 * PENDING_REAPER_INTERVAL_SECONDS) if shared else None,
+    )
+    reaper.start()
+    app_instance.state.pending_reaper = reaper
+
+    yield
+
+    app_instance.state.pending_reaper = None
+    await reaper.stop()
+    if webhook:
+        app_instance.state.update_queue = None
+        await workers.stop()
+    elif shared:
+        app_instance.state.poller = None
+        await poller.stop()
+    else:
+        await stop_polling()
+    await bot_app.stop()
+    await bot_app.shutdown()
+    if webhook:
+        await update_queue.close()
+    if prefix_count is not None:
+        prefix_count.cancel()
+    app_instance.state.dispatcher = None
+    app_instance.state.shared_state = None
+    await shared_state.stop()
+    logger.info("Telegram bot stopped")
 
 
 app = FastAPI(title="Nutriclaude", version="0.1.0", lifespan=lifespan)
@@ -69,7 +217,22 @@ app.include_router(goals_router, prefix="/api")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    dispatcher = getattr(app.state, "dispatcher", None)
+    reaper = getattr(app.state, "pending_reaper", None)
+    poller = getattr(app.state, "poller", None)
+    shared_state = getattr(app.state, "shared_state", None)
+    return {
+        "status": "ok",
+        "dashboard_cache": get_cache_stats(),
+        "claude_usage": get_usage_stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "fast_path": get_fast_path_stats(),
+        "extraction": get_extraction_stats(),
+        "dispatcher": dispatcher.stats() if dispatcher else None,
+        "pending_reaper": reaper.stats() if reaper else None,
+        "polling_leader": poller.leading if poller else None,
+        "shared_state": shared_state.stats() if shared_state else None,
+    }
 
 
 # Serve frontend static files (built with `npm run build` in frontend/)
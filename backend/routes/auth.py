@@ -2,11 +2,12 @@ import jwt
 from datetime import datetime, timedelta, timezone
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
 from config.settings import JWT_SECRET
-from dependencies import get_current_user
-from services.supabase_service import get_client
+from dependencies import get_current_user, revoke_token, security
+from services.supabase_service import store_revoked_token, upsert_user
 
 router = APIRouter(prefix="/auth")
 
@@ -31,20 +32,7 @@ async def verify_magic_link(body: TokenRequest):
     telegram_id = payload["telegram_id"]
     display_name = payload.get("display_name", "")
 
-    # Upsert user
-    client = get_client()
-    result = client.table("users").select("*").eq("telegram_id", telegram_id).execute()
-    if result.data:
-        user = result.data[0]
-        if display_name and user.get("display_name") != display_name:
-            client.table("users").update({"display_name": display_name}).eq("telegram_id", telegram_id).execute()
-            user["display_name"] = display_name
-    else:
-        insert_result = client.table("users").insert({
-            "telegram_id": telegram_id,
-            "display_name": display_name,
-        }).execute()
-        user = insert_result.data[0]
+    user = await upsert_user(telegram_id, display_name)
 
     # Issue session JWT (7 days)
     session_payload = {
@@ -68,3 +56,15 @@ async def verify_magic_link(body: TokenRequest):
 async def get_me(user: dict = Depends(get_current_user)):
     """Return current authenticated user info."""
     return {"user": user}
+
+
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user: dict = Depends(get_current_user),
+):
+    """Revoke the caller's session token so it stops working before its exp."""
+    revoked = revoke_token(credentials.credentials)
+    if revoked is not None:
+        await store_revoked_token(*revoked)
+    return {"status": "ok"}
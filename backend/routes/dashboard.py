@@ -1,5 +1,8 @@
+import asyncio
 import datetime as dt
+from typing import Optional
 
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
 
 from dependencies import get_current_user
@@ -7,65 +10,106 @@ from services.aggregation_service import (
     compute_kpis,
     compute_daily_meals,
     compute_calorie_balance,
+    compute_dashboard,
     fetch_bodyweight,
     fetch_wellness,
     fetch_workout_quality,
     fetch_workouts,
     fetch_daily,
     fetch_daily_exercises,
+    fetch_daily_workouts,
     get_logged_dates,
-    fetch_all_logs,
+    fetch_log_page,
     fetch_exercises,
     fetch_exercise_names,
     fetch_exercise_history,
     compute_exercise_prs,
+    compute_trends,
 )
+from services.cache_service import invalidate_user_table
 from services.claude_service import summarize_workout
-from services.supabase_service import get_client
+from services.supabase_service import execute, get_client
+from utils.helpers import SingleFlight
 
 router = APIRouter()
 
+# Summaries keyed by (user_id, date, workout_count): a new entry changes the
+# count and so the key, which makes a long TTL safe.
+_summary_cache: TTLCache = TTLCache(maxsize=2048, ttl=24 * 3600)
+_summary_flight = SingleFlight()
+
+
+def _weight_points(rows: list) -> list:
+    return [
+        {"date": row["timestamp"][:10], "weight_lbs": row["weight_lbs"]}
+        for row in rows
+    ]
+
+
+def _wellness_points(rows: list) -> list:
+    return [
+        {"date": row["timestamp"][:10], "symptom_score": row["symptom_score"], "symptom": row.get("symptom")}
+        for row in rows
+    ]
+
+
+def _performance_points(rows: list) -> list:
+    return [
+        {"date": row["timestamp"][:10], "performance_score": row["performance_score"]}
+        for row in rows
+    ]
+
+
+@router.get("/dashboard")
+async def get_dashboard(
+    range: str = Query("7d", pattern=r"^\d+d$"),
+    trend_range: str = Query("30d", pattern=r"^\d+d$"),
+    user: dict = Depends(get_current_user),
+):
+    """All dashboard panels in one response, computed from one fetch per table."""
+    data = await compute_dashboard(user["telegram_id"], range, trend_range)
+    return {
+        "kpis": data["kpis"],
+        "meals": data["meals"],
+        "calorie_balance": data["calorie_balance"],
+        "weight": _weight_points(data["weight"]),
+        "wellness": _wellness_points(data["wellness"]),
+        "performance": _performance_points(data["performance"]),
+        "dates": data["dates"],
+    }
+
 
 @router.get("/kpis")
 async def get_kpis(range: str = Query("7d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    return compute_kpis(user["telegram_id"], range)
+    return await compute_kpis(user["telegram_id"], range)
 
 
 @router.get("/meals")
 async def get_meals(range: str = Query("7d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    return compute_daily_meals(user["telegram_id"], range)
+    return await compute_daily_meals(user["telegram_id"], range)
 
 
 @router.get("/weight")
 async def get_weight(range: str = Query("30d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    data = fetch_bodyweight(user["telegram_id"], range)
-    return [
-        {"date": row["timestamp"][:10], "weight_lbs": row["weight_lbs"]}
-        for row in data
-    ]
+    data = await fetch_bodyweight(user["telegram_id"], range)
+    return _weight_points(data)
 
 
 @router.get("/wellness")
 async def get_wellness(range: str = Query("7d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    data = fetch_wellness(user["telegram_id"], range)
-    return [
-        {"date": row["timestamp"][:10], "symptom_score": row["symptom_score"], "symptom": row.get("symptom")}
-        for row in data
-    ]
+    data = await fetch_wellness(user["telegram_id"], range)
+    return _wellness_points(data)
 
 
 @router.get("/performance")
 async def get_performance(range: str = Query("7d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    data = fetch_workout_quality(user["telegram_id"], range)
-    return [
-        {"date": row["timestamp"][:10], "performance_score": row["performance_score"]}
-        for row in data
-    ]
+    data = await fetch_workout_quality(user["telegram_id"], range)
+    return _performance_points(data)
 
 
 @router.get("/workouts")
 async def get_workouts(range: str = Query("7d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    data = fetch_workouts(user["telegram_id"], range)
+    data = await fetch_workouts(user["telegram_id"], range)
     return [
         {
             "date": row["timestamp"][:10],
@@ -77,40 +121,50 @@ async def get_workouts(range: str = Query("7d", pattern=r"^\d+d$"), user: dict =
     ]
 
 
+@router.get("/trends")
+async def get_trends(range: str = Query("90d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
+    return await compute_trends(user["telegram_id"], range)
+
+
 @router.get("/daily")
 async def get_daily(date: str = Query(default="", pattern=r"^\d{4}-\d{2}-\d{2}$"), user: dict = Depends(get_current_user)):
     if not date:
         date = dt.date.today().isoformat()
-    return fetch_daily(user["telegram_id"], date)
+    return await fetch_daily(user["telegram_id"], date)
 
 
 @router.get("/dates")
 async def get_dates(range: str = Query("7d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    return get_logged_dates(user["telegram_id"], range)
+    return await get_logged_dates(user["telegram_id"], range)
 
 
 @router.get("/calorie-balance")
 async def get_calorie_balance(range: str = Query("7d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    return compute_calorie_balance(user["telegram_id"], range)
+    return await compute_calorie_balance(user["telegram_id"], range)
 
 
 @router.get("/log-history")
 async def get_log_history(
     range: str = Query("30d", pattern=r"^\d+d$"),
     type: str = Query("all"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
     user: dict = Depends(get_current_user),
 ):
-    return fetch_all_logs(user["telegram_id"], range, type)
+    try:
+        return await fetch_log_page(user["telegram_id"], range, type, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/exercises")
 async def get_exercises(range: str = Query("30d", pattern=r"^\d+d$"), user: dict = Depends(get_current_user)):
-    return fetch_exercises(user["telegram_id"], range)
+    return await fetch_exercises(user["telegram_id"], range)
 
 
 @router.get("/exercise-names")
 async def get_exercise_names(user: dict = Depends(get_current_user)):
-    return fetch_exercise_names(user["telegram_id"])
+    return await fetch_exercise_names(user["telegram_id"])
 
 
 @router.get("/exercise-history")
@@ -119,7 +173,7 @@ async def get_exercise_history(
     range: str = Query("90d", pattern=r"^\d+d$"),
     user: dict = Depends(get_current_user),
 ):
-    data = fetch_exercise_history(user["telegram_id"], name, range)
+    data = await fetch_exercise_history(user["telegram_id"], name, range)
     return [
         {
             "date": row["timestamp"][:10],
@@ -135,7 +189,7 @@ async def get_exercise_history(
 
 @router.get("/exercise-prs")
 async def get_exercise_prs(user: dict = Depends(get_current_user)):
-    prs = compute_exercise_prs(user["telegram_id"])
+    prs = await compute_exercise_prs(user["telegram_id"])
     return [
         {
             "exercise_name": row["exercise_name"],
@@ -154,40 +208,46 @@ async def get_workout_summary(
     user: dict = Depends(get_current_user),
 ):
     user_id = user["telegram_id"]
-    workouts = (
-        get_client()
-        .table("workouts")
-        .select("*")
-        .eq("user_id", user_id)
-        .gte("timestamp", f"{date}T00:00:00-05:00")
-        .lte("timestamp", f"{date}T23:59:59-05:00")
-        .order("timestamp")
-        .execute()
-    ).data
-    exercises = fetch_daily_exercises(user_id, date)
+    workouts, exercises = await asyncio.gather(
+        fetch_daily_workouts(user_id, date),
+        fetch_daily_exercises(user_id, date),
+    )
 
     total_count = len(workouts) + len(exercises)
     if total_count == 0:
         return {"summary": None}
 
-    # Check cache
+    key = (user_id, date, total_count)
+    summary = _summary_cache.get(key)
+    if summary is None:
+        # Concurrent misses for the same key share one lookup/generation
+        summary = await _summary_flight.do(
+            key, lambda: _load_or_generate_summary(user_id, date, total_count, workouts, exercises),
+        )
+        _summary_cache[key] = summary
+    return {"summary": summary}
+
+
+async def _load_or_generate_summary(
+    user_id: str, date: str, total_count: int, workouts: list, exercises: list,
+) -> str:
+    """Return the stored summary if it matches total_count, else generate and store one."""
     client = get_client()
-    cached = (
+    cached = (await execute(
         client.table("workout_summaries")
-        .select("*")
+        .select("workout_count, summary")
         .eq("user_id", user_id)
         .eq("date", date)
-        .execute()
-    ).data
+    )).data
 
     if cached and cached[0]["workout_count"] == total_count:
-        return {"summary": cached[0]["summary"]}
+        return cached[0]["summary"]
 
     # Generate new summary
-    summary = summarize_workout(workouts, exercises)
+    summary = await summarize_workout(workouts, exercises)
 
     # Upsert
-    client.table("workout_summaries").upsert(
+    await execute(client.table("workout_summaries").upsert(
         {
             "user_id": user_id,
             "date": date,
@@ -195,9 +255,9 @@ async def get_workout_summary(
             "summary": summary,
         },
         on_conflict="user_id,date",
-    ).execute()
+    ))
 
-    return {"summary": summary}
+    return summary
 
 
 # ── Editable fields per log type ──────────────────────────────────
@@ -210,15 +270,14 @@ _LOG_TYPE_CONFIG: dict[str, tuple[str, set[str]]] = {
 }
 
 
-def _verify_ownership(table: str, row_id: str, user_id: str):
+async def _verify_ownership(table: str, row_id: str, user_id: str):
     """Return the row if it belongs to the user, else raise 404."""
-    row = (
+    row = (await execute(
         get_client()
         .table(table)
         .select("id, user_id")
         .eq("id", row_id)
-        .execute()
-    ).data
+    )).data
     if not row or str(row[0]["user_id"]) != str(user_id):
         raise HTTPException(status_code=404, detail="Entry not found")
     return row[0]
@@ -239,9 +298,10 @@ async def update_log(
     if not updates:
         raise HTTPException(status_code=400, detail="No valid fields to update")
 
-    _verify_ownership(table, log_id, user["telegram_id"])
+    await _verify_ownership(table, log_id, user["telegram_id"])
 
-    get_client().table(table).update(updates).eq("id", log_id).execute()
+    await execute(get_client().table(table).update(updates).eq("id", log_id))
+    invalidate_user_table(user["telegram_id"], table)
     return {"status": "ok"}
 
 
@@ -255,7 +315,8 @@ async def delete_log(
         raise HTTPException(status_code=400, detail=f"Unknown log type: {log_type}")
 
     table, _ = _LOG_TYPE_CONFIG[log_type]
-    _verify_ownership(table, log_id, user["telegram_id"])
+    await _verify_ownership(table, log_id, user["telegram_id"])
 
-    get_client().table(table).delete().eq("id", log_id).execute()
+    await execute(get_client().table(table).delete().eq("id", log_id))
+    invalidate_user_table(user["telegram_id"], table)
     return {"status": "ok"}
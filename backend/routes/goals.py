@@ -3,7 +3,8 @@ from pydantic import BaseModel
 from typing import Optional
 
 from dependencies import get_current_user
-from services.supabase_service import get_client
+from services.cache_service import dashboard_cache, invalidate_user_table
+from services.supabase_service import execute, get_client
 
 router = APIRouter()
 
@@ -22,9 +23,13 @@ class GoalsUpdate(BaseModel):
 @router.get("/goals")
 async def get_goals(user: dict = Depends(get_current_user)):
     sb = get_client()
-    result = sb.table("goals").select("*").eq("user_id", user["telegram_id"]).execute()
-    if result.data:
-        row = result.data[0]
+
+    async def load():
+        return (await execute(sb.table("goals").select("*").eq("user_id", user["telegram_id"]))).data
+
+    rows = await dashboard_cache.get_or_load(user["telegram_id"], "goals", ("row",), load)
+    if rows:
+        row = rows[0]
         total_inches = row.get("height_inches")
         feet = int(total_inches // 12) if total_inches else None
         inches = round(total_inches % 12, 1) if total_inches else None
@@ -54,5 +59,6 @@ async def update_goals(data: GoalsUpdate, user: dict = Depends(get_current_user)
         "max_carbs_g": data.max_carbs_g,
         "max_fat_g": data.max_fat_g,
     }
-    sb.table("goals").upsert(row, on_conflict="user_id").execute()
+    await execute(sb.table("goals").upsert(row, on_conflict="user_id"))
+    invalidate_user_table(user["telegram_id"], "goals")
     return {"status": "ok"}
@@ -1,9 +1,40 @@
-from fastapi import APIRouter
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, Request
+
+from config.settings import TELEGRAM_WEBHOOK_SECRET
+from services.update_queue import QueueFull
 
 router = APIRouter()
 
 
 @router.post("/log")
-async def handle_telegram_webhook():
-    # TODO: Parse Telegram message, send to Claude, store in pending_logs
-    return {"status": "not implemented"}
+async def handle_telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: str = Header(default=""),
+):
+    """Receive a Telegram update, enqueue it for the worker pool and ack immediately."""
+    if not TELEGRAM_WEBHOOK_SECRET or not hmac.compare_digest(
+        x_telegram_bot_api_secret_token, TELEGRAM_WEBHOOK_SECRET
+    ):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+    update_queue = getattr(request.app.state, "update_queue", None)
+    if update_queue is None:
+        raise HTTPException(status_code=503, detail="Webhook mode not enabled")
+
+    try:
+        update = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed update")
+    if not isinstance(update, dict) or not isinstance(update.get("update_id"), int):
+        raise HTTPException(status_code=400, detail="Malformed update")
+
+    try:
+        await update_queue.put(update)
+    except QueueFull:
+        # Telegram retries non-2xx responses, so a full queue pushes back
+        # on the sender instead of dropping the update.
+        raise HTTPException(status_code=503, detail="Update queue full")
+
+    return {"ok": True}
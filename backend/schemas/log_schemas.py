@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Literal, Optional, Union
+from typing import List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class MealLog(BaseModel):
@@ -86,3 +86,44 @@ def parse_log(data: dict) -> LogEntry:
     if model is None:
         raise ValueError(f"Unsupported log type: {log_type}")
     return model(**data)
+
+
+def entries_json_schema() -> dict:
+    """JSON schema for {"entries": [LogEntry, ...]}, used as the extraction tool's input schema.
+
+    `timestamp` is made optional because the prompt tells the model to omit
+    it unless the user states a time; the server fills it in before parse_log.
+    """
+    schema = TypeAdapter(List[LogEntry]).json_schema()
+    defs = schema.pop("$defs")
+    for definition in defs.values():
+        definition["required"] = [f for f in definition.get("required", []) if f != "timestamp"]
+    return {
+        "type": "object",
+        "properties": {"entries": schema},
+        "required": ["entries"],
+        "$defs": defs,
+    }
+
+
+def batch_json_schema() -> dict:
+    """JSON schema for {"results": [{"message_id", "entries"}, ...]}, the batched extraction tool's input."""
+    schema = entries_json_schema()
+    return {
+        "type": "object",
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "message_id": {"type": "string"},
+                        "entries": schema["properties"]["entries"],
+                    },
+                    "required": ["message_id", "entries"],
+                },
+            },
+        },
+        "required": ["results"],
+        "$defs": schema["$defs"],
+    }
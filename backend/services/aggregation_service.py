@@ -1,17 +1,41 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import heapq
+import json
 import logging
-from collections import defaultdict
+import uuid
 from datetime import datetime, timedelta
+from itertools import islice
 from zoneinfo import ZoneInfo
-from typing import Dict, List
-
-from services.supabase_service import get_client
+from typing import List, Optional, Tuple
+
+from services.analytics_service import (
+    group_by_day,
+    rolling_mean,
+    to_columns,
+    to_days,
+    weekly_means,
+)
+from services.cache_service import dashboard_cache
+from services.supabase_service import execute, get_client
 
 logger = logging.getLogger("nutriclaude.aggregation")
 
 EASTERN = ZoneInfo("America/New_York")
 
+# Column projections per read, covering exactly what the callers below and
+# the dashboard routes use. Rows fetched with one of these are shared through
+# the cache, so a new consumer that needs another column must add it here.
+_MEAL_COLUMNS = "timestamp, description, calories, protein_g, carbs_g, fat_g"
+_WORKOUT_COLUMNS = "timestamp, description, estimated_calories_burned, intensity_score"
+_BODYWEIGHT_COLUMNS = "timestamp, weight_lbs"
+_WELLNESS_COLUMNS = "timestamp, symptom_score, symptom"
+_WORKOUT_QUALITY_COLUMNS = "timestamp, performance_score"
+_ROLLUP_COLUMNS = "day, calories, protein_g, carbs_g, fat_g, meal_count, calories_burned"
+_EXERCISE_COLUMNS = "timestamp, exercise_name, sets, reps, weight_lbs, notes"
+
 
 def _parse_range(range_str: str) -> datetime:
     """Convert a range string like '7d', '14d', '30d' to a start datetime."""
@@ -19,120 +43,158 @@ def _parse_range(range_str: str) -> datetime:
     return datetime.now(EASTERN) - timedelta(days=days)
 
 
+def _range_days(range_str: str) -> int:
+    return int(range_str.rstrip("d"))
+
+
+def _since(rows: List[dict], start: datetime) -> List[dict]:
+    """Keep rows whose timestamp is at or after `start`."""
+    return [r for r in rows if datetime.fromisoformat(r["timestamp"]) >= start]
+
+
 def _date_key(ts: str) -> str:
     """Extract YYYY-MM-DD from an ISO timestamp string."""
     return ts[:10]
 
 
-def fetch_meals(user_id: str, range_str: str = "7d") -> List[dict]:
+async def _cached_rows(user_id: str, table: str, key: tuple, query) -> List[dict]:
+    """Return the rows for `query`, served from the per-user dashboard cache when warm.
+
+    Cached lists are shared between callers and must not be mutated.
+    """
+    async def load() -> List[dict]:
+        return (await execute(query)).data
+
+    return await dashboard_cache.get_or_load(user_id, table, key, load)
+
+
+async def fetch_meals(user_id: str, range_str: str = "7d") -> List[dict]:
     start = _parse_range(range_str).isoformat()
     client = get_client()
-    result = (
+    return await _cached_rows(
+        user_id, "meals", ("range", range_str),
         client.table("meals")
-        .select("*")
+        .select(_MEAL_COLUMNS)
         .eq("user_id", user_id)
         .gte("timestamp", start)
-        .order("timestamp")
-        .execute()
+        .order("timestamp"),
     )
-    return result.data
 
 
-def fetch_workouts(user_id: str, range_str: str = "7d") -> List[dict]:
+async def fetch_workouts(user_id: str, range_str: str = "7d") -> List[dict]:
     start = _parse_range(range_str).isoformat()
     client = get_client()
-    result = (
+    return await _cached_rows(
+        user_id, "workouts", ("range", range_str),
         client.table("workouts")
-        .select("*")
+        .select(_WORKOUT_COLUMNS)
         .eq("user_id", user_id)
         .gte("timestamp", start)
-        .order("timestamp")
-        .execute()
+        .order("timestamp"),
     )
-    return result.data
 
 
-def fetch_bodyweight(user_id: str, range_str: str = "30d") -> List[dict]:
+async def fetch_bodyweight(user_id: str, range_str: str = "30d") -> List[dict]:
     start = _parse_range(range_str).isoformat()
     client = get_client()
-    result = (
+    return await _cached_rows(
+        user_id, "bodyweight", ("range", range_str),
         client.table("bodyweight")
-        .select("*")
+        .select(_BODYWEIGHT_COLUMNS)
         .eq("user_id", user_id)
         .gte("timestamp", start)
-        .order("timestamp")
-        .execute()
+        .order("timestamp"),
     )
-    return result.data
 
 
-def fetch_wellness(user_id: str, range_str: str = "7d") -> List[dict]:
+async def fetch_wellness(user_id: str, range_str: str = "7d") -> List[dict]:
     start = _parse_range(range_str).isoformat()
     client = get_client()
-    result = (
+    return await _cached_rows(
+        user_id, "wellness", ("range", range_str),
         client.table("wellness")
-        .select("*")
+        .select(_WELLNESS_COLUMNS)
         .eq("user_id", user_id)
         .gte("timestamp", start)
-        .order("timestamp")
-        .execute()
+        .order("timestamp"),
     )
-    return result.data
 
 
-def fetch_workout_quality(user_id: str, range_str: str = "7d") -> List[dict]:
+async def fetch_workout_quality(user_id: str, range_str: str = "7d") -> List[dict]:
     start = _parse_range(range_str).isoformat()
     client = get_client()
-    result = (
+    return await _cached_rows(
+        user_id, "workout_quality", ("range", range_str),
         client.table("workout_quality")
-        .select("*")
+        .select(_WORKOUT_QUALITY_COLUMNS)
         .eq("user_id", user_id)
         .gte("timestamp", start)
-        .order("timestamp")
-        .execute()
+        .order("timestamp"),
+    )
+
+
+async def fetch_daily_rollups(user_id: str, range_str: str = "7d") -> List[dict]:
+    """Fetch per-day meal/workout totals maintained by the daily_rollups triggers."""
+    start_day = _parse_range(range_str).date().isoformat()
+    client = get_client()
+    return await _cached_rows(
+        user_id, "daily_rollups", ("range", range_str),
+        client.table("daily_rollups")
+        .select(_ROLLUP_COLUMNS)
+        .eq("user_id", user_id)
+        .gte("day", start_day)
+        .order("day"),
     )
-    return result.data
 
 
-def compute_kpis(user_id: str, range_str: str = "7d") -> dict:
-    meals = fetch_meals(user_id, range_str)
-    workouts = fetch_workouts(user_id, range_str)
-    bodyweight = fetch_bodyweight(user_id, range_str)
-    wellness = fetch_wellness(user_id, range_str)
-    workout_quality = fetch_workout_quality(user_id, range_str)
+async def fetch_latest_weight(user_id: str):
+    """Return the user's most recent weight_lbs regardless of range, or None."""
+    client = get_client()
+    rows = await _cached_rows(
+        user_id, "bodyweight", ("latest",),
+        client.table("bodyweight")
+        .select("weight_lbs")
+        .eq("user_id", user_id)
+        .order("timestamp", desc=True)
+        .limit(1),
+    )
+    return rows[0]["weight_lbs"] if rows else None
+
+
+async def compute_kpis(user_id: str, range_str: str = "7d") -> dict:
+    # The latest-weight fallback is issued alongside the range reads so it
+    # never adds a sequential round-trip.
+    rollups, bodyweight, wellness, workout_quality, latest_weight = await asyncio.gather(
+        fetch_daily_rollups(user_id, range_str),
+        fetch_bodyweight(user_id, range_str),
+        fetch_wellness(user_id, range_str),
+        fetch_workout_quality(user_id, range_str),
+        fetch_latest_weight(user_id),
+    )
+
+    return _kpis_from(rollups, bodyweight, wellness, workout_quality, latest_weight)
 
-    # Group meals by day
-    daily_cals: Dict[str, int] = defaultdict(int)
-    daily_protein: Dict[str, int] = defaultdict(int)
-    for m in meals:
-        day = _date_key(m["timestamp"])
-        daily_cals[day] += m.get("calories", 0)
-        daily_protein[day] += m.get("protein_g", 0)
 
-    num_days = len(daily_cals) or 1
-    avg_daily_calories = round(sum(daily_cals.values()) / num_days)
-    avg_daily_protein = round(sum(daily_protein.values()) / num_days)
+def _kpis_from(
+    rollups: List[dict],
+    bodyweight: List[dict],
+    wellness: List[dict],
+    workout_quality: List[dict],
+    latest_weight,
+) -> dict:
+    meal_days = [r for r in rollups if r["meal_count"] > 0]
+    total_intake = sum(r["calories"] for r in meal_days)
+    num_days = len(meal_days) or 1
+    avg_daily_calories = round(total_intake / num_days)
+    avg_daily_protein = round(sum(r["protein_g"] for r in meal_days) / num_days)
 
     # Current weight (most recent entry across any range)
-    current_weight = None
+    current_weight = latest_weight
     if bodyweight:
         current_weight = bodyweight[-1].get("weight_lbs")
-    else:
-        client = get_client()
-        result = (
-            client.table("bodyweight")
-            .select("weight_lbs")
-            .eq("user_id", user_id)
-            .order("timestamp", desc=True)
-            .limit(1)
-            .execute()
-        )
-        if result.data:
-            current_weight = result.data[0]["weight_lbs"]
 
     # Calorie balance: total intake - total workout burn
-    total_intake = sum(daily_cals.values())
-    total_burned = sum(w.get("estimated_calories_burned", 0) for w in workouts)
+    total_burned = sum(r["calories_burned"] for r in rollups)
     calorie_balance = total_intake - total_burned
 
     # Average symptom score
@@ -157,102 +219,128 @@ def compute_kpis(user_id: str, range_str: str = "7d") -> dict:
     }
 
 
-def compute_daily_meals(user_id: str, range_str: str = "7d") -> List[dict]:
-    meals = fetch_meals(user_id, range_str)
-    daily: Dict[str, Dict[str, int]] = defaultdict(lambda: {
-        "calories": 0, "protein_g": 0, "carbs_g": 0, "fat_g": 0,
-    })
-    for m in meals:
-        day = _date_key(m["timestamp"])
-        daily[day]["calories"] += m.get("calories", 0)
-        daily[day]["protein_g"] += m.get("protein_g", 0)
-        daily[day]["carbs_g"] += m.get("carbs_g", 0)
-        daily[day]["fat_g"] += m.get("fat_g", 0)
+async def compute_daily_meals(user_id: str, range_str: str = "7d") -> List[dict]:
+    rollups = await fetch_daily_rollups(user_id, range_str)
+    return _daily_meals_from(rollups)
+
 
+def _daily_meals_from(rollups: List[dict]) -> List[dict]:
     return [
-        {"date": day, **macros}
-        for day, macros in sorted(daily.items())
+        {
+            "date": r["day"],
+            "calories": r["calories"],
+            "protein_g": r["protein_g"],
+            "carbs_g": r["carbs_g"],
+            "fat_g": r["fat_g"],
+        }
+        for r in rollups
+        if r["meal_count"] > 0
     ]
 
 
-def compute_calorie_balance(user_id: str, range_str: str = "7d") -> List[dict]:
-    meals = fetch_meals(user_id, range_str)
-    workouts = fetch_workouts(user_id, range_str)
-
-    daily_intake: Dict[str, int] = defaultdict(int)
-    daily_burn: Dict[str, int] = defaultdict(int)
+async def compute_calorie_balance(user_id: str, range_str: str = "7d") -> List[dict]:
+    rollups = await fetch_daily_rollups(user_id, range_str)
+    return _calorie_balance_from(rollups)
 
-    for m in meals:
-        day = _date_key(m["timestamp"])
-        daily_intake[day] += m.get("calories", 0)
 
-    for w in workouts:
-        day = _date_key(w["timestamp"])
-        daily_burn[day] += w.get("estimated_calories_burned", 0)
-
-    all_days = sorted(set(daily_intake.keys()) | set(daily_burn.keys()))
+def _calorie_balance_from(rollups: List[dict]) -> List[dict]:
     return [
         {
-            "date": day,
-            "intake": daily_intake[day],
-            "burned": daily_burn[day],
-            "net": daily_intake[day] - daily_burn[day],
+            "date": r["day"],
+            "intake": r["calories"],
+            "burned": r["calories_burned"],
+            "net": r["calories"] - r["calories_burned"],
         }
-        for day in all_days
+        for r in rollups
     ]
 
 
-def fetch_daily(user_id: str, date_str: str) -> dict:
+async def compute_dashboard(user_id: str, range_str: str = "7d", trend_range: str = "30d") -> dict:
+    """Compute every dashboard panel from one read per table.
+
+    Each table is fetched once for the wider of the two ranges; the KPI,
+    calorie-balance and logged-date panels are then narrowed to `range_str`
+    in memory, while the trend panels use `trend_range`.
+    """
+    widest = max(range_str, trend_range, key=_range_days)
+    rollups, bodyweight, wellness, workout_quality, latest_weight = await asyncio.gather(
+        fetch_daily_rollups(user_id, widest),
+        fetch_bodyweight(user_id, widest),
+        fetch_wellness(user_id, widest),
+        fetch_workout_quality(user_id, widest),
+        fetch_latest_weight(user_id),
+    )
+
+    def narrow(range_: str):
+        start = _parse_range(range_)
+        start_day = start.date().isoformat()
+        return (
+            [r for r in rollups if r["day"] >= start_day],
+            _since(bodyweight, start),
+            _since(wellness, start),
+            _since(workout_quality, start),
+        )
+
+    r_rollups, r_bodyweight, r_wellness, r_quality = narrow(range_str)
+    t_rollups, t_bodyweight, t_wellness, t_quality = narrow(trend_range)
+
+    dates = {r["day"] for r in r_rollups}
+    for rows in (r_bodyweight, r_wellness, r_quality):
+        dates.update(_date_key(row["timestamp"]) for row in rows)
+
+    return {
+        "kpis": _kpis_from(r_rollups, r_bodyweight, r_wellness, r_quality, latest_weight),
+        "calorie_balance": _calorie_balance_from(r_rollups),
+        "dates": sorted(dates),
+        "meals": _daily_meals_from(t_rollups),
+        "weight": t_bodyweight,
+        "wellness": t_wellness,
+        "performance": t_quality,
+    }
+
+
+async def fetch_daily(user_id: str, date_str: str) -> dict:
     """Fetch all data for a specific date (YYYY-MM-DD)."""
     start = f"{date_str}T00:00:00-05:00"
     end = f"{date_str}T23:59:59-05:00"
     client = get_client()
 
-    meals = (
-        client.table("meals")
-        .select("*")
-        .eq("user_id", user_id)
-        .gte("timestamp", start)
-        .lte("timestamp", end)
-        .order("timestamp")
-        .execute()
-    ).data
-
-    workouts = (
-        client.table("workouts")
-        .select("*")
-        .eq("user_id", user_id)
-        .gte("timestamp", start)
-        .lte("timestamp", end)
-        .order("timestamp")
-        .execute()
-    ).data
-
-    wellness = (
-        client.table("wellness")
-        .select("*")
-        .eq("user_id", user_id)
-        .gte("timestamp", start)
-        .lte("timestamp", end)
-        .execute()
-    ).data
-
-    workout_quality = (
-        client.table("workout_quality")
-        .select("*")
-        .eq("user_id", user_id)
-        .gte("timestamp", start)
-        .lte("timestamp", end)
-        .execute()
-    ).data
+    key = ("day", date_str)
+    meals, workouts, wellness, workout_quality, exercises = await asyncio.gather(
+        _cached_rows(
+            user_id, "meals", key,
+            client.table("meals")
+            .select(_MEAL_COLUMNS)
+            .eq("user_id", user_id)
+            .gte("timestamp", start)
+            .lte("timestamp", end)
+            .order("timestamp"),
+        ),
+        fetch_daily_workouts(user_id, date_str),
+        _cached_rows(
+            user_id, "wellness", key,
+            client.table("wellness")
+            .select(_WELLNESS_COLUMNS)
+            .eq("user_id", user_id)
+            .gte("timestamp", start)
+            .lte("timestamp", end),
+        ),
+        _cached_rows(
+            user_id, "workout_quality", key,
+            client.table("workout_quality")
+            .select(_WORKOUT_QUALITY_COLUMNS)
+            .eq("user_id", user_id)
+            .gte("timestamp", start)
+            .lte("timestamp", end),
+        ),
+        fetch_daily_exercises(user_id, date_str),
+    )
 
     total_calories = sum(m.get("calories", 0) for m in meals)
     total_protein = sum(m.get("protein_g", 0) for m in meals)
     total_carbs = sum(m.get("carbs_g", 0) for m in meals)
     total_fat = sum(m.get("fat_g", 0) for m in meals)
 
-    exercises = fetch_daily_exercises(user_id, date_str)
-
     workout_info = None
     if workouts:
         w = workouts[0]
@@ -294,139 +382,227 @@ def fetch_daily(user_id: str, date_str: str) -> dict:
     }
 
 
-def get_logged_dates(user_id: str, range_str: str = "7d") -> List[str]:
+async def get_logged_dates(user_id: str, range_str: str = "7d") -> List[str]:
     """Return sorted list of unique dates that have any logged data."""
     start = _parse_range(range_str).isoformat()
     client = get_client()
 
-    dates = set()
-    for table in ["meals", "workouts", "bodyweight", "wellness", "workout_quality"]:
-        result = (
+    tables = ["meals", "workouts", "bodyweight", "wellness", "workout_quality"]
+    results = await asyncio.gather(*(
+        _cached_rows(
+            user_id, table, ("timestamps", range_str),
             client.table(table)
             .select("timestamp")
             .eq("user_id", user_id)
-            .gte("timestamp", start)
-            .execute()
+            .gte("timestamp", start),
         )
-        for row in result.data:
+        for table in tables
+    ))
+
+    dates = set()
+    for rows in results:
+        for row in rows:
             dates.add(row["timestamp"][:10])
 
     return sorted(dates)
 
 
-def fetch_all_logs(user_id: str, range_str: str = "30d", type_filter: str = "all") -> List[dict]:
-    """Fetch all log entries across all tables, merged and sorted by timestamp."""
+_LOG_HISTORY_TABLES = {
+    "meal": ("meals", "id, timestamp, description, calories, protein_g, carbs_g, fat_g", lambda r: {
+        "id": r["id"], "timestamp": r["timestamp"], "type": "meal",
+        "description": r.get("description", ""),
+        "value": f"{r.get('calories', 0)} kcal",
+        "protein": r.get("protein_g"), "carbs": r.get("carbs_g"), "fat": r.get("fat_g"),
+    }),
+    "workout": ("workouts", "id, timestamp, description, estimated_calories_burned", lambda r: {
+        "id": r["id"], "timestamp": r["timestamp"], "type": "workout",
+        "description": r.get("description", ""),
+        "value": f"{r.get('estimated_calories_burned', 0)} kcal burned",
+        "protein": None, "carbs": None, "fat": None,
+    }),
+    "exercise": ("exercises", "id, timestamp, exercise_name, sets, reps, weight_lbs", lambda r: {
+        "id": r["id"], "timestamp": r["timestamp"], "type": "exercise",
+        "description": r.get("exercise_name", ""),
+        "value": f"{r.get('sets', 0)}x{r.get('reps', 0)} @ {r.get('weight_lbs', 0)} lbs",
+        "protein": None, "carbs": None, "fat": None,
+    }),
+    "weight": ("bodyweight", "id, timestamp, weight_lbs", lambda r: {
+        "id": r["id"], "timestamp": r["timestamp"], "type": "weight",
+        "description": "Weigh-In",
+        "value": f"{r.get('weight_lbs', 0)} lbs",
+        "protein": None, "carbs": None, "fat": None,
+    }),
+    "wellness": ("wellness", "id, timestamp, symptom, symptom_score", lambda r: {
+        "id": r["id"], "timestamp": r["timestamp"], "type": "wellness",
+        "description": r.get("symptom") or "Symptom Score",
+        "value": f"{r.get('symptom_score', 0)}/10",
+        "protein": None, "carbs": None, "fat": None,
+    }),
+}
+
+
+def _encode_cursor(entry: dict) -> str:
+    raw = json.dumps([entry["timestamp"], entry["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of _encode_cursor; raises ValueError for anything malformed.
+
+    Both parts are re-serialized from their parsed values, since they are
+    interpolated into a PostgREST filter string.
+    """
+    try:
+        timestamp, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp).isoformat(), str(uuid.UUID(entry_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _log_sort_key(entry: dict) -> Tuple[datetime, str]:
+    return datetime.fromisoformat(entry["timestamp"]), entry["id"]
+
+
+async def fetch_log_page(
+    user_id: str,
+    range_str: str = "30d",
+    type_filter: str = "all",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> dict:
+    """One page of log entries across tables, newest first, keyset-paginated on (timestamp, id).
+
+    Each table returns at most limit + 1 rows after the cursor, already in
+    order, and heapq.merge interleaves them lazily, so a page never pulls
+    more than that from the database. `next_cursor` is None on the last page.
+    The first page (no cursor) also carries `totals`: entry counts per type
+    over the whole range, whatever the filter.
+    """
     start = _parse_range(range_str).isoformat()
+    after = _decode_cursor(cursor) if cursor else None
+    types = [type_filter] if type_filter != "all" else list(_LOG_HISTORY_TABLES)
+    configs = [_LOG_HISTORY_TABLES[t] for t in types if t in _LOG_HISTORY_TABLES]
     client = get_client()
-    entries = []
-
-    table_configs = {
-        "meal": ("meals", lambda r: {
-            "id": r["id"], "timestamp": r["timestamp"], "type": "meal",
-            "description": r.get("description", ""),
-            "value": f"{r.get('calories', 0)} kcal",
-            "protein": r.get("protein_g"), "carbs": r.get("carbs_g"), "fat": r.get("fat_g"),
-        }),
-        "workout": ("workouts", lambda r: {
-            "id": r["id"], "timestamp": r["timestamp"], "type": "workout",
-            "description": r.get("description", ""),
-            "value": f"{r.get('estimated_calories_burned', 0)} kcal burned",
-            "protein": None, "carbs": None, "fat": None,
-        }),
-        "exercise": ("exercises", lambda r: {
-            "id": r["id"], "timestamp": r["timestamp"], "type": "exercise",
-            "description": r.get("exercise_name", ""),
-            "value": f"{r.get('sets', 0)}x{r.get('reps', 0)} @ {r.get('weight_lbs', 0)} lbs",
-            "protein": None, "carbs": None, "fat": None,
-        }),
-        "weight": ("bodyweight", lambda r: {
-            "id": r["id"], "timestamp": r["timestamp"], "type": "weight",
-            "description": "Weigh-In",
-            "value": f"{r.get('weight_lbs', 0)} lbs",
-            "protein": None, "carbs": None, "fat": None,
-        }),
-        "wellness": ("wellness", lambda r: {
-            "id": r["id"], "timestamp": r["timestamp"], "type": "wellness",
-            "description": r.get("symptom") or "Symptom Score",
-            "value": f"{r.get('symptom_score', 0)}/10",
-            "protein": None, "carbs": None, "fat": None,
-        }),
-    }
-
-    types_to_fetch = [type_filter] if type_filter != "all" else list(table_configs.keys())
 
-    for t in types_to_fetch:
-        if t not in table_configs:
-            continue
-        table_name, transform = table_configs[t]
-        result = (
+    def page_query(table_name: str, columns: str):
+        query = (
             client.table(table_name)
-            .select("*")
+            .select(columns)
             .eq("user_id", user_id)
             .gte("timestamp", start)
-            .order("timestamp", desc=True)
-            .execute()
         )
-        for row in result.data:
-            entries.append(transform(row))
+        if after is not None:
+            ts, entry_id = after
+            query = query.or_(f'timestamp.lt."{ts}",and(timestamp.eq."{ts}",id.lt.{entry_id})')
+        return query.order("timestamp", desc=True).order("id", desc=True).limit(limit + 1)
+
+    results = await asyncio.gather(*[execute(page_query(table, columns)) for table, columns, _ in configs])
+    streams = [
+        map(transform, result.data)
+        for (_, _, transform), result in zip(configs, results)
+    ]
+    merged = list(islice(heapq.merge(*streams, key=_log_sort_key, reverse=True), limit + 1))
+
+    entries = merged[:limit]
+    next_cursor = _encode_cursor(entries[-1]) if len(merged) > limit else None
+    page = {"entries": entries, "next_cursor": next_cursor}
+    if after is None:
+        page["totals"] = await _log_totals(user_id, range_str)
+    return page
+
+
+async def _log_totals(user_id: str, range_str: str) -> dict:
+    """Entry counts per log-history type over the range, plus "all"."""
+    start = _parse_range(range_str).isoformat()
+    client = get_client()
+
+    async def count(table_name: str) -> int:
+        async def load() -> int:
+            result = await execute(
+                client.table(table_name)
+                .select("id", count="exact", head=True)
+                .eq("user_id", user_id)
+                .gte("timestamp", start)
+            )
+            return result.count or 0
 
-    entries.sort(key=lambda x: x["timestamp"], reverse=True)
-    return entries
+        return await dashboard_cache.get_or_load(user_id, table_name, ("count", range_str), load)
 
+    counts = await asyncio.gather(*[count(table) for table, _, _ in _LOG_HISTORY_TABLES.values()])
+    totals = dict(zip(_LOG_HISTORY_TABLES, counts))
+    totals["all"] = sum(counts)
+    return totals
 
-def fetch_exercises(user_id: str, range_str: str = "30d") -> List[dict]:
+
+async def fetch_exercises(user_id: str, range_str: str = "30d") -> List[dict]:
     start = _parse_range(range_str).isoformat()
     client = get_client()
-    result = (
+    return await _cached_rows(
+        user_id, "exercises", ("range", range_str),
         client.table("exercises")
-        .select("*")
+        .select(_EXERCISE_COLUMNS)
         .eq("user_id", user_id)
         .gte("timestamp", start)
-        .order("timestamp", desc=True)
-        .execute()
+        .order("timestamp", desc=True),
     )
-    return result.data
 
 
-def fetch_exercise_names(user_id: str) -> List[str]:
+async def fetch_exercise_names(user_id: str) -> List[str]:
+    """Distinct exercise names, read from the trigger-maintained exercise_catalog."""
     client = get_client()
-    result = (
-        client.table("exercises")
+    rows = await _cached_rows(
+        user_id, "exercise_catalog", ("names",),
+        client.table("exercise_catalog")
         .select("exercise_name")
         .eq("user_id", user_id)
-        .execute()
+        .order("exercise_name"),
     )
-    return sorted(set(row["exercise_name"] for row in result.data))
+    return [row["exercise_name"] for row in rows]
 
 
-def fetch_exercise_history(user_id: str, exercise_name: str, range_str: str = "90d") -> List[dict]:
+async def fetch_exercise_history(user_id: str, exercise_name: str, range_str: str = "90d") -> List[dict]:
     start = _parse_range(range_str).isoformat()
     client = get_client()
-    result = (
+    return await _cached_rows(
+        user_id, "exercises", ("history", exercise_name, range_str),
         client.table("exercises")
-        .select("*")
+        .select(_EXERCISE_COLUMNS)
         .eq("user_id", user_id)
         .eq("exercise_name", exercise_name)
         .gte("timestamp", start)
-        .order("timestamp")
-        .execute()
+        .order("timestamp"),
+    )
+
+
+async def fetch_daily_workouts(user_id: str, date_str: str) -> List[dict]:
+    """Fetch all workouts for a specific date (YYYY-MM-DD)."""
+    start = f"{date_str}T00:00:00-05:00"
+    end = f"{date_str}T23:59:59-05:00"
+    client = get_client()
+    return await _cached_rows(
+        user_id, "workouts", ("day", date_str),
+        client.table("workouts")
+        .select(_WORKOUT_COLUMNS)
+        .eq("user_id", user_id)
+        .gte("timestamp", start)
+        .lte("timestamp", end)
+        .order("timestamp"),
     )
-    return result.data
 
 
-def fetch_daily_exercises(user_id: str, date_str: str) -> List[dict]:
+async def fetch_daily_exercises(user_id: str, date_str: str) -> List[dict]:
     """Fetch all exercises for a specific date (YYYY-MM-DD)."""
     start = f"{date_str}T00:00:00-05:00"
     end = f"{date_str}T23:59:59-05:00"
     client = get_client()
-    result = (
+    rows = await _cached_rows(
+        user_id, "exercises", ("day", date_str),
         client.table("exercises")
-        .select("*")
+        .select(_EXERCISE_COLUMNS)
         .eq("user_id", user_id)
         .gte("timestamp", start)
         .lte("timestamp", end)
-        .order("timestamp")
-        .execute()
+        .order("timestamp"),
     )
     return [
         {
@@ -436,24 +612,71 @@ def fetch_daily_exercises(user_id: str, date_str: str) -> List[dict]:
             "weight_lbs": r.get("weight_lbs", 0),
             "notes": r.get("notes"),
         }
-        for r in result.data
+        for r in rows
     ]
 
 
-def compute_exercise_prs(user_id: str) -> List[dict]:
+async def compute_exercise_prs(user_id: str) -> List[dict]:
+    """Heaviest set per exercise, ordered by name, from the exercise_catalog PR columns."""
     client = get_client()
-    result = (
-        client.table("exercises")
-        .select("*")
+    rows = await _cached_rows(
+        user_id, "exercise_catalog", ("prs",),
+        client.table("exercise_catalog")
+        .select("exercise_name, pr_weight_lbs, pr_sets, pr_reps, pr_timestamp")
         .eq("user_id", user_id)
-        .order("weight_lbs", desc=True)
-        .execute()
+        .order("exercise_name"),
+    )
+    return [
+        {
+            "exercise_name": r["exercise_name"],
+            "weight_lbs": r["pr_weight_lbs"],
+            "sets": r["pr_sets"],
+            "reps": r["pr_reps"],
+            "timestamp": r["pr_timestamp"],
+        }
+        for r in rows
+    ]
+
+
+async def compute_trends(user_id: str, range_str: str = "90d") -> dict:
+    """Long-range trends computed column-wise: 7-day weight trend and weekly macro averages."""
+    rollups, bodyweight = await asyncio.gather(
+        fetch_daily_rollups(user_id, range_str),
+        fetch_bodyweight(user_id, range_str),
+    )
+
+    # Multiple weigh-ins on one day collapse to their mean before smoothing
+    weigh_days, weights = group_by_day(
+        to_days([r["timestamp"] for r in bodyweight]),
+        to_columns(bodyweight, ["weight_lbs"]),
+        how="mean",
     )
-    prs = {}
-    for row in result.data:
-        name = row["exercise_name"]
-        if name not in prs or row["weight_lbs"] > prs[name]["weight_lbs"]:
-            prs[name] = row
-    return sorted(prs.values(), key=lambda x: x["exercise_name"])
+    weight = weights["weight_lbs"]
+    trend = rolling_mean(weigh_days, weight, window=7)
+
+    meal_days = [r for r in rollups if r["meal_count"] > 0]
+    macro_fields = ["calories", "protein_g", "carbs_g", "fat_g"]
+    weeks, macros = weekly_means(
+        to_days([r["day"] for r in meal_days]),
+        to_columns(meal_days, macro_fields),
+    )
+
+    return {
+        "weight_trend": [
+            {
+                "date": str(day),
+                "weight_lbs": round(float(w), 2),
+                "trend_7d": round(float(t), 2),
+            }
+            for day, w, t in zip(weigh_days, weight, trend)
+        ],
+        "weekly_macros": [
+            {
+                "week_start": str(week),
+                **{f: round(float(macros[f][i])) for f in macro_fields},
+            }
+            for i, week in enumerate(weeks)
+        ],
+    }
 
 
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+
+def to_columns(rows: Sequence[dict], fields: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Convert row dicts to one float64 array per field (missing/None -> 0)."""
+    n = len(rows)
+    columns = {}
+    for field in fields:
+        col = np.fromiter(
+            ((r.get(field) or 0) for r in rows), dtype=np.float64, count=n,
+        )
+        columns[field] = col
+    return columns
+
+
+def to_days(values: Sequence[str]) -> np.ndarray:
+    """Convert ISO timestamps or dates to a datetime64[D] array of their date part."""
+    # Parsing is the expensive part and a long history repeats each date many
+    # times, so only distinct dates are parsed and rows index into them.
+    codes: Dict[str, int] = {}
+    index = np.fromiter(
+        (codes.setdefault(v[:10], len(codes)) for v in values), dtype=np.int64, count=len(values),
+    )
+    return np.array(list(codes), dtype="datetime64[D]")[index]
+
+
+def group_by_day(
+    days: np.ndarray, columns: Dict[str, np.ndarray], how: str = "sum",
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Group columns by day with vectorized ops.
+
+    Returns the sorted unique days and, per column, the per-day sum (or mean
+    when `how="mean"`).
+    """
+    if len(days) == 0:
+        return days, {name: np.array([], dtype=np.float64) for name in columns}
+    # Days are a dense integer range, so bin by offset from the first day
+    # instead of sorting for np.unique.
+    ordinals = days.astype(np.int64)
+    first = ordinals.min()
+    offsets = ordinals - first
+    counts = np.bincount(offsets)
+    present = np.flatnonzero(counts)
+    grouped = {}
+    for name, col in columns.items():
+        sums = np.bincount(offsets, weights=col)[present]
+        grouped[name] = sums / counts[present] if how == "mean" else sums
+    return (present + first).astype("datetime64[D]"), grouped
+
+
+def rolling_mean(days: np.ndarray, values: np.ndarray, window: int = 7) -> np.ndarray:
+    """Trailing `window`-calendar-day mean at each observed day.
+
+    Days with no observation don't count toward the denominator, so a gap in
+    weigh-ins doesn't drag the trend toward zero.
+    """
+    if len(days) == 0:
+        return np.array([], dtype=np.float64)
+    offsets = (days - days[0]).astype(np.int64)
+    span = int(offsets[-1]) + 1
+    dense = np.zeros(span)
+    present = np.zeros(span)
+    dense[offsets] = values
+    present[offsets] = 1
+    sum_cum = np.concatenate(([0.0], np.cumsum(dense)))
+    cnt_cum = np.concatenate(([0.0], np.cumsum(present)))
+    lo = np.maximum(offsets + 1 - window, 0)
+    hi = offsets + 1
+    return (sum_cum[hi] - sum_cum[lo]) / (cnt_cum[hi] - cnt_cum[lo])
+
+
+def weekly_means(
+    days: np.ndarray, columns: Dict[str, np.ndarray],
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Average per-day columns over Monday-starting weeks.
+
+    Returns each week's Monday and, per column, the mean over the days in
+    that week that have data.
+    """
+    # 1970-01-01 was a Thursday; shift so weeks start on Monday.
+    week_starts = days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+    return group_by_day(week_starts, columns, how="mean")
+
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from cachetools import TTLCache
+
+from config.settings import DASHBOARD_CACHE_MAXSIZE, DASHBOARD_CACHE_TTL_SECONDS
+
+# Tables whose cached reads are derived from another table's rows
+_DEPENDENTS: Dict[str, Tuple[str, ...]] = {
+    "meals": ("daily_rollups",),
+    "workouts": ("daily_rollups",),
+    "exercises": ("exercise_catalog",),
+}
+
+
+class DashboardCache:
+    """TTL + LRU cache of per-user query results keyed by (user_id, table, key).
+
+    Writes call `invalidate(user_id, table)`, which drops every cached read of
+    that table (and of tables derived from it) for that user only. A per-table
+    generation counter stops a load that raced with an invalidation from
+    storing its now-stale result.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(
+        self,
+        user_id: str,
+        table: str,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value for (user_id, table, key), loading it on a miss."""
+        cache_key = (user_id, table, key)
+        try:
+            value = self._cache[cache_key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        generation = self._generations[(user_id, table)]
+        value = await loader()
+        if self._generations[(user_id, table)] == generation:
+            self._cache[cache_key] = value
+        return value
+
+    def invalidate(self, user_id: str, table: str) -> None:
+        """Drop all cached reads of `table` (and its derived tables) for one user."""
+        user_id = str(user_id)
+        tables = {table, *_DEPENDENTS.get(table, ())}
+        for t in tables:
+            self._generations[(user_id, t)] += 1
+        stale = [k for k in list(self._cache.keys()) if k[0] == user_id and k[1] in tables]
+        for k in stale:
+            self._cache.pop(k, None)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+            "size": len(self._cache),
+        }
+
+
+dashboard_cache = DashboardCache(maxsize=DASHBOARD_CACHE_MAXSIZE, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+
+
+def invalidate_user_table(user_id: str, table: str) -> None:
+    dashboard_cache.invalidate(user_id, table)
+
+
+def get_cache_stats() -> dict:
+    return dashboard_cache.stats()
@@ -1,18 +1,33 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import copy
+import hashlib
 import logging
-import os
-import re
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Awaitable, Callable, List, Tuple, Optional
 
 import anthropic
 
-from schemas.log_schemas import LogEntry, parse_log
+from config.settings import (
+    ANTHROPIC_API_KEY,
+    ANTHROPIC_MAX_CONCURRENCY,
+    ANTHROPIC_MAX_RETRIES,
+    ANTHROPIC_TIMEOUT_SECONDS,
+    EXTRACTION_BATCH_SIZE,
+    EXTRACTION_BATCH_WAIT_MS,
+    EXTRACTION_CACHE_PATH,
+    EXTRACTION_CACHE_SIZE,
+    EXTRACTION_CACHE_TTL_SECONDS,
+)
+from schemas.log_schemas import LogEntry, batch_json_schema, entries_json_schema
+from services.extraction_cache import ExtractionCache
+from services.fast_parser import parse_structured
 from services.validation_service import validate_log
+from utils.helpers import JsonObjectStream, MicroBatcher
 
 logger = logging.getLogger("nutriclaude.claude")
 
@@ -25,30 +40,210 @@ def _load_system_prompt() -> str:
 
 SYSTEM_PROMPT = _load_system_prompt()
 
-client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-
-def _extract_json(text: str) -> str:
-    """Extract JSON from Claude's response, handling markdown fences and extra text."""
-    # Try to find JSON in code fences first
-    fence_match = re.search(r"```(?:json)?\s*\n?(.*?)\n?```", text, re.DOTALL)
-    if fence_match:
-        return fence_match.group(1).strip()
-
-    # Try to find a JSON array first
-    bracket_match = re.search(r"\[.*\]", text, re.DOTALL)
-    if bracket_match:
-        return bracket_match.group(0).strip()
+# Haiku 4.5 does not cache a prefix shorter than this; a cache_control
+# breakpoint before it is accepted and silently ignored.
+PROMPT_CACHE_MIN_TOKENS = 4096
+
+# The extraction prefix (tool definition plus this prompt) is identical on
+# every call, so the breakpoint on the system block caches both; per-message
+# content (timestamp, symptoms note) stays in the user turn after it.
+# count_prompt_prefix logs the prefix size at startup: if it is under
+# PROMPT_CACHE_MIN_TOKENS the breakpoint is ignored, which _record_usage
+# also reports from the first call's usage.
+SYSTEM_BLOCKS = [
+    {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}},
+]
+
+EASTERN = ZoneInfo("America/New_York")
+
+extraction_cache = ExtractionCache(
+    maxsize=EXTRACTION_CACHE_SIZE,
+    ttl=EXTRACTION_CACHE_TTL_SECONDS,
+    path=EXTRACTION_CACHE_PATH,
+    prompt_version=hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:12],
+)
+
+# Shared async client: one connection pool for the whole process, with a
+# semaphore capping how many Claude calls are in flight at once.
+client = anthropic.AsyncAnthropic(
+    api_key=ANTHROPIC_API_KEY,
+    timeout=ANTHROPIC_TIMEOUT_SECONDS,
+    max_retries=ANTHROPIC_MAX_RETRIES,
+)
+_semaphore = asyncio.Semaphore(ANTHROPIC_MAX_CONCURRENCY)
+
+_usage = {
+    "calls": 0,
+    "input_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "cache_read_input_tokens": 0,
+    "output_tokens": 0,
+    # Calls with a cache breakpoint that neither read nor wrote the cache
+    "cache_ignored": 0,
+}
+# The extraction prefix as counted by count_prompt_prefix
+_prefix_tokens: Optional[int] = None
+
+
+def _cache_breakpoint(request: dict) -> bool:
+    """Whether a Messages API request marks any block with cache_control."""
+    blocks = list(request.get("tools") or [])
+    if isinstance(request.get("system"), list):
+        blocks += request["system"]
+    for message in request.get("messages") or []:
+        if isinstance(message.get("content"), list):
+            blocks += message["content"]
+    return any(isinstance(block, dict) and "cache_control" in block for block in blocks)
+
+
+def _record_usage(usage, cache_breakpoint: bool = False) -> None:
+    """Accumulate token usage, including prompt-cache reads and writes.
+
+    A request with a cache breakpoint whose usage shows no cache read or
+    write had its breakpoint ignored, usually because the prefix is under
+    PROMPT_CACHE_MIN_TOKENS. Every such call is counted; the first is
+    logged as a warning, the rest at info level.
+    """
+    _usage["calls"] += 1
+    for field in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens"):
+        _usage[field] += getattr(usage, field, None) or 0
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_creation = getattr(usage, "cache_creation_input_tokens", None) or 0
+    logger.info(
+        f"Claude usage: input={usage.input_tokens} "
+        f"cache_read={cache_read} "
+        f"cache_creation={cache_creation} "
+        f"output={usage.output_tokens}"
+    )
+    if cache_breakpoint and not cache_read and not cache_creation:
+        _usage["cache_ignored"] += 1
+        logger.log(
+            logging.WARNING if _usage["cache_ignored"] == 1 else logging.INFO,
+            f"Prompt cache breakpoint ignored ({usage.input_tokens} input tokens); "
+            f"the cached prefix may be under {PROMPT_CACHE_MIN_TOKENS} tokens",
+        )
 
-    # Try to find a JSON object
-    brace_match = re.search(r"\{.*\}", text, re.DOTALL)
-    if brace_match:
-        return brace_match.group(0).strip()
 
-    return text.strip()
+def get_usage_stats() -> dict:
+    prompt_tokens = (
+        _usage["input_tokens"]
+        + _usage["cache_creation_input_tokens"]
+        + _usage["cache_read_input_tokens"]
+    )
+    return {
+        **_usage,
+        "prefix_tokens": _prefix_tokens,
+        "cache_hit_rate": round(_usage["cache_read_input_tokens"] / prompt_tokens, 3) if prompt_tokens else None,
+    }
+
+
+# Extraction goes through one forced tool call whose input schema is
+# generated from the log models, so the output arrives as parsed JSON.
+EXTRACTION_TOOL = {
+    "name": "record_entries",
+    "description": "Record every log entry extracted from the user's message.",
+    "input_schema": entries_json_schema(),
+}
+
+# Same extraction for several users' messages at once, keyed by message_id
+BATCH_EXTRACTION_TOOL = {
+    "name": "record_batch",
+    "description": "Record the log entries extracted from each user message, one result per message_id.",
+    "input_schema": batch_json_schema(),
+}
+
+# Output budget per extracted message. A record_batch call gets this much per
+# message up to MODEL_MAX_OUTPUT; larger batches are split. Haiku 4.5 can
+# write 64k tokens, but record_batch is not streamed and the SDK refuses
+# non-streaming requests whose max_tokens implies more than 10 minutes (~21k).
+EXTRACTION_MAX_TOKENS = 1024
+MODEL_MAX_OUTPUT = 16384
+
+_extraction = {
+    "calls": 0,
+    "parse_failures": 0,
+    "validation_failures": 0,
+    "repair_attempts": 0,
+    "repair_successes": 0,
+}
+
+
+def get_extraction_stats() -> dict:
+    return {**_extraction, "batching": _batcher.stats() if _batcher is not None else None}
+
+
+# Messages parsed by the rule-based fast path vs. sent on to the cache/Claude
+_fast_path = {"local": 0, "fallback": 0}
+
+
+def get_fast_path_stats() -> dict:
+    total = _fast_path["local"] + _fast_path["fallback"]
+    return {
+        **_fast_path,
+        "local_fraction": round(_fast_path["local"] / total, 3) if total else None,
+        "estimated_ms_saved": round(_fast_path["local"] * extraction_cache.avg_llm_ms()),
+    }
+
+
+async def _create_message(**kwargs):
+    """Call the Messages API without blocking the event loop."""
+    async with _semaphore:
+        response = await client.messages.create(**kwargs)
+    _record_usage(response.usage, _cache_breakpoint(kwargs))
+    return response
+
+
+async def _stream_message(on_json: Optional[Callable[[str], None]], **kwargs):
+    """Stream a Messages API call, handing each tool-input JSON delta to `on_json`; returns the final message.
+
+    `on_json` runs while the call holds a concurrency slot, so it is a plain
+    function: anything slow it triggers (Telegram edits) belongs in a task
+    of its own.
+    """
+    async with _semaphore:
+        async with client.messages.stream(**kwargs) as stream:
+            async for event in stream:
+                if (
+                    on_json is not None
+                    and event.type == "content_block_delta"
+                    and event.delta.type == "input_json_delta"
+                ):
+                    on_json(event.delta.partial_json)
+            response = await stream.get_final_message()
+    _record_usage(response.usage, _cache_breakpoint(kwargs))
+    return response
+
+
+async def count_prompt_prefix() -> Optional[int]:
+    """Count the cached extraction prefix (tool and system prompt) with
+    count_tokens and log it against PROMPT_CACHE_MIN_TOKENS; run once at
+    startup. The count is also reported as prefix_tokens in the usage stats.
+    """
+    global _prefix_tokens
+    try:
+        result = await client.messages.count_tokens(
+            model="claude-haiku-4-5-20251001",
+            system=SYSTEM_BLOCKS,
+            tools=[EXTRACTION_TOOL],
+            tool_choice={"type": "tool", "name": EXTRACTION_TOOL["name"]},
+            # The shortest user turn; everything else is the prefix
+            messages=[{"role": "user", "content": "."}],
+        )
+    except Exception:
+        logger.exception("Could not count the extraction prompt prefix")
+        return None
+    tokens = _prefix_tokens = result.input_tokens
+    if tokens < PROMPT_CACHE_MIN_TOKENS:
+        logger.warning(
+            f"Extraction prompt prefix is {tokens} tokens, under the {PROMPT_CACHE_MIN_TOKENS}-token "
+            f"caching minimum; its cache breakpoint will be ignored"
+        )
+    else:
+        logger.info(f"Extraction prompt prefix is {tokens} tokens and will be cached")
+    return tokens
 
 
-def summarize_workout(workouts: list, exercises: list) -> str:
+async def summarize_workout(workouts: list, exercises: list) -> str:
     """Generate a 2-3 sentence workout summary using Claude Haiku."""
     parts = []
     for w in workouts:
@@ -64,7 +259,7 @@ def summarize_workout(workouts: list, exercises: list) -> str:
         + "\n".join(parts)
     )
 
-    response = client.messages.create(
+    response = await _create_message(
         model="claude-haiku-4-5-20251001",
         max_tokens=256,
         messages=[{"role": "user", "content": prompt}],
@@ -72,51 +267,9 @@ def summarize_workout(workouts: list, exercises: list) -> str:
     return response.content[0].text.strip()
 
 
-async def extract_log(message: str, symptoms_mode: bool = False) -> Tuple[bool, Optional[List[LogEntry]], Optional[List[dict]], Optional[str]]:
-    """Send a user message to Claude and extract structured log data.
-
-    Returns:
-        (success, list_of_parsed_logs, list_of_raw_dicts, error_message)
-    """
-    eastern = ZoneInfo("America/New_York")
-    current_time = datetime.now(eastern).isoformat()
-
-    user_message = f"Current date/time (US Eastern): {current_time}\n\nUser message: {message}"
-
-    if symptoms_mode:
-        user_message += (
-            "\n\nNote: The user has symptom tracking enabled. "
-            "If this is a wellness log, extract a `symptom` field (free-text description of the symptom) in addition to `symptom_score`."
-        )
-
-    try:
-        response = client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=1024,
-            system=SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": user_message}],
-        )
-    except anthropic.APIError as e:
-        logger.error(f"Claude API error: {e}")
-        return False, None, None, f"Claude API error: {e}"
-
-    raw_text = response.content[0].text
-    logger.info(f"Claude raw response: {raw_text}")
-
-    json_text = _extract_json(raw_text)
-
-    try:
-        data = json.loads(json_text)
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parse failed. Extracted text: {json_text}")
-        return False, None, None, f"Claude returned invalid JSON: {e}"
-
-    # Normalize to list
-    if isinstance(data, dict):
-        data = [data]
-
-    # Fix timestamps: inject if missing, override date to today (keep LLM's time)
-    today = datetime.now(eastern).date()
+def _fix_timestamps(data: List[dict], current_time: str) -> None:
+    """Inject missing timestamps and override each entry's date to today (keep the LLM's time)."""
+    today = datetime.now(EASTERN).date()
     for entry in data:
         if "timestamp" not in entry:
             entry["timestamp"] = current_time
@@ -124,13 +277,15 @@ async def extract_log(message: str, symptoms_mode: bool = False) -> Tuple[bool,
             try:
                 parsed = datetime.fromisoformat(entry["timestamp"])
                 if parsed.tzinfo is None:
-                    parsed = parsed.replace(tzinfo=eastern)
+                    parsed = parsed.replace(tzinfo=EASTERN)
                 corrected = parsed.replace(year=today.year, month=today.month, day=today.day)
                 entry["timestamp"] = corrected.isoformat()
             except (ValueError, TypeError):
                 entry["timestamp"] = current_time
 
-    # Validate each entry
+
+def _validate_entries(data: List[dict]) -> Tuple[bool, Optional[List[LogEntry]], Optional[List[dict]], Optional[str]]:
+    """Validate each entry, keeping the ones that pass."""
     logs = []
     raw_dicts = []
     errors = []
@@ -149,3 +304,318 @@ async def extract_log(message: str, symptoms_mode: bool = False) -> Tuple[bool,
         logger.warning(f"Some entries failed validation: {'; '.join(errors)}")
 
     return True, logs, raw_dicts, None
+
+
+def _entries_from(response) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """Pull the entries list out of the record_entries tool call."""
+    for block in response.content:
+        if block.type == "tool_use" and block.name == EXTRACTION_TOOL["name"]:
+            entries = block.input.get("entries") if isinstance(block.input, dict) else None
+            if isinstance(entries, list) and all(isinstance(e, dict) for e in entries):
+                return entries, None
+            return None, "record_entries input must be an object with an `entries` array of objects"
+    return None, "Claude did not call record_entries"
+
+
+def _entry_errors(entries: List[dict], current_time: str) -> List[str]:
+    """Validation errors for the entries as they will be validated later, one line each."""
+    errors = []
+    for i, entry in enumerate(entries):
+        entry = copy.deepcopy(entry)
+        _fix_timestamps([entry], current_time)
+        valid, _, error = validate_log(entry)
+        if not valid:
+            errors.append(f"entries[{i}] ({entry.get('type', '?')}): {error}")
+    return errors
+
+
+_SYMPTOMS_NOTE = (
+    "\n\nNote: The user has symptom tracking enabled. "
+    "If this is a wellness log, extract a `symptom` field (free-text description of the symptom) in addition to `symptom_score`."
+)
+
+
+async def _call_extraction(
+    message: str,
+    symptoms_mode: bool,
+    current_time: str,
+    on_object: Optional[Callable[[dict], Awaitable[None]]] = None,
+) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """Ask Claude to extract entries from one message via the record_entries tool.
+
+    The tool input is streamed; each entry object is queued for `on_object`
+    as soon as it closes and handed over by a separate task, so a slow
+    `on_object` never holds the call's concurrency slot. Entries still queued
+    when the stream ends are dropped, since the full result supersedes them;
+    one already being handled is waited for. If the call is malformed or any
+    entry fails validation, the errors are sent back as the tool result for
+    one repair attempt, in the same conversation rather than from scratch.
+
+    Returns:
+        (list_of_raw_entries, error_message)
+    """
+    user_message = f"Current date/time (US Eastern): {current_time}\n\nUser message: {message}"
+    if symptoms_mode:
+        user_message += _SYMPTOMS_NOTE
+
+    objects = JsonObjectStream(containers=[("{", "[")])
+    previews: asyncio.Queue = asyncio.Queue()
+
+    def on_json(partial: str) -> None:
+        for entry in objects.feed(partial):
+            previews.put_nowait(entry)
+
+    async def show_previews() -> None:
+        while (entry := await previews.get()) is not None:
+            try:
+                await on_object(entry)
+            except Exception:
+                logger.exception("Entry preview failed")
+
+    messages = [{"role": "user", "content": user_message}]
+    request = dict(
+        model="claude-haiku-4-5-20251001",
+        max_tokens=EXTRACTION_MAX_TOKENS,
+        system=SYSTEM_BLOCKS,
+        tools=[EXTRACTION_TOOL],
+        tool_choice={"type": "tool", "name": EXTRACTION_TOOL["name"]},
+    )
+
+    previewer = asyncio.create_task(show_previews()) if on_object is not None else None
+    started = time.monotonic()
+    try:
+        response = await _stream_message(on_json if previewer is not None else None, messages=messages, **request)
+    except anthropic.APIError as e:
+        logger.error(f"Claude API error: {e}")
+        return None, f"Claude API error: {e}"
+    finally:
+        if previewer is not None:
+            while not previews.empty():
+                previews.get_nowait()
+            previews.put_nowait(None)
+            await previewer
+    extraction_cache.record_llm_latency(time.monotonic() - started)
+    _extraction["calls"] += 1
+
+    entries, error = _entries_from(response)
+    if entries is None:
+        _extraction["parse_failures"] += 1
+        problems = [error]
+    else:
+        problems = _entry_errors(entries, current_time)
+        if problems:
+            _extraction["validation_failures"] += 1
+    if not problems:
+        return entries, None
+
+    logger.warning(f"Extraction needs repair: {'; '.join(problems)}")
+    tool_use = next((b for b in response.content if b.type == "tool_use"), None)
+    if tool_use is None:
+        return _keep_valid(entries, problems, current_time)
+
+    _extraction["repair_attempts"] += 1
+    messages += [
+        {
+            "role": "assistant",
+            "content": [{"type": "tool_use", "id": tool_use.id, "name": tool_use.name, "input": tool_use.input}],
+        },
+        {
+            "role": "user",
+            "content": [{
+                "type": "tool_result",
+                "tool_use_id": tool_use.id,
+                "is_error": True,
+                "content": (
+                    "These entries are invalid:\n" + "\n".join(problems)
+                    + "\nCall record_entries again with every entry corrected."
+                ),
+            }],
+        },
+    ]
+    try:
+        repaired = await _stream_message(None, messages=messages, **request)
+    except anthropic.APIError as e:
+        logger.error(f"Claude API error during repair: {e}")
+        return _keep_valid(entries, problems, current_time)
+
+    repaired_entries, repaired_error = _entries_from(repaired)
+    if repaired_entries is None:
+        _extraction["parse_failures"] += 1
+        return _keep_valid(entries, problems, current_time)
+    repaired_problems = _entry_errors(repaired_entries, current_time)
+    if repaired_problems:
+        logger.warning(f"Repair left invalid entries: {'; '.join(repaired_problems)}")
+        return _keep_valid(entries, problems, current_time)
+    _extraction["repair_successes"] += 1
+    return repaired_entries, None
+
+
+def _keep_valid(
+    entries: Optional[List[dict]],
+    problems: List[str],
+    current_time: str,
+) -> Tuple[Optional[List[dict]], str]:
+    """The entries of an unrepaired extraction that validate, with an error for the rest.
+
+    The entries are None when none of them validate.
+    """
+    kept = [e for e in entries or [] if not _entry_errors([e], current_time)]
+    return kept or None, f"Could not extract every entry: {'; '.join(problems)}"
+
+
+async def _call_extraction_batch(
+    items: List[Tuple[str, bool, str]],
+) -> List[Tuple[Optional[List[dict]], Optional[str]]]:
+    """Extract several (message, symptoms_mode, current_time) items in one record_batch call.
+
+    Each message is tagged with an id and the results are matched back by
+    it. A message missing from the results, or whose entries fail
+    validation, is retried on its own through `_call_extraction`, and so is
+    every message of a batch the API rejects as a bad request. Any other API
+    error is returned for every message. Batches too large for
+    MODEL_MAX_OUTPUT are split into concurrent calls.
+    """
+    if len(items) == 1:
+        return [await _call_extraction(*items[0])]
+
+    per_call = MODEL_MAX_OUTPUT // EXTRACTION_MAX_TOKENS
+    if len(items) > per_call:
+        chunks = await asyncio.gather(*(
+            _call_extraction_batch(items[i:i + per_call]) for i in range(0, len(items), per_call)
+        ))
+        return [result for chunk in chunks for result in chunk]
+
+    parts = [
+        "Extract the log entries from each user message below independently, "
+        "as if it were the only message. Call record_batch with exactly one "
+        "result per message_id."
+    ]
+    for i, (message, symptoms_mode, current_time) in enumerate(items):
+        note = _SYMPTOMS_NOTE.strip() if symptoms_mode else ""
+        parts.append(
+            f"<message id=\"m{i}\">\nCurrent date/time (US Eastern): {current_time}\n"
+            f"{note}\nUser message: {message}\n</message>"
+        )
+
+    started = time.monotonic()
+    try:
+        response = await _create_message(
+            model="claude-haiku-4-5-20251001",
+            max_tokens=min(EXTRACTION_MAX_TOKENS * len(items), MODEL_MAX_OUTPUT),
+            system=SYSTEM_BLOCKS,
+            tools=[BATCH_EXTRACTION_TOOL],
+            tool_choice={"type": "tool", "name": BATCH_EXTRACTION_TOOL["name"]},
+            messages=[{"role": "user", "content": "\n\n".join(parts)}],
+        )
+    except (anthropic.BadRequestError, anthropic.UnprocessableEntityError, anthropic.APIResponseValidationError) as e:
+        # The batched request or its response was the problem; each message may go through on its own
+        logger.warning(f"Batched extraction failed ({e}); retrying {len(items)} messages individually")
+        return list(await asyncio.gather(*(_call_extraction(*item) for item in items)))
+    except anthropic.APIError as e:
+        # Auth, rate limit, overload and connection errors would fail the same
+        # way for every message, and the client has already retried them with
+        # backoff (ANTHROPIC_MAX_RETRIES); one call per message would only add load
+        logger.error(f"Claude API error: {e}")
+        return [(None, f"Claude API error: {e}")] * len(items)
+    extraction_cache.record_llm_latency(time.monotonic() - started)
+    _extraction["calls"] += 1
+
+    by_id = {}
+    for block in response.content:
+        if block.type == "tool_use" and block.name == BATCH_EXTRACTION_TOOL["name"] and isinstance(block.input, dict):
+            for result in block.input.get("results") or []:
+                entries = result.get("entries") if isinstance(result, dict) else None
+                if isinstance(entries, list) and all(isinstance(e, dict) for e in entries):
+                    by_id[result.get("message_id")] = entries
+
+    results = []
+    retry = []
+    for i, (message, symptoms_mode, current_time) in enumerate(items):
+        entries = by_id.get(f"m{i}")
+        if entries is None or _entry_errors(entries, current_time):
+            retry.append(i)
+        results.append((entries, None))
+    if retry:
+        logger.warning(f"Batched extraction retrying {len(retry)} of {len(items)} messages individually")
+        retried = await asyncio.gather(*(_call_extraction(*items[i]) for i in retry))
+        for i, result in zip(retry, retried):
+            results[i] = result
+    return results
+
+
+# Off unless EXTRACTION_BATCH_SIZE > 1; batched messages get no streamed previews.
+_batcher: Optional[MicroBatcher] = (
+    MicroBatcher(_call_extraction_batch, EXTRACTION_BATCH_SIZE, EXTRACTION_BATCH_WAIT_MS / 1000)
+    if EXTRACTION_BATCH_SIZE > 1 else None
+)
+
+
+async def extract_log(
+    message: str,
+    symptoms_mode: bool = False,
+    user_id: Optional[str] = None,
+    on_entry: Optional[Callable[[LogEntry, dict], Awaitable[None]]] = None,
+) -> Tuple[bool, Optional[List[LogEntry]], Optional[List[dict]], Optional[str]]:
+    """Extract structured log data from a user message.
+
+    Fully structured messages are parsed locally; everything else goes
+    through the extraction cache, then Claude. While Claude streams, each
+    entry that validates is passed to `on_entry` as soon as it is complete,
+    ahead of the final result. With EXTRACTION_BATCH_SIZE > 1, concurrent
+    messages share one Claude call instead and `on_entry` is not used.
+
+    Returns:
+        (success, list_of_parsed_logs, list_of_raw_dicts, error_message)
+
+        error_message can accompany a success when Claude's output for some
+        entries stayed invalid after the repair attempt and they were dropped.
+    """
+    current_time = datetime.now(EASTERN).isoformat()
+
+    data = parse_structured(message)
+    if data is not None:
+        _fix_timestamps(data, current_time)
+        result = _validate_entries(data)
+        if result[0] and len(result[1]) == len(data):
+            _fast_path["local"] += 1
+            return result
+    _fast_path["fallback"] += 1
+
+    data = await extraction_cache.get(user_id, message, symptoms_mode)
+    cache_hit = data is not None
+    error = None
+    if not cache_hit:
+        async def preview(entry: dict) -> None:
+            entry = copy.deepcopy(entry)
+            _fix_timestamps([entry], current_time)
+            valid, log, _ = validate_log(entry)
+            if valid and log.type != "unknown":
+                await on_entry(log, entry)
+
+        if _batcher is not None:
+            data, error = await _batcher.submit((message, symptoms_mode, current_time))
+        else:
+            data, error = await _call_extraction(
+                message, symptoms_mode, current_time, preview if on_entry is not None else None,
+            )
+        if data is None:
+            return False, None, None, error
+    llm_entries = copy.deepcopy(data)
+
+    _fix_timestamps(data, current_time)
+    result = _validate_entries(data)
+
+    # Only cache extractions that fully validated into known types
+    success, logs, raw_dicts, _ = result
+    if success and error is not None:
+        result = (success, logs, raw_dicts, error)
+    if (
+        not cache_hit
+        and error is None
+        and success
+        and len(logs) == len(data)
+        and all(log.type != "unknown" for log in logs)
+    ):
+        await extraction_cache.put(user_id, message, symptoms_mode, llm_entries, current_time)
+
+    return result
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Hashable, Set, Tuple
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger("nutriclaude.dispatcher")
+
+
+def lane_key(update: object) -> Hashable:
+    """Updates from the same Telegram user share a lane; anything else gets its own."""
+    user = getattr(update, "effective_user", None)
+    return user.id if user is not None else object()
+
+
+class LaneDispatcher:
+    """Run work in per-key FIFO lanes with a global concurrency cap.
+
+    Items submitted under one key (a Telegram user) run strictly one after
+    another in submission order; different keys run in parallel, at most
+    `max_concurrent` at a time. `submit` blocks once `max_pending` items are
+    queued or running. That only slows the source of updates if the feeder
+    awaits each submit before taking the next update: the webhook worker
+    pool does, and so does python-telegram-bot's update fetcher with
+    LaneUpdateProcessor, which stalls getUpdates polling once the bounded
+    update queue between them fills.
+    """
+
+    def __init__(self, max_concurrent: int, max_pending: int):
+        self._running = asyncio.Semaphore(max_concurrent)
+        self._slots = asyncio.Semaphore(max_pending)
+        self._lanes: Dict[Hashable, Deque[Tuple[float, Awaitable[Any], asyncio.Future]]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.pending = 0
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def submit(self, key: Hashable, coroutine: Awaitable[Any]) -> asyncio.Future:
+        """Queue `coroutine` on `key`'s lane; the returned future resolves when it has run."""
+        await self._slots.acquire()
+        future = asyncio.get_running_loop().create_future()
+        item = (time.monotonic(), coroutine, future)
+        self.pending += 1
+        self._idle.clear()
+
+        lane = self._lanes.get(key)
+        if lane is not None:
+            lane.append(item)
+        else:
+            lane = self._lanes[key] = deque([item])
+            task = asyncio.create_task(self._drain(key, lane))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return future
+
+    async def _drain(self, key: Hashable, lane: Deque) -> None:
+        try:
+            while lane:
+                enqueued, coroutine, future = lane[0]
+                async with self._running:
+                    waited = time.monotonic() - enqueued
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+                    self.in_flight += 1
+                    try:
+                        await coroutine
+                    except Exception:
+                        self.failed += 1
+                        logger.exception("Dispatched update failed")
+                    finally:
+                        self.in_flight -= 1
+                lane.popleft()
+                self.pending -= 1
+                if not self.pending:
+                    self._idle.set()
+                self.processed += 1
+                self._slots.release()
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            # No await between the empty-lane check and removal, so a
+            # concurrent submit either lands in this lane or starts a new one.
+            self._lanes.pop(key, None)
+
+    async def join(self) -> None:
+        """Wait until nothing is queued or running."""
+        await self._idle.wait()
+
+    async def shutdown(self) -> None:
+        """Cancel lane drainers and discard anything still queued."""
+        lanes = list(self._lanes.values())
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for lane in lanes:
+            for _, coroutine, future in lane:
+                if hasattr(coroutine, "close"):
+                    coroutine.close()
+                future.cancel()
+        self._lanes.clear()
+        self.pending = 0
+        self._idle.set()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.pending - self.in_flight,
+            "in_flight": self.in_flight,
+            "active_lanes": len(self._lanes),
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_lane_wait_ms": round(1000 * self._wait_total / self.processed, 1) if self.processed else None,
+            "max_lane_wait_ms": round(1000 * self._wait_max, 1),
+        }
+
+
+class LaneUpdateProcessor(BaseUpdateProcessor):
+    """python-telegram-bot update processor that routes updates through a LaneDispatcher.
+
+    It declares a concurrency of one, so Application's update fetcher
+    awaits each `do_process_update` instead of starting a task per update;
+    that call returns once the update is queued on its lane. While the
+    dispatcher is full the fetcher waits, the application's bounded
+    update_queue fills, and the Updater blocks putting into it instead of
+    calling getUpdates again. On shutdown, queued updates get up to
+    `drain_timeout` seconds to finish before they are discarded.
+    """
+
+    def __init__(self, dispatcher: LaneDispatcher, drain_timeout: float = 10.0):
+        super().__init__(max_concurrent_updates=1)
+        self.dispatcher = dispatcher
+        self._drain_timeout = drain_timeout
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await self.dispatcher.submit(lane_key(update), coroutine)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        try:
+            await asyncio.wait_for(self.dispatcher.join(), self._drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Discarding {self.dispatcher.pending} updates still queued at shutdown")
+        await self.dispatcher.shutdown()
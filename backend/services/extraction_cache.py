@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from cachetools import TTLCache
+
+logger = logging.getLogger("nutriclaude.extraction_cache")
+
+GLOBAL_SCOPE = "*"
+
+# An LLM timestamp this close to the request time means "now" rather than a
+# time the user stated, so it is dropped before caching and re-stamped on hits.
+# Any other timestamp may be relative to the request ("an hour ago"), so an
+# extraction carrying one is not cached at all.
+_NOW_TOLERANCE_SECONDS = 120
+
+# Part of every key; bumped when what gets stored changes, so entries
+# persisted under the old rules are never read (v2: no stated times)
+_FORMAT_VERSION = 2
+
+
+def normalize_message(message: str) -> str:
+    """Canonical form used as the cache key: lowercase, single spaces, no trailing punctuation."""
+    text = re.sub(r"\s+", " ", message.strip().lower())
+    return text.rstrip(".!?,; ")
+
+
+def _cacheable_entries(entries: List[dict], current_time: str) -> Optional[List[dict]]:
+    """`entries` without their "now" timestamps, or None if any has another time."""
+    now = datetime.fromisoformat(current_time)
+    stripped = []
+    for entry in entries:
+        entry = dict(entry)
+        ts = entry.pop("timestamp", None)
+        if ts is not None:
+            try:
+                parsed = datetime.fromisoformat(ts)
+            except (ValueError, TypeError):
+                # Re-stamped with the request time anyway
+                parsed = now
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=now.tzinfo)
+            if abs((parsed - now).total_seconds()) > _NOW_TOLERANCE_SECONDS:
+                return None
+        stripped.append(entry)
+    return stripped
+
+
+class ExtractionCache:
+    """Normalized-message -> extracted-entries cache with per-user and global tiers.
+
+    Both tiers live in an in-process TTL/LRU cache; when EXTRACTION_CACHE_PATH
+    is set they are also persisted to SQLite so hits survive restarts. Keys
+    include a hash of the system prompt, so editing the prompt invalidates
+    everything extracted with the old one.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, path: str = "", prompt_version: str = ""):
+        self._memory: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._ttl = ttl
+        self._prompt_version = prompt_version
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS extraction_cache ("
+                " scope TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL, PRIMARY KEY (scope, key))"
+            )
+            self._db.commit()
+        self.user_hits = 0
+        self.global_hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._llm_calls = 0
+        self._llm_seconds = 0.0
+
+    def _key(self, message: str, symptoms_mode: bool) -> str:
+        raw = f"{_FORMAT_VERSION}|{self._prompt_version}|{int(symptoms_mode)}|{normalize_message(message)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _db_get(self, scope: str, key: str) -> Optional[List[dict]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT payload, created_at FROM extraction_cache WHERE scope = ? AND key = ?",
+                (scope, key),
+            ).fetchone()
+        if row is None or time.time() - row[1] > self._ttl:
+            return None
+        return json.loads(row[0])
+
+    def _db_put(self, scopes: Tuple[str, ...], key: str, payload: str) -> None:
+        now = time.time()
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO extraction_cache (scope, key, payload, created_at) VALUES (?, ?, ?, ?)",
+                [(scope, key, payload, now) for scope in scopes],
+            )
+            self._db.commit()
+
+    async def get(self, user_id: Optional[str], message: str, symptoms_mode: bool) -> Optional[List[dict]]:
+        """Return a fresh copy of the cached entries (user tier first), or None."""
+        key = self._key(message, symptoms_mode)
+        scopes = ([str(user_id)] if user_id else []) + [GLOBAL_SCOPE]
+        for scope in scopes:
+            entries = self._memory.get((scope, key))
+            if entries is None and self._db is not None:
+                entries = await asyncio.to_thread(self._db_get, scope, key)
+                if entries is not None:
+                    self._memory[(scope, key)] = entries
+            if entries is not None:
+                if scope == GLOBAL_SCOPE:
+                    self.global_hits += 1
+                else:
+                    self.user_hits += 1
+                logger.info(
+                    f"Extraction cache hit ({'global' if scope == GLOBAL_SCOPE else 'user'} tier), "
+                    f"saved ~{self.avg_llm_ms():.0f} ms"
+                )
+                return copy.deepcopy(entries)
+        self.misses += 1
+        return None
+
+    async def put(
+        self,
+        user_id: Optional[str],
+        message: str,
+        symptoms_mode: bool,
+        entries: List[dict],
+        current_time: str,
+    ) -> None:
+        entries = _cacheable_entries(entries, current_time)
+        if entries is None:
+            self.uncacheable += 1
+            return
+        key = self._key(message, symptoms_mode)
+        scopes = ((str(user_id),) if user_id else ()) + (GLOBAL_SCOPE,)
+        for scope in scopes:
+            self._memory[(scope, key)] = entries
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, scopes, key, json.dumps(entries))
+
+    def record_llm_latency(self, seconds: float) -> None:
+        self._llm_calls += 1
+        self._llm_seconds += seconds
+
+    def avg_llm_ms(self) -> float:
+        return 1000 * self._llm_seconds / self._llm_calls if self._llm_calls else 0.0
+
+    def stats(self) -> dict:
+        hits = self.user_hits + self.global_hits
+        lookups = hits + self.misses
+        return {
+            "user_hits": self.user_hits,
+            "global_hits": self.global_hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "avg_llm_ms": round(self.avg_llm_ms()),
+            "estimated_ms_saved": round(hits * self.avg_llm_ms()),
+        }
@@ -0,0 +1,144 @@
+"""Deterministic parser for messages that need no LLM to understand.
+
+Only messages that match one of a few strict, whole-message patterns are
+parsed here (e.g. "weighed 182.4", "fatigue 7/10", "session was 9/10",
+"bench 3x5 @ 185"); anything else returns None and goes to Claude. Entries
+are built without a timestamp, exactly like an LLM extraction of a message
+with no stated time, so the caller's timestamp handling applies unchanged.
+"""
+from __future__ import annotations
+
+import re
+from typing import Callable, List, Optional
+
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_SCORE = r"(10|\d)\s*(?:/|out of)\s*10"
+
+_BODYWEIGHT = re.compile(
+    rf"(?:weighed(?: in)?(?: at)?|weigh-?in|weight|bw|scale)\s*:?\s*{_NUMBER}\s*(lbs?|pounds|kg)?"
+)
+_WELLNESS = re.compile(rf"(fatigue|headache|nausea|soreness|malaise)\s*(?:is|was|at)?\s*:?\s*{_SCORE}")
+_WORKOUT_QUALITY = re.compile(
+    rf"(?:workout|session|training)(?: quality)?\s*(?:was|felt|is)?\s*:?\s*{_SCORE}"
+)
+# The weight is required and set off from the reps by whitespace, "@" or
+# "at", so the reps can never be split to make up a weight ("3x10" is not
+# 3x1 @ 0); messages without a weight go to Claude.
+_EXERCISE_SETS_FIRST = re.compile(
+    rf"([a-z][a-z ]*?)\s+(\d+)\s*x\s*(\d+)(?:\s*(?:@|at)\s*|\s+){_NUMBER}\s*(lbs?|kg)?"
+)
+_EXERCISE_WEIGHT_FIRST = re.compile(
+    rf"([a-z][a-z ]*?)\s+{_NUMBER}\s*(lbs?|kg)?\s+(\d+)\s*x\s*(\d+)"
+)
+
+# Names the system prompt asks Claude to normalize; anything not listed here
+# goes to Claude so the stored names stay identical either way.
+EXERCISE_NAMES = {
+    "bench": "Bench Press",
+    "bench press": "Bench Press",
+    "squat": "Squat",
+    "squats": "Squat",
+    "deadlift": "Deadlift",
+    "deadlifts": "Deadlift",
+    "dl": "Deadlift",
+    "ohp": "Overhead Press",
+    "overhead press": "Overhead Press",
+    "incline db press": "Incline DB Press",
+}
+
+# Realistic adult bodyweight, in lbs
+_MIN_WEIGHT_LBS = 60
+_MAX_WEIGHT_LBS = 700
+
+_KG_TO_LBS = 2.2
+
+
+def _normalize(message: str) -> str:
+    return re.sub(r"\s+", " ", message.strip().lower()).rstrip(".!")
+
+
+def _parse_bodyweight(text: str) -> Optional[dict]:
+    m = _BODYWEIGHT.fullmatch(text)
+    if m is None:
+        return None
+    weight = float(m.group(1))
+    if m.group(2) == "kg":
+        weight = round(weight * _KG_TO_LBS, 1)
+    if not _MIN_WEIGHT_LBS <= weight <= _MAX_WEIGHT_LBS:
+        return None
+    return {"type": "bodyweight", "weight_lbs": weight}
+
+
+def _parse_wellness(text: str) -> Optional[dict]:
+    m = _WELLNESS.fullmatch(text)
+    if m is None:
+        return None
+    return {"type": "wellness", "symptom_score": int(m.group(2)), "symptom": m.group(1)}
+
+
+def _parse_workout_quality(text: str) -> Optional[dict]:
+    m = _WORKOUT_QUALITY.fullmatch(text)
+    if m is None:
+        return None
+    return {"type": "workout_quality", "performance_score": int(m.group(1))}
+
+
+def _parse_exercise(text: str) -> Optional[dict]:
+    m = _EXERCISE_SETS_FIRST.fullmatch(text)
+    if m is not None:
+        name, sets, reps, weight, unit = m.groups()
+    else:
+        m = _EXERCISE_WEIGHT_FIRST.fullmatch(text)
+        if m is None:
+            return None
+        name, weight, unit, sets, reps = m.groups()
+
+    canonical = EXERCISE_NAMES.get(name.strip())
+    if canonical is None:
+        return None
+    weight_lbs = float(weight)
+    if unit == "kg":
+        weight_lbs = round(weight_lbs * _KG_TO_LBS * 2) / 2
+    return {
+        "type": "exercise",
+        "exercise_name": canonical,
+        "sets": int(sets),
+        "reps": int(reps),
+        "weight_lbs": weight_lbs,
+        "notes": None,
+    }
+
+
+_SINGLE_ENTRY_PARSERS: List[Callable[[str], Optional[dict]]] = [
+    _parse_bodyweight,
+    _parse_wellness,
+    _parse_workout_quality,
+]
+
+
+def parse_structured(message: str) -> Optional[List[dict]]:
+    """Return raw entries for a fully structured message, or None to fall back to Claude.
+
+    A message is one bodyweight, wellness or workout-quality entry, or one or
+    more exercise lines (split on newlines or semicolons). Every line must
+    parse, otherwise the whole message goes to Claude.
+    """
+    text = _normalize(message)
+    if not text:
+        return None
+
+    for parser in _SINGLE_ENTRY_PARSERS:
+        entry = parser(text)
+        if entry is not None:
+            return [entry]
+
+    entries = []
+    for line in re.split(r"[\n;]", message):
+        line = _normalize(line)
+        if not line:
+            continue
+        entry = _parse_exercise(line)
+        if entry is None:
+            return None
+        entries.append(entry)
+    return entries or None
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from services.supabase_service import acquire_lease, release_lease
+
+logger = logging.getLogger("nutriclaude.leases")
+
+
+def holder_id() -> str:
+    """A name for this process's claims, unique across hosts, workers and restarts."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Lease:
+    """A named lease in service_leases (migration 009), held by at most one process.
+
+    Whatever only one process may do at a time (polling Telegram, reaping
+    pending logs) does it only while `held`. `acquire` also renews, so the
+    holder keeps the lease by calling it more often than every `ttl` seconds;
+    if it stops, another process can take over once the lease expires.
+    """
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder_id()
+        self._valid_until = 0.0
+
+    @property
+    def held(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    async def acquire(self) -> bool:
+        """Take the lease, or renew it if this process already holds it."""
+        started = time.monotonic()
+        if await acquire_lease(self.name, self.holder, self.ttl):
+            # Counted from before the request, so this process stops relying
+            # on the lease no later than the database would hand it to another
+            self._valid_until = started + self.ttl
+            return True
+        self._valid_until = 0.0
+        return False
+
+    async def release(self) -> None:
+        if self.held:
+            self._valid_until = 0.0
+            await release_lease(self.name, self.holder)
+
+
+class LeaseKeeper:
+    """Keep renewing a lease and call back when this process gains or loses it.
+
+    Renews every ttl/3. A failed renewal keeps the lease until its local
+    expiry, so a brief database error does not hand it over.
+    """
+
+    def __init__(
+        self,
+        lease: Lease,
+        on_acquired: Callable[[], Awaitable[None]],
+        on_lost: Callable[[], Awaitable[None]],
+    ):
+        self.lease = lease
+        self._on_acquired = on_acquired
+        self._on_lost = on_lost
+        self._leading = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop(), name=f"lease-{self.lease.name}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._leading:
+            await self._on_lost()
+            self._leading = False
+        try:
+            await self.lease.release()
+        except Exception:
+            logger.exception(f"Could not release lease {self.lease.name}")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.lease.acquire()
+            except Exception:
+                logger.exception(f"Could not renew lease {self.lease.name}")
+            try:
+                if self.lease.held and not self._leading:
+                    await self._on_acquired()
+                    self._leading = True
+                    logger.info(f"Acquired lease {self.lease.name}")
+                elif not self.lease.held and self._leading:
+                    self._leading = False
+                    await self._on_lost()
+                    logger.info(f"Lost lease {self.lease.name}")
+            except Exception:
+                logger.exception(f"Lease {self.lease.name} callback failed")
+            await asyncio.sleep(self.lease.ttl / 3)
+
+    @property
+    def leading(self) -> bool:
+        return self._leading
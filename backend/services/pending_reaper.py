@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set, Tuple
+
+from telegram import Bot
+from telegram.error import TelegramError
+
+from services.leases import Lease
+from services.supabase_service import reap_pending_logs
+
+logger = logging.getLogger("nutriclaude.pending_reaper")
+
+EXPIRED_NOTICE = "Expired. Send the message again to log it."
+
+
+class PendingLogReaper:
+    """Periodically delete pending logs nobody confirmed within `ttl` seconds.
+
+    Each pass deletes in batches of `batch_size` until no expired rows are
+    left. When a bot is given, the confirmation messages of reaped rows get
+    an expiry notice appended, which also removes their buttons. With a
+    lease, only the worker process holding it runs passes.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        interval: float,
+        batch_size: int,
+        bot: Optional[Bot] = None,
+        lease: Optional[Lease] = None,
+    ):
+        self._ttl = ttl
+        self._interval = interval
+        self._batch_size = batch_size
+        self._bot = bot
+        self._lease = lease
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.reaped = 0
+        self.messages_expired = 0
+        self.last_reaped = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._loop(), name="pending-log-reaper")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._lease is not None:
+            try:
+                await self._lease.release()
+            except Exception:
+                logger.exception("Could not release the reaper lease")
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                if self._lease is None or await self._lease.acquire():
+                    await self.run_once()
+            except Exception:
+                logger.exception("Pending log reaper pass failed")
+            await asyncio.sleep(self._interval)
+
+    async def run_once(self) -> int:
+        """Reap every expired pending log; returns how many rows were deleted."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=self._ttl)).isoformat()
+        total = 0
+        messages: Set[Tuple[str, int, Optional[str]]] = set()
+        while True:
+            rows = await reap_pending_logs(cutoff, self._batch_size)
+            total += len(rows)
+            messages.update(
+                (r["telegram_chat_id"], r["telegram_message_id"], r.get("telegram_message_text"))
+                for r in rows if r.get("telegram_message_id")
+            )
+            if len(rows) < self._batch_size:
+                break
+
+        expired = await self._expire_messages(messages) if self._bot is not None else 0
+        self.runs += 1
+        self.reaped += total
+        self.messages_expired += expired
+        self.last_reaped = total
+        if total:
+            logger.info(f"Reaped {total} pending logs older than {self._ttl:.0f}s, expired {expired} messages")
+        return total
+
+    async def _expire_messages(self, messages: Set[Tuple[str, int, Optional[str]]]) -> int:
+        expired = 0
+        for chat_id, message_id, text in messages:
+            # Rows from before the text was recorded only get the notice
+            new_text = f"{text}\n\n{EXPIRED_NOTICE}" if text else EXPIRED_NOTICE
+            try:
+                await self._bot.edit_message_text(new_text, chat_id=chat_id, message_id=message_id)
+                expired += 1
+            except TelegramError as e:
+                # Deleted or too old to edit; the row is gone either way
+                logger.debug(f"Could not mark message {message_id} in chat {chat_id} expired: {e}")
+        return expired
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "reaped": self.reaped,
+            "last_reaped": self.last_reaped,
+            "messages_expired": self.messages_expired,
+            "leader": self._lease.held if self._lease is not None else True,
+        }
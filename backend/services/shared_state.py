@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from services.supabase_service import prune_shared_state, shared_state_changes
+
+logger = logging.getLogger("nutriclaude.shared_state")
+
+# How far back each poll re-reads, to catch rows whose transaction committed
+# after the previous poll (see shared_state_changes in migration 009)
+OVERLAP_SECONDS = 10.0
+
+# Invalidations are kept this long, far longer than any process lags behind
+INVALIDATION_RETENTION_SECONDS = 3600.0
+PRUNE_INTERVAL_SECONDS = 600.0
+
+
+class SharedStateSync:
+    """Apply writes and logouts from every worker process to this one's caches.
+
+    Triggers append a row to cache_invalidations for every write to a logged
+    table and /api/auth/logout stores revoked tokens; every `interval`
+    seconds this fetches what is new and calls `on_invalidate(user_id,
+    table)` or `on_revoke(token_hash, exp)` for each (`on_revoke` returns
+    False for a token it already had). A process still drops its own cached
+    reads the moment it writes, so only other processes lag, by about
+    `interval` while writes keep coming. A poll that finds nothing doubles
+    the wait, up to `max_interval`, so idle processes barely touch the
+    database; the first change after a quiet spell lags by at most that.
+
+    `load` fetches every live revocation and must run before the process
+    serves requests; until it succeeds, each poll retries it. A single
+    worker process has nothing to tail and starts with `tail=False`: once
+    loaded it only prunes what the triggers keep logging.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        on_invalidate: Callable[[str, str], None],
+        on_revoke: Callable[[str, float], bool],
+        max_interval: Optional[float] = None,
+    ):
+        self._interval = interval
+        self._max_interval = max(interval, max_interval or interval)
+        self._delay = interval
+        self._on_invalidate = on_invalidate
+        self._on_revoke = on_revoke
+        self._since: Optional[str] = None
+        # Invalidation id -> when it was applied, so the overlap re-read
+        # doesn't apply it again
+        self._applied: Dict[int, float] = {}
+        self._last_prune = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.invalidations = 0
+        self.revocations = 0
+        self.failures = 0
+
+    async def load(self) -> None:
+        try:
+            await self.poll()
+        except Exception:
+            self.failures += 1
+            logger.exception("Could not load revoked tokens; retrying in the background")
+
+    def start(self, tail: bool = True) -> None:
+        self._task = asyncio.create_task(self._loop(tail), name="shared-state-sync")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self, tail: bool) -> None:
+        while True:
+            polling = tail or self._since is None
+            await asyncio.sleep(self._delay if polling else PRUNE_INTERVAL_SECONDS)
+            applied = self.invalidations + self.revocations
+            try:
+                if polling:
+                    await self.poll()
+                    if self.invalidations + self.revocations > applied:
+                        self._delay = self._interval
+                    else:
+                        self._delay = min(2 * self._delay, self._max_interval)
+                if time.monotonic() - self._last_prune > PRUNE_INTERVAL_SECONDS:
+                    self._last_prune = time.monotonic()
+                    await prune_shared_state(INVALIDATION_RETENTION_SECONDS)
+            except Exception:
+                self.failures += 1
+                logger.exception("Shared state poll failed")
+
+    async def poll(self) -> None:
+        changes = await shared_state_changes(self._since, OVERLAP_SECONDS)
+        now = time.monotonic()
+        for row in changes["invalidations"]:
+            if row["id"] in self._applied:
+                continue
+            self._applied[row["id"]] = now
+            self._on_invalidate(row["user_id"], row["table_name"])
+            self.invalidations += 1
+        for row in changes["revocations"]:
+            if self._on_revoke(row["token_hash"], row["exp"] if row["exp"] is not None else float("inf")):
+                self.revocations += 1
+        self._since = changes["now"]
+        self.polls += 1
+
+        horizon = now - 2 * (OVERLAP_SECONDS + self._max_interval)
+        for invalidation_id in [i for i, applied in self._applied.items() if applied < horizon]:
+            del self._applied[invalidation_id]
+
+    def stats(self) -> dict:
+        return {
+            "polls": self.polls,
+            "invalidations": self.invalidations,
+            "revocations": self.revocations,
+            "failures": self.failures,
+            "loaded": self._since is not None,
+        }
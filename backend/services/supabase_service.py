@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Any, Dict, List, Optional
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
 
+from cachetools import TTLCache
 from supabase import create_client, Client
 
+from config.settings import SUPABASE_MAX_WORKERS, USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL_SECONDS
+from services.cache_service import invalidate_user_table
+
 _client: Optional[Client] = None
 
+# supabase-py is synchronous, so every query runs on this dedicated, bounded
+# pool instead of on the event loop thread.
+_executor = ThreadPoolExecutor(max_workers=SUPABASE_MAX_WORKERS, thread_name_prefix="supabase")
+
 
 def get_client() -> Client:
     global _client
@@ -18,104 +30,311 @@ def get_client() -> Client:
     return _client
 
 
+async def execute(query: Any) -> Any:
+    """Run a query builder's `.execute()` on the DB thread pool and await it."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, query.execute)
+
+
+# --- Users ---
+
+_PROFILE_COLUMNS = "telegram_id, display_name, symptoms_mode"
+
+# telegram_id -> users row (or None when the user hasn't registered). Every
+# write below goes through to this cache, so the TTL only bounds staleness
+# from writes made by other processes.
+_profiles: TTLCache = TTLCache(maxsize=USER_PROFILE_CACHE_SIZE, ttl=USER_PROFILE_CACHE_TTL_SECONDS)
+
+
+def _profile_from(row: dict) -> dict:
+    return {
+        "telegram_id": row["telegram_id"],
+        "display_name": row.get("display_name") or "",
+        "symptoms_mode": bool(row.get("symptoms_mode")),
+    }
+
+
+async def get_user_profile(telegram_id: str) -> Optional[dict]:
+    """Return the user's profile, from cache when possible, or None if unregistered."""
+    try:
+        return _profiles[telegram_id]
+    except KeyError:
+        pass
+    client = get_client()
+    result = await execute(client.table("users").select(_PROFILE_COLUMNS).eq("telegram_id", telegram_id))
+    profile = _profile_from(result.data[0]) if result.data else None
+    _profiles[telegram_id] = profile
+    return profile
+
+
+async def upsert_user(telegram_id: str, display_name: str) -> dict:
+    """Create the user or refresh their display name; return the profile.
+
+    A single upsert on telegram_id, skipped entirely when the cached profile
+    already matches. An empty display_name never overwrites an existing one.
+    """
+    cached = _profiles.get(telegram_id)
+    if cached is not None and (not display_name or cached["display_name"] == display_name):
+        return cached
+
+    row = {"telegram_id": telegram_id}
+    if display_name:
+        row["display_name"] = display_name
+    client = get_client()
+    result = await execute(client.table("users").upsert(row, on_conflict="telegram_id"))
+    profile = _profiles[telegram_id] = _profile_from(result.data[0])
+    return profile
+
+
+async def set_symptoms_mode(telegram_id: str, enabled: bool) -> None:
+    """Persist the symptoms_mode flag and write it through to the cache."""
+    client = get_client()
+    result = await execute(client.table("users").update({"symptoms_mode": enabled}).eq("telegram_id", telegram_id))
+    if result.data:
+        _profiles[telegram_id] = _profile_from(result.data[0])
+    else:
+        invalidate_user_profile(telegram_id)
+
+
+def invalidate_user_profile(telegram_id: str) -> None:
+    _profiles.pop(telegram_id, None)
+
+
 # --- Pending Logs ---
 
-def create_pending_log(user_id: str, telegram_chat_id: str, log_type: str, payload: dict) -> dict:
+async def create_pending_log(user_id: str, telegram_chat_id: str, log_type: str, payload: dict) -> dict:
     """Insert a new pending log and return the created record."""
     client = get_client()
-    result = client.table("pending_logs").insert({
+    result = await execute(client.table("pending_logs").insert({
         "user_id": user_id,
         "telegram_chat_id": telegram_chat_id,
         "type": log_type,
         "payload": payload,
-    }).execute()
+    }))
     return result.data[0]
 
 
-def get_pending_log(pending_id: str) -> Optional[dict]:
+async def get_pending_log(pending_id: str) -> Optional[dict]:
     """Fetch a pending log by ID."""
     client = get_client()
-    result = client.table("pending_logs").select("*").eq("id", pending_id).execute()
+    result = await execute(client.table("pending_logs").select("*").eq("id", pending_id))
     return result.data[0] if result.data else None
 
 
-def delete_pending_log(pending_id: str) -> None:
+async def delete_pending_log(pending_id: str) -> None:
     """Delete a pending log by ID."""
     client = get_client()
-    client.table("pending_logs").delete().eq("id", pending_id).execute()
+    await execute(client.table("pending_logs").delete().eq("id", pending_id))
 
 
-def confirm_log(pending_id: str) -> Optional[dict]:
-    """Move a pending log to the appropriate table and delete the pending entry.
+async def create_pending_batch(
+    user_id: str, telegram_chat_id: str, entries: List[Tuple[str, dict]],
+) -> Tuple[str, List[dict]]:
+    """Insert several pending logs under one batch_id with a single request.
 
-    Returns the inserted record, or None if the pending log was not found.
+    `entries` is a list of (log_type, payload). Returns the batch_id and the
+    created records.
     """
-    pending = get_pending_log(pending_id)
-    if pending is None:
-        return None
-
-    log_type = pending["type"]
-    payload = pending["payload"]
-    user_id = pending["user_id"]
-
-    # Add user_id to the payload for the final table
-    payload["user_id"] = user_id
-
-    table_map = {
-        "meal": "meals",
-        "workout": "workouts",
-        "bodyweight": "bodyweight",
-        "wellness": "wellness",
-        "workout_quality": "workout_quality",
-        "exercise": "exercises",
-    }
+    batch_id = str(uuid.uuid4())
+    client = get_client()
+    result = await execute(client.table("pending_logs").insert([
+        {
+            "user_id": user_id,
+            "telegram_chat_id": telegram_chat_id,
+            "type": log_type,
+            "payload": payload,
+            "batch_id": batch_id,
+        }
+        for log_type, payload in entries
+    ]))
+    return batch_id, result.data
+
+
+async def get_pending_batch(batch_id: str) -> List[dict]:
+    """Fetch every pending log still in a batch."""
+    client = get_client()
+    result = await execute(client.table("pending_logs").select("id, type, payload").eq("batch_id", batch_id))
+    return result.data
+
 
-    table = table_map.get(log_type)
-    if table is None:
-        delete_pending_log(pending_id)
-        return None
+async def delete_pending_batch(batch_id: str) -> None:
+    """Delete every pending log in a batch."""
+    client = get_client()
+    await execute(client.table("pending_logs").delete().eq("batch_id", batch_id))
 
-    # Remove the "type" field since it's not a column in the final tables
-    payload.pop("type", None)
 
+async def set_pending_message_id(
+    telegram_message_id: int,
+    text: str,
+    ids: Optional[List[str]] = None,
+    batch_id: Optional[str] = None,
+) -> None:
+    """Record which Telegram message, with what text, shows the confirm buttons for these pending logs."""
     client = get_client()
-    result = client.table(table).insert(payload).execute()
-    delete_pending_log(pending_id)
-    return result.data[0]
+    query = client.table("pending_logs").update({
+        "telegram_message_id": telegram_message_id,
+        "telegram_message_text": text,
+    })
+    query = query.eq("batch_id", batch_id) if batch_id else query.in_("id", ids)
+    await execute(query)
+
+
+async def reap_pending_logs(created_before: str, limit: int) -> List[dict]:
+    """Delete up to `limit` pending logs created before `created_before`; return what was deleted.
+
+    The reap_pending_logs RPC claims the rows with a single DELETE ...
+    RETURNING that skips rows a confirm is moving, so a returned row was
+    never saved.
+    """
+    client = get_client()
+    result = await execute(client.rpc("reap_pending_logs", {"p_created_before": created_before, "p_limit": limit}))
+    return result.data
+
+
+async def _confirm_pending(ids: Optional[List[str]] = None, batch_id: Optional[str] = None) -> List[dict]:
+    """Move pending logs (by id or by batch) to their final tables via the confirm_pending_logs RPC.
+
+    The RPC claims the rows with DELETE ... RETURNING and inserts them in the
+    same transaction, so a retried or double-tapped confirm inserts nothing
+    the second time. Returns the inserted records.
+    """
+    client = get_client()
+    result = await execute(client.rpc("confirm_pending_logs", {"p_ids": ids, "p_batch_id": batch_id}))
+    for row in result.data:
+        invalidate_user_table(row["inserted"]["user_id"], row["log_table"])
+    return [row["inserted"] for row in result.data]
+
+
+async def confirm_log(pending_id: str) -> Optional[dict]:
+    """Move a pending log to the appropriate table and delete the pending entry.
+
+    Returns the inserted record, or None if the pending log was not found.
+    """
+    inserted = await _confirm_pending(ids=[pending_id])
+    return inserted[0] if inserted else None
+
+
+async def confirm_batch(batch_id: str) -> List[dict]:
+    """Confirm every pending log left in a batch; returns the inserted records."""
+    return await _confirm_pending(batch_id=batch_id)
 
 
 # --- Direct Inserts ---
 
-def insert_meal(user_id: str, data: dict) -> dict:
+async def insert_meal(user_id: str, data: dict) -> dict:
     client = get_client()
     data["user_id"] = user_id
-    result = client.table("meals").insert(data).execute()
+    result = await execute(client.table("meals").insert(data))
+    invalidate_user_table(user_id, "meals")
     return result.data[0]
 
 
-def insert_workout(user_id: str, data: dict) -> dict:
+async def insert_workout(user_id: str, data: dict) -> dict:
     client = get_client()
     data["user_id"] = user_id
-    result = client.table("workouts").insert(data).execute()
+    result = await execute(client.table("workouts").insert(data))
+    invalidate_user_table(user_id, "workouts")
     return result.data[0]
 
 
-def insert_bodyweight(user_id: str, data: dict) -> dict:
+async def insert_bodyweight(user_id: str, data: dict) -> dict:
     client = get_client()
     data["user_id"] = user_id
-    result = client.table("bodyweight").insert(data).execute()
+    result = await execute(client.table("bodyweight").insert(data))
+    invalidate_user_table(user_id, "bodyweight")
     return result.data[0]
 
 
-def insert_wellness(user_id: str, data: dict) -> dict:
+async def insert_wellness(user_id: str, data: dict) -> dict:
     client = get_client()
     data["user_id"] = user_id
-    result = client.table("wellness").insert(data).execute()
+    result = await execute(client.table("wellness").insert(data))
+    invalidate_user_table(user_id, "wellness")
     return result.data[0]
 
 
-def insert_workout_quality(user_id: str, data: dict) -> dict:
+async def insert_workout_quality(user_id: str, data: dict) -> dict:
     client = get_client()
     data["user_id"] = user_id
-    result = client.table("workout_quality").insert(data).execute()
+    result = await execute(client.table("workout_quality").insert(data))
+    invalidate_user_table(user_id, "workout_quality")
     return result.data[0]
+
+
+# --- Shared worker state (migration 009) ---
+
+async def enqueue_telegram_update(update_id: int, lane: str, payload: dict, max_depth: int) -> bool:
+    """Add an update to the shared queue; False when `max_depth` updates are already waiting."""
+    client = get_client()
+    result = await execute(client.rpc("enqueue_telegram_update", {
+        "p_update_id": update_id, "p_lane": lane, "p_payload": payload, "p_max_depth": max_depth,
+    }))
+    return bool(result.data)
+
+
+async def claim_telegram_updates(holder: str, limit: int, lease_seconds: float) -> List[dict]:
+    """Claim up to `limit` updates, at most one per user, each for `lease_seconds`."""
+    client = get_client()
+    result = await execute(client.rpc("claim_telegram_updates", {
+        "p_holder": holder, "p_limit": limit, "p_lease_seconds": lease_seconds,
+    }))
+    return result.data
+
+
+async def renew_telegram_updates(holder: str, update_ids: List[int], lease_seconds: float) -> List[int]:
+    """Extend `holder`'s claims for `lease_seconds`; returns the ids it still holds."""
+    client = get_client()
+    result = await execute(client.rpc("renew_telegram_updates", {
+        "p_holder": holder, "p_update_ids": update_ids, "p_lease_seconds": lease_seconds,
+    }))
+    return result.data
+
+
+async def complete_telegram_update(update_id: int, holder: str) -> bool:
+    """Remove a processed update, which lets its user's next update be claimed.
+    False, and nothing deleted, when `holder` no longer holds the claim."""
+    client = get_client()
+    result = await execute(client.rpc("complete_telegram_update", {
+        "p_update_id": update_id, "p_holder": holder,
+    }))
+    return bool(result.data)
+
+
+async def release_telegram_updates(holder: str) -> None:
+    client = get_client()
+    await execute(client.rpc("release_telegram_updates", {"p_holder": holder}))
+
+
+async def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    """Take or renew the named lease for `ttl` seconds; returns whether `holder` has it."""
+    client = get_client()
+    result = await execute(client.rpc("acquire_lease", {"p_name": name, "p_holder": holder, "p_ttl_seconds": ttl}))
+    return bool(result.data)
+
+
+async def release_lease(name: str, holder: str) -> None:
+    client = get_client()
+    await execute(client.rpc("release_lease", {"p_name": name, "p_holder": holder}))
+
+
+async def store_revoked_token(token_hash: str, exp: float) -> None:
+    """Record a revocation so every process picks it up; exp is inf for a token without one."""
+    expires_at = None if exp == float("inf") else datetime.fromtimestamp(exp, timezone.utc).isoformat()
+    client = get_client()
+    await execute(client.table("revoked_tokens").upsert(
+        {"token_hash": token_hash, "expires_at": expires_at}, on_conflict="token_hash",
+    ))
+
+
+async def shared_state_changes(since: Optional[str], overlap_seconds: float) -> dict:
+    """Cache invalidations and revocations since `since` (see migration 009), plus the DB's `now`."""
+    client = get_client()
+    result = await execute(client.rpc("shared_state_changes", {
+        "p_since": since, "p_overlap_seconds": overlap_seconds,
+    }))
+    return result.data
+
+
+async def prune_shared_state(keep_seconds: float) -> None:
+    client = get_client()
+    await execute(client.rpc("prune_shared_state", {"p_keep_seconds": keep_seconds}))
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Awaitable, Callable, Deque, List, Optional, Set
+
+from config.settings import (
+    UPDATE_QUEUE_LEASE_SECONDS,
+    UPDATE_QUEUE_MAX_POLL_SECONDS,
+    UPDATE_QUEUE_POLL_SECONDS,
+)
+from services.leases import holder_id
+from services.supabase_service import (
+    claim_telegram_updates,
+    complete_telegram_update,
+    enqueue_telegram_update,
+    release_telegram_updates,
+    renew_telegram_updates,
+)
+
+logger = logging.getLogger("nutriclaude.update_queue")
+
+
+class QueueFull(Exception):
+    """Raised when the queue cannot accept another update."""
+
+
+class UpdateQueue(ABC):
+    """Backend-agnostic queue of raw Telegram update payloads.
+
+    The webhook route only calls `put`, the worker pool only calls `get`,
+    and whoever finishes processing an update calls `done`, so a shared
+    backend can replace the in-process one without touching either side.
+    """
+
+    @abstractmethod
+    async def put(self, update: dict) -> None:
+        """Enqueue without waiting; raise QueueFull when at capacity."""
+
+    @abstractmethod
+    async def get(self) -> dict:
+        """Wait for and return the next update."""
+
+    @abstractmethod
+    def depth(self) -> int:
+        """Number of updates waiting to be processed."""
+
+    async def done(self, update: dict) -> None:
+        """Acknowledge that `update`, as returned by `get`, has been processed."""
+
+    async def close(self) -> None:
+        """Give up anything taken by `get` but not yet `done`."""
+
+
+class InMemoryUpdateQueue(UpdateQueue):
+    """Bounded asyncio.Queue, local to this process."""
+
+    def __init__(self, maxsize: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    async def put(self, update: dict) -> None:
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            raise QueueFull
+
+    async def get(self) -> dict:
+        return await self._queue.get()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+
+def update_lane(update: dict) -> str:
+    """Raw-payload counterpart of dispatcher.lane_key: the sending user's id,
+    or a lane of the update's own when it has no user."""
+    for value in update.values():
+        if isinstance(value, dict):
+            sender = value.get("from") or value.get("user")
+            if isinstance(sender, dict) and "id" in sender:
+                return str(sender["id"])
+    return f"update:{update['update_id']}"
+
+
+class PostgresUpdateQueue(UpdateQueue):
+    """The telegram_updates table (migration 009), shared by every process.
+
+    `get` only ever receives the oldest waiting update of a user, and only
+    after that user's previous update was acknowledged with `done`, so each
+    user's updates are processed one at a time and in order even when
+    several uvicorn workers drain the queue. One coroutine per process polls
+    the table, every `poll_interval` at first and twice as long after each
+    poll that finds nothing, up to `max_poll_interval`; a `put` in the same
+    process wakes it early.
+
+    This process holds at most `max_in_flight` updates between `get` and
+    `done` (the dispatcher's concurrency, so nothing claimed sits queued
+    behind it), and renews their claims every `lease_seconds / 3`. A claim
+    only expires when its process stops renewing it, after which the update
+    is handed out again; `done` then deletes nothing, since the row belongs
+    to whoever claimed it next.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        lease_seconds: float = UPDATE_QUEUE_LEASE_SECONDS,
+        poll_interval: float = UPDATE_QUEUE_POLL_SECONDS,
+        max_poll_interval: float = UPDATE_QUEUE_MAX_POLL_SECONDS,
+        claim_size: int = 10,
+        max_in_flight: Optional[int] = None,
+    ):
+        self._maxsize = maxsize
+        self._lease_seconds = lease_seconds
+        self._poll_interval = poll_interval
+        self._max_poll_interval = max(poll_interval, max_poll_interval)
+        self._delay = poll_interval
+        self._claim_size = claim_size
+        self._max_in_flight = max_in_flight
+        self._holder = holder_id()
+        self._claimed: Deque[dict] = deque()
+        # Claimed and not yet done, whether handed out or not
+        self._held: Set[int] = set()
+        self._polling = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._renewer: Optional[asyncio.Task] = None
+
+    async def put(self, update: dict) -> None:
+        if not await enqueue_telegram_update(update["update_id"], update_lane(update), update, self._maxsize):
+            raise QueueFull
+        self._wakeup.set()
+
+    async def get(self) -> dict:
+        async with self._polling:
+            while not self._claimed:
+                self._wakeup.clear()
+                limit = self._claim_size
+                if self._max_in_flight is not None:
+                    limit = min(limit, self._max_in_flight - len(self._held))
+                if limit > 0:
+                    claimed = await claim_telegram_updates(self._holder, limit, self._lease_seconds)
+                    self._held.update(u["update_id"] for u in claimed)
+                    self._claimed.extend(claimed)
+                    if self._renewer is None:
+                        self._renewer = asyncio.create_task(self._renew(), name="update-queue-renew")
+                if self._claimed:
+                    self._delay = self._poll_interval
+                else:
+                    # Also woken by `done` freeing a slot
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self._delay)
+                        self._delay = self._poll_interval
+                    except asyncio.TimeoutError:
+                        self._delay = min(2 * self._delay, self._max_poll_interval)
+            return self._claimed.popleft()
+
+    async def done(self, update: dict) -> None:
+        update_id = update["update_id"]
+        self._held.discard(update_id)
+        self._wakeup.set()
+        if not await complete_telegram_update(update_id, self._holder):
+            logger.warning(f"Update {update_id} was processed after its claim passed to another process")
+
+    async def close(self) -> None:
+        if self._renewer is not None:
+            self._renewer.cancel()
+            await asyncio.gather(self._renewer, return_exceptions=True)
+            self._renewer = None
+        self._claimed.clear()
+        self._held.clear()
+        await release_telegram_updates(self._holder)
+
+    def depth(self) -> int:
+        """Updates this process has claimed but not yet handed to a worker."""
+        return len(self._claimed)
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self._lease_seconds / 3)
+            held = list(self._held)
+            if not held:
+                continue
+            try:
+                renewed = set(await renew_telegram_updates(self._holder, held, self._lease_seconds))
+            except Exception:
+                logger.exception(f"Could not renew claims on {len(held)} updates")
+                continue
+            # Done in the meantime, or lost to another process
+            lost = [u for u in held if u not in renewed and u in self._held]
+            if lost:
+                logger.warning(f"Claims on updates {lost} expired and may be processed twice")
+
+
+def create_update_queue(backend: str, maxsize: int, max_in_flight: Optional[int] = None) -> UpdateQueue:
+    """`max_in_flight` caps the updates a shared queue lets this process hold at once."""
+    if backend == "memory":
+        return InMemoryUpdateQueue(maxsize=maxsize)
+    if backend == "postgres":
+        return PostgresUpdateQueue(maxsize=maxsize, max_in_flight=max_in_flight)
+    raise ValueError(f"Unsupported update queue backend: {backend}")
+
+
+class UpdateWorkerPool:
+    """N coroutines draining an UpdateQueue into `handler`.
+
+    The handler is responsible for calling the queue's `done` once the
+    update has been processed, which may be after it returns.
+    """
+
+    def __init__(self, queue: UpdateQueue, handler: Callable[[dict], Awaitable[None]], workers: int):
+        self._queue = queue
+        self._handler = handler
+        self._workers = workers
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._run(i), name=f"update-worker-{i}")
+            for i in range(self._workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, worker_id: int) -> None:
+        while True:
+            try:
+                update = await self._queue.get()
+            except Exception:
+                # e.g. the database is unreachable; try again after a pause
+                logger.exception(f"Worker {worker_id} failed to fetch an update")
+                await asyncio.sleep(1)
+                continue
+            try:
+                await self._handler(update)
+            except Exception:
+                logger.exception(f"Worker {worker_id} failed to process update {update.get('update_id')}")
@@ -1 +1,157 @@
-# TODO: Shared utility functions
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight task.
+
+    The first caller for a key starts `fn()`; callers arriving while it runs
+    await the same result instead of starting their own. The task is
+    shielded, so one caller going away doesn't cancel it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+class JsonObjectStream:
+    """Incrementally pull complete entry objects out of streamed JSON text.
+
+    Feed text chunks as they arrive; each call returns the objects that were
+    completed by that chunk. An entry is any object opened directly inside
+    one of `containers`, given as the stack of brackets enclosing it: by
+    default the top-level object itself or the elements of a top-level
+    array; `[("{", "[")]` selects the elements of an array held in a
+    top-level object, such as a tool call's {"entries": [...]}. Anything
+    before the JSON starts or after it closes is skipped.
+    """
+
+    def __init__(self, containers: Sequence[Tuple[str, ...]] = ((), ("[",))):
+        self._containers = [list(c) for c in containers]
+        self._buffer: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._entry_depth = -1
+        self.done = False
+
+    def feed(self, chunk: str) -> List[dict]:
+        entries = []
+        for ch in chunk:
+            if self.done:
+                break
+            if not self._stack and ch not in "[{":
+                continue
+            if self._entry_depth >= 0:
+                self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                if ch == "{" and self._entry_depth < 0 and self._stack in self._containers:
+                    self._entry_depth = len(self._stack)
+                    self._buffer = [ch]
+                self._stack.append(ch)
+            elif ch in "]}":
+                self._stack.pop()
+                if len(self._stack) == self._entry_depth:
+                    try:
+                        entries.append(json.loads("".join(self._buffer)))
+                    except json.JSONDecodeError:
+                        pass
+                    self._entry_depth = -1
+                    self._buffer = []
+                if not self._stack:
+                    self.done = True
+        return entries
+
+
+class MicroBatcher:
+    """Group concurrent submissions into batches for one `run_batch` call.
+
+    A batch is sent as soon as it holds `max_size` items, or `max_wait`
+    seconds after its first item arrived, whichever comes first.
+    `run_batch` receives the items in submission order and must return one
+    result per item, in the same order; each `submit` caller gets its own.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_size: int,
+        max_wait: float,
+    ):
+        self._run_batch = run_batch
+        self._max_size = max_size
+        self._max_wait = max_wait
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self._wait_total = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, loop.time()))
+        if len(self._pending) >= self._max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        now = asyncio.get_running_loop().time()
+        self.batches += 1
+        self.items += len(batch)
+        self._wait_total += sum(now - queued for _, _, queued in batch)
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        try:
+            results = await self._run_batch([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else None,
+            "avg_added_wait_ms": round(1000 * self._wait_total / self.items, 1) if self.items else None,
+        }
@@ -112,6 +112,22 @@ export interface LogHistoryEntry {
   fat: number | null;
 }
 
+export interface LogHistoryTotals {
+  all: number;
+  meal: number;
+  workout: number;
+  exercise: number;
+  weight: number;
+  wellness: number;
+}
+
+export interface LogHistoryPage {
+  entries: LogHistoryEntry[];
+  next_cursor: string | null;
+  // Only on the first page: counts over the whole range, whatever the filter
+  totals?: LogHistoryTotals;
+}
+
 export interface WellnessEntry {
   date: string;
   symptom_score: number;
@@ -123,6 +139,16 @@ export interface PerformanceEntry {
   performance_score: number;
 }
 
+export interface DashboardData {
+  kpis: KpiData;
+  meals: DailyMeal[];
+  calorie_balance: CalorieBalanceEntry[];
+  weight: WeightEntry[];
+  wellness: WellnessEntry[];
+  performance: PerformanceEntry[];
+  dates: string[];
+}
+
 export interface Goals {
   current_weight_lbs?: number | null;
   height_feet?: number | null;
@@ -142,14 +168,19 @@ export const api = {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(data),
     }),
+  dashboard: (range = '7d', trendRange = '30d') =>
+    fetchJson<DashboardData>(`${BASE}/dashboard?range=${range}&trend_range=${trendRange}`),
   kpis: (range = '7d') => fetchJson<KpiData>(`${BASE}/kpis?range=${range}`),
   meals: (range = '7d') => fetchJson<DailyMeal[]>(`${BASE}/meals?range=${range}`),
   weight: (range = '30d') => fetchJson<WeightEntry[]>(`${BASE}/weight?range=${range}`),
   calorieBalance: (range = '7d') => fetchJson<CalorieBalanceEntry[]>(`${BASE}/calorie-balance?range=${range}`),
   daily: (date: string) => fetchJson<DailyData>(`${BASE}/daily?date=${date}`),
   dates: (range = '7d') => fetchJson<string[]>(`${BASE}/dates?range=${range}`),
-  logHistory: (range = '30d', type = 'all') =>
-    fetchJson<LogHistoryEntry[]>(`${BASE}/log-history?range=${range}&type=${type}`),
+  logHistory: (range = '30d', type = 'all', limit = 50, cursor: string | null = null) =>
+    fetchJson<LogHistoryPage>(
+      `${BASE}/log-history?range=${range}&type=${type}&limit=${limit}` +
+        (cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''),
+    ),
   exercises: (range = '30d') => fetchJson<ExerciseEntry[]>(`${BASE}/exercises?range=${range}`),
   exerciseNames: () => fetchJson<string[]>(`${BASE}/exercise-names`),
   exerciseHistory: (name: string, range = '90d') =>
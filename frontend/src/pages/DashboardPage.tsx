@@ -80,20 +80,15 @@ export default function DashboardPage() {
     setLoading(true)
     const range = `${dateRange}d`
     Promise.all([
-      api.kpis(range),
-      api.weight('30d'),
-      api.calorieBalance(range),
-      api.meals('30d'),
-      api.wellness('30d'),
-      api.performance('30d'),
+      api.dashboard(range, '30d'),
       api.getGoals(),
-    ]).then(([k, w, cb, m, wel, perf, g]) => {
-      setKpis(k)
-      setWeight(w)
-      setCalorieBalance(cb)
-      setMeals(m)
-      setWellness(wel)
-      setPerformance(perf)
+    ]).then(([d, g]) => {
+      setKpis(d.kpis)
+      setWeight(d.weight)
+      setCalorieBalance(d.calorie_balance)
+      setMeals(d.meals)
+      setWellness(d.wellness)
+      setPerformance(d.performance)
       setGoals(g)
       setLoading(false)
     })
@@ -1,7 +1,7 @@
-import { useState, useEffect, useMemo, useCallback, Fragment } from 'react'
+import { useState, useEffect, useRef, useCallback, Fragment } from 'react'
 import { Utensils, Dumbbell, Scale, Heart, Pencil, Trash2, X, Check } from 'lucide-react'
 import { api } from '../api'
-import type { LogHistoryEntry } from '../api'
+import type { LogHistoryEntry, LogHistoryTotals } from '../api'
 
 type FilterType = 'all' | 'meal' | 'workout' | 'exercise' | 'weight' | 'wellness'
 
@@ -161,35 +161,61 @@ function formatTimestamp(ts: string) {
   })
 }
 
+const PAGE_SIZE = 50
+
 const inputClass = "w-full bg-bg border border-border rounded-lg px-3 py-2 text-sm text-text placeholder-text-dim focus:outline-none focus:border-accent-green transition-colors"
 
 export default function LogHistoryPage() {
   const [entries, setEntries] = useState<LogHistoryEntry[]>([])
   const [activeFilter, setActiveFilter] = useState<FilterType>('all')
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [totals, setTotals] = useState<LogHistoryTotals | null>(null)
   const [editingId, setEditingId] = useState<string | null>(null)
   const [editValues, setEditValues] = useState<Record<string, string>>({})
   const [saving, setSaving] = useState(false)
   const [confirmDeleteId, setConfirmDeleteId] = useState<string | null>(null)
 
+  // Bumped whenever the filter changes, so responses to requests made for an
+  // earlier filter (first page or "Load more") are dropped on arrival.
+  const generation = useRef(0)
+
+  // The server filters by type and pages newest-first; changing the filter
+  // starts over from the first page.
   useEffect(() => {
-    api.logHistory('30d', 'all').then((data) => {
-      setEntries(data)
+    const current = ++generation.current
+    setLoading(true)
+    setLoadingMore(false)
+    api.logHistory('30d', activeFilter, PAGE_SIZE).then((page) => {
+      if (current !== generation.current) return
+      setEntries(page.entries)
+      setNextCursor(page.next_cursor)
+      if (page.totals) setTotals(page.totals)
       setLoading(false)
     })
-  }, [])
+  }, [activeFilter])
 
-  const filtered = useMemo(() => {
-    if (activeFilter === 'all') return entries
-    return entries.filter((e) => e.type === activeFilter)
-  }, [entries, activeFilter])
+  const loadMore = useCallback(async () => {
+    if (!nextCursor) return
+    const current = generation.current
+    setLoadingMore(true)
+    try {
+      const page = await api.logHistory('30d', activeFilter, PAGE_SIZE, nextCursor)
+      if (current !== generation.current) return
+      setEntries((prev) => [...prev, ...page.entries])
+      setNextCursor(page.next_cursor)
+    } finally {
+      if (current === generation.current) setLoadingMore(false)
+    }
+  }, [activeFilter, nextCursor])
 
-  const counts = useMemo(() => ({
-    total: entries.length,
-    meals: entries.filter((e) => e.type === 'meal').length,
-    workouts: entries.filter((e) => e.type === 'workout').length + entries.filter((e) => e.type === 'exercise').length,
-    weighIns: entries.filter((e) => e.type === 'weight').length,
-  }), [entries])
+  const counts = {
+    total: totals?.all ?? 0,
+    meals: totals?.meal ?? 0,
+    workouts: (totals?.workout ?? 0) + (totals?.exercise ?? 0),
+    weighIns: totals?.weight ?? 0,
+  }
 
   const startEdit = useCallback((entry: LogHistoryEntry) => {
     setEditingId(entry.id)
@@ -231,6 +257,7 @@ export default function LogHistoryPage() {
     try {
       await api.deleteLog(entry.type, entry.id)
       setEntries((prev) => prev.filter((e) => e.id !== entry.id))
+      setTotals((prev) => prev && { ...prev, all: prev.all - 1, [entry.type]: prev[entry.type] - 1 })
       setEditingId(null)
       setConfirmDeleteId(null)
     } finally {
@@ -303,7 +330,7 @@ export default function LogHistoryPage() {
     )
   }
 
-  if (loading) {
+  if (loading && entries.length === 0) {
     return <div className="p-8 text-text-muted">Loading...</div>
   }
 
@@ -347,7 +374,7 @@ export default function LogHistoryPage() {
               </tr>
             </thead>
             <tbody>
-              {filtered.map((entry) => {
+              {entries.map((entry) => {
                 const config = typeConfig[entry.type] || typeConfig.workout
                 const Icon = config.icon
                 const isEditing = editingId === entry.id
@@ -398,17 +425,17 @@ export default function LogHistoryPage() {
           </table>
         </div>
 
-        {filtered.length === 0 && (
+        {entries.length === 0 && (
           <div className="text-center py-12 text-text-dim">No entries found for this filter.</div>
         )}
       </div>
 
       {/* Card list — mobile */}
       <div className="lg:hidden space-y-3">
-        {filtered.length === 0 ? (
+        {entries.length === 0 ? (
           <div className="text-center py-12 text-text-dim">No entries found for this filter.</div>
         ) : (
-          filtered.map((entry) => {
+          entries.map((entry) => {
             const config = typeConfig[entry.type] || typeConfig.workout
             const Icon = config.icon
             const isEditing = editingId === entry.id
@@ -447,6 +474,18 @@ export default function LogHistoryPage() {
         )}
       </div>
 
+      {nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMore}
+            disabled={loadingMore}
+            className="px-4 py-2 bg-card border border-border text-text-muted rounded-lg text-sm hover:text-text hover:border-card-hover transition-colors disabled:opacity-50"
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
+
       {/* Summary Stats */}
       <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
         <div className="bg-card border border-border rounded-lg p-4">
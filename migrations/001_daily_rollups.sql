@@ -0,0 +1,147 @@
+-- Per-user, per-day meal and workout totals, maintained by triggers so the
+-- dashboard can aggregate in O(days) instead of pulling every raw row.
+--
+-- `day` is the UTC calendar date of the row's timestamp, which matches how
+-- the aggregation service has always bucketed PostgREST timestamps.
+
+CREATE TABLE IF NOT EXISTS daily_rollups (
+  user_id TEXT NOT NULL,
+  day DATE NOT NULL,
+  calories INTEGER NOT NULL DEFAULT 0,
+  protein_g INTEGER NOT NULL DEFAULT 0,
+  carbs_g INTEGER NOT NULL DEFAULT 0,
+  fat_g INTEGER NOT NULL DEFAULT 0,
+  meal_count INTEGER NOT NULL DEFAULT 0,
+  calories_burned INTEGER NOT NULL DEFAULT 0,
+  workout_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (user_id, day)
+);
+
+CREATE OR REPLACE FUNCTION apply_rollup_delta(
+  p_user_id TEXT,
+  p_day DATE,
+  p_calories INTEGER,
+  p_protein_g INTEGER,
+  p_carbs_g INTEGER,
+  p_fat_g INTEGER,
+  p_meal_count INTEGER,
+  p_calories_burned INTEGER,
+  p_workout_count INTEGER
+) RETURNS VOID AS $$
+BEGIN
+  INSERT INTO daily_rollups AS r (
+    user_id, day, calories, protein_g, carbs_g, fat_g,
+    meal_count, calories_burned, workout_count
+  ) VALUES (
+    p_user_id, p_day, p_calories, p_protein_g, p_carbs_g, p_fat_g,
+    p_meal_count, p_calories_burned, p_workout_count
+  )
+  ON CONFLICT (user_id, day) DO UPDATE SET
+    calories = r.calories + EXCLUDED.calories,
+    protein_g = r.protein_g + EXCLUDED.protein_g,
+    carbs_g = r.carbs_g + EXCLUDED.carbs_g,
+    fat_g = r.fat_g + EXCLUDED.fat_g,
+    meal_count = r.meal_count + EXCLUDED.meal_count,
+    calories_burned = r.calories_burned + EXCLUDED.calories_burned,
+    workout_count = r.workout_count + EXCLUDED.workout_count;
+
+  DELETE FROM daily_rollups
+  WHERE user_id = p_user_id AND day = p_day
+    AND meal_count <= 0 AND workout_count <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- The triggers run as the owner, so a write by any role that may change
+-- meals or workouts keeps its rollup current (see Privileges).
+CREATE OR REPLACE FUNCTION meals_rollup_trigger() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM apply_rollup_delta(
+      OLD.user_id, (OLD.timestamp AT TIME ZONE 'UTC')::date,
+      -OLD.calories, -OLD.protein_g, -OLD.carbs_g, -OLD.fat_g, -1, 0, 0
+    );
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM apply_rollup_delta(
+      NEW.user_id, (NEW.timestamp AT TIME ZONE 'UTC')::date,
+      NEW.calories, NEW.protein_g, NEW.carbs_g, NEW.fat_g, 1, 0, 0
+    );
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE OR REPLACE FUNCTION workouts_rollup_trigger() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM apply_rollup_delta(
+      OLD.user_id, (OLD.timestamp AT TIME ZONE 'UTC')::date,
+      0, 0, 0, 0, 0, -OLD.estimated_calories_burned, -1
+    );
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM apply_rollup_delta(
+      NEW.user_id, (NEW.timestamp AT TIME ZONE 'UTC')::date,
+      0, 0, 0, 0, 0, NEW.estimated_calories_burned, 1
+    );
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS trg_meals_rollup ON meals;
+CREATE TRIGGER trg_meals_rollup
+AFTER INSERT OR UPDATE OR DELETE ON meals
+FOR EACH ROW EXECUTE FUNCTION meals_rollup_trigger();
+
+DROP TRIGGER IF EXISTS trg_workouts_rollup ON workouts;
+CREATE TRIGGER trg_workouts_rollup
+AFTER INSERT OR UPDATE OR DELETE ON workouts
+FOR EACH ROW EXECUTE FUNCTION workouts_rollup_trigger();
+
+-- Privileges: the backend (service_role) is the only reader. RLS with no
+-- policies keeps the table out of the anon/authenticated PostgREST API,
+-- and apply_rollup_delta loses the EXECUTE that PUBLIC gets by default.
+-- Supabase's roles don't exist on a plain server.
+ALTER TABLE daily_rollups ENABLE ROW LEVEL SECURITY;
+
+REVOKE EXECUTE ON FUNCTION
+  apply_rollup_delta(TEXT, DATE, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER)
+FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    REVOKE ALL ON TABLE daily_rollups FROM anon, authenticated;
+    REVOKE EXECUTE ON FUNCTION
+      apply_rollup_delta(TEXT, DATE, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER)
+    FROM anon, authenticated;
+    GRANT ALL ON TABLE daily_rollups TO service_role;
+    GRANT EXECUTE ON FUNCTION
+      apply_rollup_delta(TEXT, DATE, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER)
+    TO service_role;
+  END IF;
+END $$;
+
+-- Backfill from existing rows
+TRUNCATE daily_rollups;
+INSERT INTO daily_rollups (
+  user_id, day, calories, protein_g, carbs_g, fat_g,
+  meal_count, calories_burned, workout_count
+)
+SELECT
+  user_id, day,
+  SUM(calories), SUM(protein_g), SUM(carbs_g), SUM(fat_g),
+  SUM(meal_count), SUM(calories_burned), SUM(workout_count)
+FROM (
+  SELECT user_id, (timestamp AT TIME ZONE 'UTC')::date AS day,
+         calories, protein_g, carbs_g, fat_g, 1 AS meal_count,
+         0 AS calories_burned, 0 AS workout_count
+  FROM meals
+  UNION ALL
+  SELECT user_id, (timestamp AT TIME ZONE 'UTC')::date AS day,
+         0, 0, 0, 0, 0,
+         estimated_calories_burned, 1
+  FROM workouts
+) t
+GROUP BY user_id, day;
@@ -0,0 +1,5 @@
+-- The bot and /auth/verify create-or-update users with a single
+-- `INSERT ... ON CONFLICT (telegram_id)` upsert, which needs a unique
+-- constraint on telegram_id to resolve the conflict against.
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_telegram_id_key ON users (telegram_id);
@@ -0,0 +1,7 @@
+-- Entries extracted from one message are inserted as a single batch and
+-- confirmed or discarded together, so pending_logs rows carry the batch they
+-- belong to. Single-entry messages leave batch_id NULL.
+
+ALTER TABLE pending_logs ADD COLUMN IF NOT EXISTS batch_id UUID;
+
+CREATE INDEX IF NOT EXISTS idx_pending_logs_batch_id ON pending_logs(batch_id);
@@ -0,0 +1,82 @@
+-- Move confirmed pending logs into their destination tables in one round
+-- trip and one transaction.
+--
+-- The pending rows are claimed with DELETE ... RETURNING, so when two
+-- requests race on the same id (a double-tapped "Yes"), the second one
+-- blocks on the row lock, then finds nothing to delete and inserts nothing.
+-- If any insert fails, the whole call rolls back and the pending rows stay.
+--
+-- Only payload keys that are real columns of the destination table are
+-- inserted, so id/created_at keep their defaults.
+
+CREATE OR REPLACE FUNCTION confirm_pending_logs(p_ids UUID[] DEFAULT NULL, p_batch_id UUID DEFAULT NULL)
+RETURNS TABLE (log_table TEXT, inserted JSONB)
+LANGUAGE plpgsql AS $$
+DECLARE
+  pending pending_logs%ROWTYPE;
+  payload JSONB;
+  cols TEXT;
+BEGIN
+  FOR pending IN
+    DELETE FROM pending_logs
+    WHERE id = ANY(p_ids) OR batch_id = p_batch_id
+    RETURNING *
+  LOOP
+    log_table := CASE pending.type
+      WHEN 'meal' THEN 'meals'
+      WHEN 'workout' THEN 'workouts'
+      WHEN 'bodyweight' THEN 'bodyweight'
+      WHEN 'wellness' THEN 'wellness'
+      WHEN 'workout_quality' THEN 'workout_quality'
+      WHEN 'exercise' THEN 'exercises'
+    END;
+    CONTINUE WHEN log_table IS NULL;
+
+    payload := (pending.payload - 'type') || jsonb_build_object('user_id', pending.user_id);
+
+    SELECT string_agg(quote_ident(c.column_name), ', ')
+      INTO cols
+      FROM information_schema.columns c
+     WHERE c.table_schema = 'public'
+       AND c.table_name = log_table
+       AND payload ? c.column_name;
+
+    EXECUTE format(
+      'INSERT INTO %1$I (%2$s) SELECT %2$s FROM jsonb_populate_record(NULL::%1$I, $1) RETURNING to_jsonb(%1$I.*)',
+      log_table, cols
+    ) USING payload INTO inserted;
+
+    RETURN NEXT;
+  END LOOP;
+END;
+$$;
+
+-- Single-entry convenience wrapper: the inserted row, or NULL if the pending
+-- log no longer exists.
+CREATE OR REPLACE FUNCTION confirm_pending(p_id UUID)
+RETURNS JSONB
+LANGUAGE sql AS $$
+  SELECT inserted FROM confirm_pending_logs(ARRAY[p_id]) LIMIT 1;
+$$;
+
+-- Only the backend (service_role) confirms; without this PUBLIC, and so
+-- Supabase's anon and authenticated roles, could confirm anyone's pending
+-- logs.
+REVOKE EXECUTE ON FUNCTION
+  confirm_pending_logs(UUID[], UUID),
+  confirm_pending(UUID)
+FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    REVOKE EXECUTE ON FUNCTION
+      confirm_pending_logs(UUID[], UUID),
+      confirm_pending(UUID)
+    FROM anon, authenticated;
+    GRANT EXECUTE ON FUNCTION
+      confirm_pending_logs(UUID[], UUID),
+      confirm_pending(UUID)
+    TO service_role;
+  END IF;
+END $$;
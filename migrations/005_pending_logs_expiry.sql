@@ -0,0 +1,7 @@
+-- Support expiring unconfirmed pending logs: the reaper scans by created_at,
+-- and telegram_message_id lets it mark the stale confirmation message as
+-- expired.
+
+ALTER TABLE pending_logs ADD COLUMN IF NOT EXISTS telegram_message_id BIGINT;
+
+CREATE INDEX IF NOT EXISTS idx_pending_logs_created_at ON pending_logs(created_at);
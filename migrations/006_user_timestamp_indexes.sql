@@ -0,0 +1,30 @@
+-- Composite indexes matching how the app reads time-series tables: every
+-- query filters on user_id plus a timestamp range and orders by timestamp,
+-- which separate user_id and timestamp indexes can only half serve. id is
+-- the tiebreaker log history keyset-paginates on (ORDER BY timestamp DESC,
+-- id DESC), so those pages come straight off the index with no sort.
+--
+-- On a large live table, run each CREATE INDEX with CONCURRENTLY outside a
+-- transaction instead.
+
+CREATE INDEX IF NOT EXISTS idx_meals_user_timestamp ON meals(user_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_workouts_user_timestamp ON workouts(user_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_bodyweight_user_timestamp ON bodyweight(user_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_wellness_user_timestamp ON wellness(user_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_workout_quality_user_timestamp ON workout_quality(user_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_exercises_user_timestamp ON exercises(user_id, timestamp, id);
+
+-- Exercise history (user_id = ? AND exercise_name = ? AND timestamp >= ?
+-- ORDER BY timestamp); also serves the distinct exercise-name list.
+CREATE INDEX IF NOT EXISTS idx_exercises_user_name_timestamp ON exercises(user_id, exercise_name, timestamp);
+
+-- Personal records (user_id = ? ORDER BY weight_lbs DESC).
+CREATE INDEX IF NOT EXISTS idx_exercises_user_weight ON exercises(user_id, weight_lbs DESC);
+
+-- The composite indexes lead with user_id, so the single-column ones are
+-- redundant and only cost writes.
+DROP INDEX IF EXISTS idx_meals_user_id;
+DROP INDEX IF EXISTS idx_workouts_user_id;
+DROP INDEX IF EXISTS idx_bodyweight_user_id;
+DROP INDEX IF EXISTS idx_wellness_user_id;
+DROP INDEX IF EXISTS idx_workout_quality_user_id;
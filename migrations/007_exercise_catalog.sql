@@ -0,0 +1,139 @@
+-- Per-user, per-exercise catalog with the personal record (heaviest set,
+-- earliest on ties), kept current by a trigger on exercises so the
+-- exercise-name list and PR table cost O(distinct exercises) instead of a
+-- scan of the user's whole lifting history.
+
+CREATE TABLE IF NOT EXISTS exercise_catalog (
+  user_id TEXT NOT NULL,
+  exercise_name TEXT NOT NULL,
+  entry_count INTEGER NOT NULL DEFAULT 0,
+  pr_exercise_id UUID,
+  pr_weight_lbs DECIMAL(6,2),
+  pr_sets INTEGER,
+  pr_reps INTEGER,
+  pr_timestamp TIMESTAMPTZ,
+  PRIMARY KEY (user_id, exercise_name)
+);
+
+-- Recompute one catalog row from exercises. Only needed when a row leaves
+-- the exercise (delete, edit, rename), since that may remove the PR; it
+-- reads just that exercise's rows via idx_exercises_user_name_timestamp.
+CREATE OR REPLACE FUNCTION refresh_exercise_catalog(p_user_id TEXT, p_exercise_name TEXT) RETURNS VOID AS $$
+DECLARE
+  n INTEGER;
+  best exercises%ROWTYPE;
+BEGIN
+  SELECT count(*) INTO n
+  FROM exercises
+  WHERE user_id = p_user_id AND exercise_name = p_exercise_name;
+
+  IF n = 0 THEN
+    DELETE FROM exercise_catalog
+    WHERE user_id = p_user_id AND exercise_name = p_exercise_name;
+    RETURN;
+  END IF;
+
+  SELECT * INTO best
+  FROM exercises
+  WHERE user_id = p_user_id AND exercise_name = p_exercise_name
+  ORDER BY weight_lbs DESC NULLS LAST, timestamp
+  LIMIT 1;
+
+  INSERT INTO exercise_catalog AS c (
+    user_id, exercise_name, entry_count,
+    pr_exercise_id, pr_weight_lbs, pr_sets, pr_reps, pr_timestamp
+  ) VALUES (
+    p_user_id, p_exercise_name, n,
+    best.id, best.weight_lbs, best.sets, best.reps, best.timestamp
+  )
+  ON CONFLICT (user_id, exercise_name) DO UPDATE SET
+    entry_count = EXCLUDED.entry_count,
+    pr_exercise_id = EXCLUDED.pr_exercise_id,
+    pr_weight_lbs = EXCLUDED.pr_weight_lbs,
+    pr_sets = EXCLUDED.pr_sets,
+    pr_reps = EXCLUDED.pr_reps,
+    pr_timestamp = EXCLUDED.pr_timestamp;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Runs as the owner, so a write by any role that may change exercises
+-- keeps the catalog current (see Privileges).
+CREATE OR REPLACE FUNCTION exercises_catalog_trigger() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    -- Inserts are incremental: bump the count, then take over the PR only
+    -- if the new set beats it.
+    INSERT INTO exercise_catalog AS c (
+      user_id, exercise_name, entry_count,
+      pr_exercise_id, pr_weight_lbs, pr_sets, pr_reps, pr_timestamp
+    ) VALUES (
+      NEW.user_id, NEW.exercise_name, 1,
+      NEW.id, NEW.weight_lbs, NEW.sets, NEW.reps, NEW.timestamp
+    )
+    ON CONFLICT (user_id, exercise_name) DO UPDATE SET
+      entry_count = c.entry_count + 1;
+
+    UPDATE exercise_catalog SET
+      pr_exercise_id = NEW.id,
+      pr_weight_lbs = NEW.weight_lbs,
+      pr_sets = NEW.sets,
+      pr_reps = NEW.reps,
+      pr_timestamp = NEW.timestamp
+    WHERE user_id = NEW.user_id AND exercise_name = NEW.exercise_name
+      AND (
+        pr_weight_lbs IS NULL
+        OR NEW.weight_lbs > pr_weight_lbs
+        OR (NEW.weight_lbs = pr_weight_lbs AND NEW.timestamp < pr_timestamp)
+      );
+  ELSE
+    PERFORM refresh_exercise_catalog(OLD.user_id, OLD.exercise_name);
+    IF TG_OP = 'UPDATE'
+       AND (NEW.user_id, NEW.exercise_name) IS DISTINCT FROM (OLD.user_id, OLD.exercise_name) THEN
+      PERFORM refresh_exercise_catalog(NEW.user_id, NEW.exercise_name);
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS trg_exercises_catalog ON exercises;
+CREATE TRIGGER trg_exercises_catalog
+AFTER INSERT OR UPDATE OR DELETE ON exercises
+FOR EACH ROW EXECUTE FUNCTION exercises_catalog_trigger();
+
+-- PRs are read from the catalog now, and refresh_exercise_catalog reads one
+-- exercise through idx_exercises_user_name_timestamp, so nothing uses the
+-- PR index from 006 any more; drop it rather than maintain it on every
+-- exercise insert.
+DROP INDEX IF EXISTS idx_exercises_user_weight;
+
+-- Privileges: the backend (service_role) is the only reader. RLS with no
+-- policies keeps the table out of the anon/authenticated PostgREST API,
+-- and refresh_exercise_catalog loses the EXECUTE that PUBLIC gets by
+-- default. Supabase's roles don't exist on a plain server.
+ALTER TABLE exercise_catalog ENABLE ROW LEVEL SECURITY;
+
+REVOKE EXECUTE ON FUNCTION refresh_exercise_catalog(TEXT, TEXT) FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    REVOKE ALL ON TABLE exercise_catalog FROM anon, authenticated;
+    REVOKE EXECUTE ON FUNCTION refresh_exercise_catalog(TEXT, TEXT) FROM anon, authenticated;
+    GRANT ALL ON TABLE exercise_catalog TO service_role;
+    GRANT EXECUTE ON FUNCTION refresh_exercise_catalog(TEXT, TEXT) TO service_role;
+  END IF;
+END $$;
+
+-- Backfill from existing rows
+TRUNCATE exercise_catalog;
+INSERT INTO exercise_catalog (
+  user_id, exercise_name, entry_count,
+  pr_exercise_id, pr_weight_lbs, pr_sets, pr_reps, pr_timestamp
+)
+SELECT DISTINCT ON (user_id, exercise_name)
+  user_id, exercise_name,
+  COUNT(*) OVER (PARTITION BY user_id, exercise_name),
+  id, weight_lbs, sets, reps, timestamp
+FROM exercises
+ORDER BY user_id, exercise_name, weight_lbs DESC NULLS LAST, timestamp;
@@ -0,0 +1,45 @@
+-- Expire pending logs in one statement, so a row is either reaped or
+-- confirmed, never both.
+--
+-- Rows are claimed with DELETE ... RETURNING like confirm_pending_logs.
+-- SKIP LOCKED passes over rows a confirm is moving right now, so that
+-- confirm wins and the reaper never reports (and marks "Expired") a row that
+-- was saved. A confirm that arrives after the reaper claimed the row finds
+-- nothing and inserts nothing.
+--
+-- telegram_message_text is the confirmation message as sent, so the expiry
+-- notice can be appended to it instead of replacing the entry text.
+
+ALTER TABLE pending_logs ADD COLUMN IF NOT EXISTS telegram_message_text TEXT;
+
+CREATE OR REPLACE FUNCTION reap_pending_logs(p_created_before TIMESTAMPTZ, p_limit INTEGER)
+RETURNS TABLE (id UUID, telegram_chat_id TEXT, telegram_message_id BIGINT, telegram_message_text TEXT)
+LANGUAGE sql AS $$
+  DELETE FROM pending_logs p
+  WHERE p.id IN (
+    SELECT s.id FROM pending_logs s
+    WHERE s.created_at < p_created_before
+    ORDER BY s.created_at
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING p.id, p.telegram_chat_id, p.telegram_message_id, p.telegram_message_text;
+$$;
+
+-- Only the backend (service_role) reaps; without this PUBLIC, and so
+-- Supabase's anon and authenticated roles, could delete pending logs.
+REVOKE EXECUTE ON FUNCTION
+  reap_pending_logs(TIMESTAMPTZ, INTEGER)
+FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    REVOKE EXECUTE ON FUNCTION
+      reap_pending_logs(TIMESTAMPTZ, INTEGER)
+    FROM anon, authenticated;
+    GRANT EXECUTE ON FUNCTION
+      reap_pending_logs(TIMESTAMPTZ, INTEGER)
+    TO service_role;
+  END IF;
+END $$;
@@ -0,0 +1,293 @@
+-- State that every uvicorn worker process has to agree on, so the backend
+-- can run with several workers:
+--
+-- * telegram_updates: the webhook update queue. A user's updates are handed
+--   out one at a time in update_id order, across all processes.
+-- * service_leases: named, expiring leases that elect one process to poll
+--   Telegram or run the pending-log reaper.
+-- * cache_invalidations: an append-only log of (user, table) writes, filled
+--   by triggers, that each process tails to drop its cached dashboard reads
+--   and user profiles.
+-- * revoked_tokens: session tokens revoked by /api/auth/logout, loaded and
+--   tailed by each process.
+
+-- --- Update queue ---
+
+CREATE TABLE IF NOT EXISTS telegram_updates (
+  update_id BIGINT PRIMARY KEY,
+  -- Sending user's id, or the update's own id when it has no user
+  lane TEXT NOT NULL,
+  payload JSONB NOT NULL,
+  received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  claimed_by TEXT,
+  claimed_until TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_telegram_updates_lane ON telegram_updates(lane, update_id);
+
+-- Enqueue unless `p_max_depth` updates are already waiting. Telegram
+-- redelivers an update whose webhook call failed, so a duplicate update_id
+-- is accepted and ignored.
+CREATE OR REPLACE FUNCTION enqueue_telegram_update(
+  p_update_id BIGINT, p_lane TEXT, p_payload JSONB, p_max_depth INTEGER
+) RETURNS BOOLEAN AS $$
+BEGIN
+  IF (SELECT count(*) FROM telegram_updates) >= p_max_depth THEN
+    RETURN FALSE;
+  END IF;
+  INSERT INTO telegram_updates (update_id, lane, payload)
+  VALUES (p_update_id, p_lane, p_payload)
+  ON CONFLICT (update_id) DO NOTHING;
+  RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Claim up to `p_limit` updates for `p_holder`. Only the oldest update of a
+-- lane can be claimed, and only while no one holds an unexpired claim on
+-- it; the row is deleted once processed (complete_telegram_update), which
+-- makes the next update of the lane its head. So a user's updates run
+-- strictly one after another, while different users' updates go to
+-- whichever process asks first. SKIP LOCKED keeps two concurrent claims
+-- from taking the same head. The holder renews its claims
+-- (renew_telegram_updates) for as long as it is working on them.
+CREATE OR REPLACE FUNCTION claim_telegram_updates(
+  p_holder TEXT, p_limit INTEGER, p_lease_seconds DOUBLE PRECISION
+) RETURNS SETOF JSONB
+LANGUAGE sql AS $$
+  UPDATE telegram_updates u
+  SET claimed_by = p_holder,
+      claimed_until = now() + make_interval(secs => p_lease_seconds)
+  WHERE u.update_id IN (
+    SELECT h.update_id FROM telegram_updates h
+    WHERE (h.claimed_until IS NULL OR h.claimed_until < now())
+      AND NOT EXISTS (
+        SELECT 1 FROM telegram_updates e
+        WHERE e.lane = h.lane AND e.update_id < h.update_id
+      )
+    ORDER BY h.update_id
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING u.payload;
+$$;
+
+-- Extend `p_holder`'s claims on `p_update_ids` while it is still working on
+-- them. Returns the ids it still holds; a missing id was claimed by another
+-- process after its lease ran out.
+CREATE OR REPLACE FUNCTION renew_telegram_updates(
+  p_holder TEXT, p_update_ids BIGINT[], p_lease_seconds DOUBLE PRECISION
+) RETURNS SETOF BIGINT
+LANGUAGE sql AS $$
+  UPDATE telegram_updates
+  SET claimed_until = now() + make_interval(secs => p_lease_seconds)
+  WHERE update_id = ANY(p_update_ids) AND claimed_by = p_holder
+  RETURNING update_id;
+$$;
+
+-- Delete a processed update, making the next update of its lane the head,
+-- but only if `p_holder` still holds the claim: a process whose lease ran
+-- out must not delete an update another process is now running. Returns
+-- whether the row was deleted.
+CREATE OR REPLACE FUNCTION complete_telegram_update(p_update_id BIGINT, p_holder TEXT) RETURNS BOOLEAN
+LANGUAGE sql AS $$
+  WITH deleted AS (
+    DELETE FROM telegram_updates
+    WHERE update_id = p_update_id AND claimed_by = p_holder
+    RETURNING 1
+  )
+  SELECT EXISTS (SELECT 1 FROM deleted);
+$$;
+
+-- Hand back a stopping process's unprocessed claims without waiting for
+-- their leases to run out.
+CREATE OR REPLACE FUNCTION release_telegram_updates(p_holder TEXT) RETURNS VOID
+LANGUAGE sql AS $$
+  UPDATE telegram_updates
+  SET claimed_by = NULL, claimed_until = NULL
+  WHERE claimed_by = p_holder;
+$$;
+
+-- --- Leases ---
+
+CREATE TABLE IF NOT EXISTS service_leases (
+  name TEXT PRIMARY KEY,
+  holder TEXT NOT NULL,
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
+-- Take `p_name` for `p_holder` if it is free or expired, or extend it if
+-- `p_holder` already has it. Returns whether `p_holder` holds it now.
+CREATE OR REPLACE FUNCTION acquire_lease(
+  p_name TEXT, p_holder TEXT, p_ttl_seconds DOUBLE PRECISION
+) RETURNS BOOLEAN AS $$
+BEGIN
+  INSERT INTO service_leases AS l (name, holder, expires_at)
+  VALUES (p_name, p_holder, now() + make_interval(secs => p_ttl_seconds))
+  ON CONFLICT (name) DO UPDATE SET
+    holder = EXCLUDED.holder,
+    expires_at = EXCLUDED.expires_at
+  WHERE l.holder = EXCLUDED.holder OR l.expires_at < now();
+  RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION release_lease(p_name TEXT, p_holder TEXT) RETURNS VOID
+LANGUAGE sql AS $$
+  DELETE FROM service_leases WHERE name = p_name AND holder = p_holder;
+$$;
+
+-- --- Cache invalidations ---
+
+CREATE TABLE IF NOT EXISTS cache_invalidations (
+  id BIGSERIAL PRIMARY KEY,
+  user_id TEXT NOT NULL,
+  table_name TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_cache_invalidations_created_at ON cache_invalidations(created_at);
+
+-- Row trigger; TG_ARGV[0] names the column holding the user's telegram id.
+-- An update that moves a row to another user invalidates both. Runs as the
+-- owner, so writes by any role are logged although cache_invalidations is
+-- closed to them (see Privileges).
+CREATE OR REPLACE FUNCTION log_cache_invalidation() RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP <> 'DELETE' THEN
+    INSERT INTO cache_invalidations (user_id, table_name)
+    VALUES (to_jsonb(NEW) ->> TG_ARGV[0], TG_TABLE_NAME);
+  END IF;
+  IF TG_OP = 'DELETE'
+     OR (TG_OP = 'UPDATE' AND (to_jsonb(OLD) ->> TG_ARGV[0]) IS DISTINCT FROM (to_jsonb(NEW) ->> TG_ARGV[0])) THEN
+    INSERT INTO cache_invalidations (user_id, table_name)
+    VALUES (to_jsonb(OLD) ->> TG_ARGV[0], TG_TABLE_NAME);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DO $$
+DECLARE
+  t TEXT;
+BEGIN
+  -- goals is created outside these migrations, so it may be missing
+  FOREACH t IN ARRAY ARRAY['meals', 'workouts', 'bodyweight', 'wellness', 'workout_quality', 'exercises', 'goals'] LOOP
+    IF to_regclass(t) IS NOT NULL THEN
+      EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_cache_invalidation ON %1$I', t);
+      EXECUTE format(
+        'CREATE TRIGGER trg_%1$s_cache_invalidation AFTER INSERT OR UPDATE OR DELETE ON %1$I '
+        'FOR EACH ROW EXECUTE FUNCTION log_cache_invalidation(''user_id'')',
+        t
+      );
+    END IF;
+  END LOOP;
+END $$;
+
+DROP TRIGGER IF EXISTS trg_users_cache_invalidation ON users;
+CREATE TRIGGER trg_users_cache_invalidation
+AFTER INSERT OR UPDATE OR DELETE ON users
+FOR EACH ROW EXECUTE FUNCTION log_cache_invalidation('telegram_id');
+
+-- --- Revoked tokens ---
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+  -- sha256 of the token, as in dependencies._token_key
+  token_hash TEXT PRIMARY KEY,
+  -- The token's exp; NULL for a token without one, which stays revoked
+  expires_at TIMESTAMPTZ,
+  revoked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_revoked_at ON revoked_tokens(revoked_at);
+
+-- Everything a process has to apply since its last poll, in one round trip.
+-- `p_since` is the `now` returned by the previous call, or NULL on the
+-- first, which returns every live revocation and no invalidations (a new
+-- process has nothing cached). Rows are re-read for `p_overlap_seconds`
+-- before `p_since`, because created_at is the writing transaction's start
+-- and it may commit after a poll that already passed that time; applying a
+-- row twice is harmless.
+CREATE OR REPLACE FUNCTION shared_state_changes(
+  p_since TIMESTAMPTZ, p_overlap_seconds DOUBLE PRECISION
+) RETURNS JSONB
+LANGUAGE sql STABLE AS $$
+  SELECT jsonb_build_object(
+    'now', now(),
+    'invalidations', COALESCE((
+      SELECT jsonb_agg(jsonb_build_object('id', i.id, 'user_id', i.user_id, 'table_name', i.table_name) ORDER BY i.id)
+      FROM cache_invalidations i
+      WHERE i.created_at > p_since - make_interval(secs => p_overlap_seconds)
+    ), '[]'::jsonb),
+    'revocations', COALESCE((
+      SELECT jsonb_agg(jsonb_build_object('token_hash', r.token_hash, 'exp', extract(epoch FROM r.expires_at)))
+      FROM revoked_tokens r
+      WHERE (r.expires_at IS NULL OR r.expires_at > now())
+        AND (p_since IS NULL OR r.revoked_at > p_since - make_interval(secs => p_overlap_seconds))
+    ), '[]'::jsonb)
+  );
+$$;
+
+-- Drop invalidations every process has long since applied, and revocations
+-- of tokens that have expired anyway.
+CREATE OR REPLACE FUNCTION prune_shared_state(p_keep_seconds DOUBLE PRECISION) RETURNS VOID
+LANGUAGE sql AS $$
+  DELETE FROM cache_invalidations WHERE created_at < now() - make_interval(secs => p_keep_seconds);
+  DELETE FROM revoked_tokens WHERE expires_at < now();
+$$;
+
+-- --- Privileges ---
+
+-- Only the backend, as service_role, touches any of this. RLS with no
+-- policies keeps the tables out of the anon/authenticated PostgREST API
+-- even if a grant slips back in, and the functions lose the EXECUTE that
+-- PUBLIC gets by default. Supabase's roles don't exist on a plain server.
+ALTER TABLE telegram_updates ENABLE ROW LEVEL SECURITY;
+ALTER TABLE service_leases ENABLE ROW LEVEL SECURITY;
+ALTER TABLE cache_invalidations ENABLE ROW LEVEL SECURITY;
+ALTER TABLE revoked_tokens ENABLE ROW LEVEL SECURITY;
+
+REVOKE EXECUTE ON FUNCTION
+  enqueue_telegram_update(BIGINT, TEXT, JSONB, INTEGER),
+  claim_telegram_updates(TEXT, INTEGER, DOUBLE PRECISION),
+  renew_telegram_updates(TEXT, BIGINT[], DOUBLE PRECISION),
+  complete_telegram_update(BIGINT, TEXT),
+  release_telegram_updates(TEXT),
+  acquire_lease(TEXT, TEXT, DOUBLE PRECISION),
+  release_lease(TEXT, TEXT),
+  shared_state_changes(TIMESTAMPTZ, DOUBLE PRECISION),
+  prune_shared_state(DOUBLE PRECISION)
+FROM PUBLIC;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN
+    REVOKE ALL ON TABLE telegram_updates, service_leases, cache_invalidations, revoked_tokens
+      FROM anon, authenticated;
+    REVOKE ALL ON SEQUENCE cache_invalidations_id_seq FROM anon, authenticated;
+    REVOKE EXECUTE ON FUNCTION
+      enqueue_telegram_update(BIGINT, TEXT, JSONB, INTEGER),
+      claim_telegram_updates(TEXT, INTEGER, DOUBLE PRECISION),
+      renew_telegram_updates(TEXT, BIGINT[], DOUBLE PRECISION),
+      complete_telegram_update(BIGINT, TEXT),
+      release_telegram_updates(TEXT),
+      acquire_lease(TEXT, TEXT, DOUBLE PRECISION),
+      release_lease(TEXT, TEXT),
+      shared_state_changes(TIMESTAMPTZ, DOUBLE PRECISION),
+      prune_shared_state(DOUBLE PRECISION)
+    FROM anon, authenticated;
+
+    GRANT ALL ON TABLE telegram_updates, service_leases, cache_invalidations, revoked_tokens TO service_role;
+    GRANT ALL ON SEQUENCE cache_invalidations_id_seq TO service_role;
+    GRANT EXECUTE ON FUNCTION
+      enqueue_telegram_update(BIGINT, TEXT, JSONB, INTEGER),
+      claim_telegram_updates(TEXT, INTEGER, DOUBLE PRECISION),
+      renew_telegram_updates(TEXT, BIGINT[], DOUBLE PRECISION),
+      complete_telegram_update(BIGINT, TEXT),
+      release_telegram_updates(TEXT),
+      acquire_lease(TEXT, TEXT, DOUBLE PRECISION),
+      release_lease(TEXT, TEXT),
+      shared_state_changes(TIMESTAMPTZ, DOUBLE PRECISION),
+      prune_shared_state(DOUBLE PRECISION)
+    TO service_role;
+  END IF;
+END $$;
@@ -0,0 +1,92 @@
+-- Base tables the migrations in migrations/ are applied on top of, matching
+-- the columns the app reads and writes (see backend/schemas/log_schemas.py)
+-- and the original indexes from database-schema.md. Uses gen_random_uuid()
+-- so the test database needs no uuid-ossp extension.
+
+CREATE TABLE users (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  telegram_id TEXT NOT NULL,
+  display_name TEXT,
+  symptoms_mode BOOLEAN NOT NULL DEFAULT FALSE,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE meals (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id TEXT NOT NULL,
+  timestamp TIMESTAMPTZ NOT NULL,
+  description TEXT NOT NULL,
+  calories INTEGER NOT NULL CHECK (calories >= 0),
+  protein_g INTEGER NOT NULL CHECK (protein_g >= 0),
+  carbs_g INTEGER NOT NULL CHECK (carbs_g >= 0),
+  fat_g INTEGER NOT NULL CHECK (fat_g >= 0),
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE workouts (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id TEXT NOT NULL,
+  timestamp TIMESTAMPTZ NOT NULL,
+  description TEXT NOT NULL,
+  estimated_calories_burned INTEGER NOT NULL CHECK (estimated_calories_burned >= 0),
+  intensity_score INTEGER CHECK (intensity_score BETWEEN 0 AND 10),
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE bodyweight (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id TEXT NOT NULL,
+  timestamp TIMESTAMPTZ NOT NULL,
+  weight_lbs DECIMAL(6,2) NOT NULL CHECK (weight_lbs > 0),
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE wellness (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id TEXT NOT NULL,
+  timestamp TIMESTAMPTZ NOT NULL,
+  symptom_score INTEGER NOT NULL CHECK (symptom_score BETWEEN 0 AND 10),
+  symptom TEXT,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE workout_quality (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id TEXT NOT NULL,
+  timestamp TIMESTAMPTZ NOT NULL,
+  performance_score INTEGER NOT NULL CHECK (performance_score BETWEEN 0 AND 10),
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE exercises (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id TEXT NOT NULL,
+  timestamp TIMESTAMPTZ NOT NULL,
+  exercise_name TEXT NOT NULL,
+  sets INTEGER NOT NULL CHECK (sets >= 1),
+  reps INTEGER NOT NULL CHECK (reps >= 1),
+  weight_lbs DECIMAL(6,2) NOT NULL CHECK (weight_lbs >= 0),
+  notes TEXT,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE pending_logs (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id TEXT NOT NULL,
+  telegram_chat_id TEXT NOT NULL,
+  type TEXT NOT NULL,
+  payload JSONB NOT NULL,
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX idx_meals_timestamp ON meals(timestamp);
+CREATE INDEX idx_meals_user_id ON meals(user_id);
+CREATE INDEX idx_workouts_timestamp ON workouts(timestamp);
+CREATE INDEX idx_workouts_user_id ON workouts(user_id);
+CREATE INDEX idx_bodyweight_timestamp ON bodyweight(timestamp);
+CREATE INDEX idx_bodyweight_user_id ON bodyweight(user_id);
+CREATE INDEX idx_wellness_timestamp ON wellness(timestamp);
+CREATE INDEX idx_wellness_user_id ON wellness(user_id);
+CREATE INDEX idx_workout_quality_timestamp ON workout_quality(timestamp);
+CREATE INDEX idx_workout_quality_user_id ON workout_quality(user_id);
+CREATE INDEX idx_pending_logs_user_id ON pending_logs(user_id);
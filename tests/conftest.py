@@ -0,0 +1,105 @@
+"""Shared test setup.
+
+Backend modules are imported the way main.py imports them, with backend/ on
+sys.path. Tests that need PostgreSQL use the `database_url` fixture: point
+TEST_DATABASE_URL at a server and role that may create databases, and each
+session builds a throwaway database from base_schema.sql plus every file in
+migrations/, in order. Without it those tests are skipped.
+
+Load tests use `slow_supabase` instead: a stand-in for the supabase-py
+client whose `.execute()` blocks for a fixed round-trip time and returns no
+rows, so they measure how the app schedules queries, not PostgREST.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+TESTS = Path(__file__).resolve().parent
+
+sys.path.insert(0, str(ROOT / "backend"))
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+os.environ.setdefault("JWT_SECRET", "test-jwt-secret-at-least-32-bytes-long")
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    """Connection string of a fresh database with the base schema and all migrations applied."""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    psycopg = pytest.importorskip("psycopg")
+
+    name = f"nutriclaude_test_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(url, autocommit=True) as admin:
+        # UTF8 like Supabase, whatever the server's default encoding is
+        admin.execute(f"CREATE DATABASE \"{name}\" ENCODING 'UTF8' TEMPLATE template0")
+    test_url = psycopg.conninfo.make_conninfo(url, dbname=name)
+    try:
+        with psycopg.connect(test_url, autocommit=True) as conn:
+            conn.execute((TESTS / "base_schema.sql").read_text())
+            for path in sorted((ROOT / "migrations").glob("*.sql")):
+                conn.execute(path.read_text())
+        yield test_url
+    finally:
+        with psycopg.connect(url, autocommit=True) as admin:
+            admin.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+
+
+class _SlowQuery:
+    """Chainable stand-in for a postgrest query builder."""
+
+    def __init__(self, client: "SlowSupabase"):
+        self._client = client
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        return self._client.round_trip()
+
+
+class SlowSupabase:
+    """Client whose every query blocks the calling thread for `latency` seconds."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> _SlowQuery:
+        return _SlowQuery(self)
+
+    def rpc(self, name: str, params: dict = None) -> _SlowQuery:
+        return _SlowQuery(self)
+
+    def round_trip(self):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return SimpleNamespace(data=[], count=None)
+
+
+@pytest.fixture
+def slow_supabase(monkeypatch):
+    from services import supabase_service
+
+    client = SlowSupabase(latency=0.05)
+    monkeypatch.setattr(supabase_service, "_client", client)
+    return client
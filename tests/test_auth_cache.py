@@ -0,0 +1,180 @@
+"""Verified-token cache and revocation in dependencies.get_current_user.
+
+Includes a microbenchmark of per-request auth overhead and a local load test
+of the dashboard endpoints with and without the cache (run with -s to see
+the numbers).
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import jwt
+import pytest
+from cachetools import TLRUCache
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import dependencies
+import main
+from config.settings import JWT_SECRET
+from dependencies import get_current_user, revoke_token
+
+DASHBOARD_ENDPOINTS = [
+    "/api/kpis", "/api/meals", "/api/weight", "/api/wellness",
+    "/api/performance", "/api/dates", "/api/calorie-balance", "/api/exercise-prs",
+]
+
+
+def _token(telegram_id: str = "42", expires_in: timedelta = timedelta(days=7)) -> str:
+    return jwt.encode(
+        {
+            "telegram_id": telegram_id,
+            "display_name": "Test",
+            "type": "session",
+            "exp": datetime.now(timezone.utc) + expires_in,
+        },
+        JWT_SECRET,
+        algorithm="HS256",
+    )
+
+
+def _credentials(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+class _NoCache(dict):
+    """Drop-in for the verified-token cache that never keeps anything."""
+
+    def __setitem__(self, key, value):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def fresh_auth_state(monkeypatch):
+    monkeypatch.setattr(dependencies, "_verified", TLRUCache(
+        maxsize=dependencies.AUTH_CACHE_SIZE, ttu=dependencies._until_exp, timer=time.time,
+    ))
+    monkeypatch.setattr(dependencies, "_revoked", {})
+    monkeypatch.setattr(dependencies, "_revoked_by_exp", [])
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(dependencies.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_repeat_requests_skip_decode(decode_calls):
+    token = _token()
+    for _ in range(5):
+        user = asyncio.run(get_current_user(_credentials(token)))
+    assert user == {"telegram_id": "42", "display_name": "Test"}
+    assert len(decode_calls) == 1
+
+
+def test_revoked_token_rejected_even_when_cached():
+    token = _token()
+    asyncio.run(get_current_user(_credentials(token)))
+    revoke_token(token)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_current_user(_credentials(token)))
+    assert exc.value.detail == "Token revoked"
+
+
+def test_revocation_survives_cache_pressure(monkeypatch):
+    """Revocations are never evicted to make room, however many there are."""
+    monkeypatch.setattr(dependencies, "_verified", TLRUCache(maxsize=8, ttu=dependencies._until_exp, timer=time.time))
+    revoked = _token("victim")
+    revoke_token(revoked)
+    for i in range(100):
+        token = _token(f"user-{i}")
+        asyncio.run(get_current_user(_credentials(token)))
+        revoke_token(token)
+
+    with pytest.raises(HTTPException):
+        asyncio.run(get_current_user(_credentials(revoked)))
+
+
+def test_expired_revocations_are_pruned():
+    short = _token("short", expires_in=timedelta(seconds=1))
+    revoke_token(short)
+    time.sleep(1.1)
+    revoke_token(_token("other"))
+    assert list(dependencies._revoked.values()) == [pytest.approx(time.time() + 7 * 24 * 3600, abs=5)]
+
+
+def test_logout_revokes_session(slow_supabase):
+    token = _token()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            before = await client.get("/api/auth/me", headers=headers)
+            logout = await client.post("/api/auth/logout", headers=headers)
+            after = await client.get("/api/auth/me", headers=headers)
+        return before, logout, after
+
+    before, logout, after = asyncio.run(run())
+    assert before.status_code == 200
+    assert logout.json() == {"status": "ok"}
+    assert after.status_code == 401
+
+
+def test_auth_overhead_microbenchmark(monkeypatch):
+    token = _token()
+    credentials = _credentials(token)
+    n = 2000
+
+    async def per_call() -> float:
+        started = time.perf_counter()
+        for _ in range(n):
+            await get_current_user(credentials)
+        return (time.perf_counter() - started) / n
+
+    cached = asyncio.run(per_call())
+    monkeypatch.setattr(dependencies, "_verified", _NoCache())
+    uncached = asyncio.run(per_call())
+
+    print(f"\nget_current_user: {1e6 * cached:.1f} us cached, {1e6 * uncached:.1f} us with jwt.decode")
+    assert cached < uncached
+
+
+def test_dashboard_load_with_and_without_cache(slow_supabase, decode_calls, monkeypatch):
+    """Same token across 50 dashboard loads of 8 requests each, like the frontend."""
+    slow_supabase.latency = 0
+    headers = {"Authorization": f"Bearer {_token()}"}
+    loads = 50
+
+    async def run() -> float:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            for _ in range(loads):
+                responses = await asyncio.gather(*(client.get(path, headers=headers) for path in DASHBOARD_ENDPOINTS))
+                assert all(r.status_code == 200 for r in responses)
+            return time.perf_counter() - started
+
+    cached = asyncio.run(run())
+    cached_decodes = len(decode_calls)
+    decode_calls.clear()
+    monkeypatch.setattr(dependencies, "_verified", _NoCache())
+    uncached = asyncio.run(run())
+
+    requests = loads * len(DASHBOARD_ENDPOINTS)
+    print(
+        f"\n{requests} dashboard requests: {requests / cached:.0f} req/s with the auth cache "
+        f"({cached_decodes} decodes), {requests / uncached:.0f} req/s without ({len(decode_calls)} decodes)"
+    )
+    assert cached_decodes == 1
+    assert len(decode_calls) == requests
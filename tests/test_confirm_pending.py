@@ -0,0 +1,128 @@
+"""confirm_pending_logs RPC (migration 004) against a real database."""
+from __future__ import annotations
+
+import json
+import threading
+import uuid
+from typing import List
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+MEAL = {
+    "type": "meal",
+    "timestamp": "2026-01-01T12:00:00-05:00",
+    "description": "Chicken and rice",
+    "calories": 600,
+    "protein_g": 45,
+    "carbs_g": 70,
+    "fat_g": 12,
+}
+
+
+@pytest.fixture
+def conn(database_url):
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        yield conn
+
+
+def _create_pending(conn, user_id: str, payload: dict, batch_id: str = None) -> str:
+    return conn.execute(
+        "INSERT INTO pending_logs (user_id, telegram_chat_id, type, payload, batch_id) "
+        "VALUES (%s, %s, %s, %s, %s) RETURNING id",
+        (user_id, "chat", payload["type"], json.dumps(payload), batch_id),
+    ).fetchone()[0]
+
+
+def _meal_count(conn, user_id: str) -> int:
+    return conn.execute("SELECT count(*) FROM meals WHERE user_id = %s", (user_id,)).fetchone()[0]
+
+
+def test_concurrent_confirms_insert_once(database_url, conn):
+    """Two confirms of the same id, the second issued while the first holds the row."""
+    user_id = f"user-{uuid.uuid4()}"
+    pending_id = _create_pending(conn, user_id, MEAL)
+    second_result: List[list] = []
+
+    with psycopg.connect(database_url) as first:
+        claimed = first.execute("SELECT * FROM confirm_pending_logs(ARRAY[%s]::uuid[])", (pending_id,)).fetchall()
+
+        def confirm_again() -> None:
+            with psycopg.connect(database_url, autocommit=True) as second:
+                second_result.append(
+                    second.execute("SELECT * FROM confirm_pending_logs(ARRAY[%s]::uuid[])", (pending_id,)).fetchall()
+                )
+
+        thread = threading.Thread(target=confirm_again)
+        thread.start()
+        # The second call is now blocked on the row lock the first one holds
+        thread.join(timeout=0.5)
+        assert thread.is_alive()
+        first.commit()
+        thread.join(timeout=5)
+
+    assert len(claimed) == 1
+    assert second_result == [[]]
+    assert _meal_count(conn, user_id) == 1
+
+
+def test_parallel_confirm_race_inserts_once(database_url, conn):
+    """Release both confirms at the same moment, many times over."""
+    for _ in range(20):
+        user_id = f"user-{uuid.uuid4()}"
+        pending_id = _create_pending(conn, user_id, MEAL)
+        barrier = threading.Barrier(2)
+        results: List[list] = []
+
+        def confirm() -> None:
+            with psycopg.connect(database_url, autocommit=True) as c:
+                barrier.wait()
+                results.append(c.execute("SELECT * FROM confirm_pending_logs(ARRAY[%s]::uuid[])", (pending_id,)).fetchall())
+
+        threads = [threading.Thread(target=confirm) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=5)
+
+        assert sorted(len(r) for r in results) == [0, 1]
+        assert _meal_count(conn, user_id) == 1
+
+
+def test_batch_with_mixed_optional_fields(conn):
+    """Entries of one batch carry different optional keys; every one must land."""
+    user_id = f"user-{uuid.uuid4()}"
+    batch_id = str(uuid.uuid4())
+    ts = "2026-01-01T18:00:00-05:00"
+    payloads = [
+        MEAL,
+        {"type": "workout", "timestamp": ts, "description": "Run", "estimated_calories_burned": 300, "intensity_score": 7},
+        {"type": "workout", "timestamp": ts, "description": "Walk", "estimated_calories_burned": 120},
+        {"type": "exercise", "timestamp": ts, "exercise_name": "Squat", "sets": 3, "reps": 5, "weight_lbs": 225,
+         "notes": "paused"},
+        {"type": "exercise", "timestamp": ts, "exercise_name": "Squat", "sets": 2, "reps": 8, "weight_lbs": 185},
+        {"type": "wellness", "timestamp": ts, "symptom_score": 4, "symptom": "headache"},
+        {"type": "wellness", "timestamp": ts, "symptom_score": 2},
+    ]
+    for payload in payloads:
+        _create_pending(conn, user_id, payload, batch_id)
+
+    rows = conn.execute("SELECT log_table, inserted FROM confirm_pending_logs(NULL, %s)", (batch_id,)).fetchall()
+
+    assert sorted(table for table, _ in rows) == [
+        "exercises", "exercises", "meals", "wellness", "wellness", "workouts", "workouts",
+    ]
+    intensities = conn.execute(
+        "SELECT intensity_score FROM workouts WHERE user_id = %s ORDER BY description", (user_id,)
+    ).fetchall()
+    assert intensities == [(7,), (None,)]
+    notes = conn.execute(
+        "SELECT notes FROM exercises WHERE user_id = %s ORDER BY sets DESC", (user_id,)
+    ).fetchall()
+    assert notes == [("paused",), (None,)]
+    symptoms = conn.execute(
+        "SELECT symptom FROM wellness WHERE user_id = %s ORDER BY symptom_score DESC", (user_id,)
+    ).fetchall()
+    assert symptoms == [("headache",), (None,)]
+    assert conn.execute("SELECT count(*) FROM pending_logs WHERE batch_id = %s", (batch_id,)).fetchone()[0] == 0
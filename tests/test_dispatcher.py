@@ -0,0 +1,331 @@
+"""Per-user lanes in services.dispatcher: ordering, cross-user concurrency,
+DISPATCH_MAX_PENDING backpressure (down to getUpdates polling, against a
+stand-in Bot API), and a 1,000-update burst benchmark (run with -s to see
+the numbers)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict, List
+
+from telegram.ext import _applicationbuilder as applicationbuilder
+from telegram.request import BaseRequest
+
+from services.dispatcher import LaneDispatcher, LaneUpdateProcessor, lane_key
+
+
+class Recorder:
+    """Work items that log their start/end and track how many run at once."""
+
+    def __init__(self):
+        self.log: List[tuple] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def work(self, key, seq, duration: float = 0.0, gate: asyncio.Event = None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.log.append(("start", key, seq))
+        try:
+            if gate is not None:
+                await gate.wait()
+            await asyncio.sleep(duration)
+        finally:
+            self.in_flight -= 1
+            self.log.append(("end", key, seq))
+
+
+def _order(log: List[tuple]) -> Dict[object, List[int]]:
+    per_key: Dict[object, List[int]] = defaultdict(list)
+    for event, key, seq in log:
+        if event == "start":
+            per_key[key].append(seq)
+    return per_key
+
+
+def test_a_slow_update_holds_back_only_its_own_user():
+    recorder = Recorder()
+
+    async def run():
+        dispatcher = LaneDispatcher(max_concurrent=4, max_pending=100)
+        slow = asyncio.Event()
+        first = await dispatcher.submit("a", recorder.work("a", 1, gate=slow))
+        second = await dispatcher.submit("a", recorder.work("a", 2))
+        other = await dispatcher.submit("b", recorder.work("b", 1))
+        await other
+        # b finished while a's first update is still running and its second waits
+        assert not first.done() and not second.done()
+        assert ("start", "a", 2) not in recorder.log
+        slow.set()
+        await asyncio.gather(first, second)
+        return dispatcher.stats()
+
+    stats = asyncio.run(run())
+    assert recorder.log.index(("end", "a", 1)) < recorder.log.index(("start", "a", 2))
+    assert stats["processed"] == 3 and stats["active_lanes"] == 0
+
+
+def test_users_run_concurrently_up_to_the_cap():
+    recorder = Recorder()
+
+    async def run():
+        dispatcher = LaneDispatcher(max_concurrent=3, max_pending=100)
+        gate = asyncio.Event()
+        futures = [await dispatcher.submit(user, recorder.work(user, 1, gate=gate)) for user in range(8)]
+        await asyncio.sleep(0.01)
+        running = (recorder.in_flight, dispatcher.stats())
+        gate.set()
+        await asyncio.gather(*futures)
+        return running
+
+    (in_flight, stats) = asyncio.run(run())
+    assert in_flight == 3
+    assert stats["in_flight"] == 3 and stats["queue_depth"] == 5 and stats["active_lanes"] == 8
+    assert recorder.max_in_flight == 3
+
+
+def test_submit_blocks_at_max_pending():
+    recorder = Recorder()
+
+    async def run():
+        dispatcher = LaneDispatcher(max_concurrent=2, max_pending=3)
+        gate = asyncio.Event()
+        futures = [await dispatcher.submit(user, recorder.work(user, 1, gate=gate)) for user in range(3)]
+
+        blocked = asyncio.create_task(dispatcher.submit("late", recorder.work("late", 1)))
+        await asyncio.sleep(0.02)
+        # Queued and running items fill every pending slot, so the feeder waits
+        assert not blocked.done()
+        assert dispatcher.stats()["queue_depth"] == 1
+
+        gate.set()
+        futures.append(await asyncio.wait_for(blocked, 1))
+        await asyncio.gather(*futures)
+        return dispatcher.stats()
+
+    stats = asyncio.run(run())
+    assert stats["processed"] == 4
+    assert stats["max_lane_wait_ms"] > 0
+
+
+def test_a_failed_update_does_not_stop_its_lane():
+    recorder = Recorder()
+
+    async def fail():
+        raise RuntimeError("handler blew up")
+
+    async def run():
+        dispatcher = LaneDispatcher(max_concurrent=2, max_pending=10)
+        failed = await dispatcher.submit("a", fail())
+        after = await dispatcher.submit("a", recorder.work("a", 2))
+        await asyncio.gather(failed, after)
+        return dispatcher.stats()
+
+    stats = asyncio.run(run())
+    assert stats["failed"] == 1 and stats["processed"] == 2
+    assert _order(recorder.log) == {"a": [2]}
+
+
+def test_shutdown_discards_queued_updates():
+    recorder = Recorder()
+
+    async def run():
+        dispatcher = LaneDispatcher(max_concurrent=1, max_pending=10)
+        gate = asyncio.Event()
+        running = await dispatcher.submit("a", recorder.work("a", 1, gate=gate))
+        queued = await dispatcher.submit("a", recorder.work("a", 2))
+        await asyncio.sleep(0.01)
+        await dispatcher.shutdown()
+        return running, queued
+
+    _, queued = asyncio.run(run())
+    assert queued.cancelled()
+    assert ("start", "a", 2) not in recorder.log
+
+
+def test_update_processor_queues_and_drains_on_shutdown():
+    recorder = Recorder()
+
+    def update(user_id):
+        return SimpleNamespace(effective_user=SimpleNamespace(id=user_id))
+
+    async def run():
+        processor = LaneUpdateProcessor(LaneDispatcher(max_concurrent=4, max_pending=10), drain_timeout=1)
+        # PTB's fetcher awaits each update in turn rather than spawning a task per update
+        assert processor.max_concurrent_updates == 1
+        gate = asyncio.Event()
+        await processor.do_process_update(update(1), recorder.work(lane_key(update(1)), 1, gate=gate))
+        # Returns once queued, so the fetcher can move on to the next update
+        assert ("end", 1, 1) not in recorder.log
+        asyncio.get_running_loop().call_later(0.02, gate.set)
+        # Shutdown lets queued work finish first
+        await processor.shutdown()
+        assert ("end", 1, 1) in recorder.log
+        # Updates without a user never share a lane
+        no_user = SimpleNamespace(effective_user=None)
+        assert lane_key(no_user) != lane_key(no_user)
+
+    asyncio.run(run())
+
+
+def test_update_processor_discards_work_that_outlasts_the_drain(caplog):
+    recorder = Recorder()
+
+    async def run():
+        processor = LaneUpdateProcessor(LaneDispatcher(max_concurrent=1, max_pending=10), drain_timeout=0.02)
+        stuck = SimpleNamespace(effective_user=SimpleNamespace(id=1))
+        await processor.do_process_update(stuck, recorder.work(1, 1, gate=asyncio.Event()))
+        await processor.do_process_update(stuck, recorder.work(1, 2))
+        await processor.shutdown()
+
+    asyncio.run(run())
+    assert ("start", 1, 2) not in recorder.log
+    assert "Discarding 2 updates still queued at shutdown" in caplog.text
+
+
+class FakeTelegram(BaseRequest):
+    """Bot API stand-in: getUpdates hands out UPDATES text messages from
+    three users, ten per call, and records the offset of each call."""
+
+    UPDATES = 60
+    polls: List[int] = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        endpoint = url.rsplit("/", 1)[-1]
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+        elif endpoint == "getUpdates":
+            offset = (request_data.parameters if request_data else {}).get("offset") or 1
+            self.polls.append(offset)
+            result = [self._message(u) for u in range(offset, min(offset + 10, self.UPDATES + 1))]
+            if not result:
+                await asyncio.sleep(0.01)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    @staticmethod
+    def _message(update_id: int) -> dict:
+        user = {"id": update_id % 3 + 1, "is_bot": False, "first_name": "u"}
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": 0, "chat": {"id": user["id"], "type": "private"},
+            "from": user, "text": "hi",
+        }}
+
+
+def test_full_dispatcher_stalls_polling(monkeypatch):
+    """With the dispatcher full, the Updater stops calling getUpdates until it drains."""
+    import bot
+    from telegram import Update
+    from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+    FakeTelegram.polls = []
+    monkeypatch.setattr(applicationbuilder, "HTTPXRequest", FakeTelegram)
+    monkeypatch.setattr(bot, "UPDATE_QUEUE_SIZE", 3)
+    seen: List[tuple] = []
+
+    async def run():
+        dispatcher = LaneDispatcher(max_concurrent=2, max_pending=4)
+        app = bot.build_application("1:test", dispatcher)
+        gate = asyncio.Event()
+
+        async def handle(update, context):
+            await gate.wait()
+            seen.append((update.effective_user.id, update.update_id))
+            raise ApplicationHandlerStop
+
+        app.add_handler(TypeHandler(Update, handle), group=-1)
+        await app.initialize()
+        await app.start()
+        await app.updater.start_polling(poll_interval=0)
+
+        await asyncio.sleep(0.2)
+        stalled = (list(FakeTelegram.polls), dispatcher.pending, app.update_queue.qsize())
+        gate.set()
+        while len(seen) < FakeTelegram.UPDATES:
+            await asyncio.sleep(0.01)
+
+        await app.updater.stop()
+        await app.stop()
+        await app.shutdown()
+        return stalled
+
+    polls, pending, queued = asyncio.run(run())
+    # The first ten updates fill the dispatcher (4), the fetcher (1) and the
+    # bounded queue (3); the Updater is still putting the rest of the batch
+    assert polls == [1]
+    assert pending == 4 and queued == 3
+    # Then everything arrives, each user's updates in order
+    assert sorted(u for _, u in seen) == list(range(1, FakeTelegram.UPDATES + 1))
+    for user in (1, 2, 3):
+        ids = [u for who, u in seen if who == user]
+        assert ids == sorted(ids)
+
+
+BURST = 1000
+USERS = 50
+MAX_CONCURRENT = 16
+
+
+def test_burst_of_1000_updates():
+    """1,000 updates from 50 users, each taking 1-10 ms like a short handler."""
+    rng = random.Random(0)
+    updates = [(rng.randrange(USERS), seq) for seq in range(BURST)]
+    durations = [rng.uniform(0.001, 0.01) for _ in range(BURST)]
+    recorder = Recorder()
+    depth_peak = 0
+
+    async def run():
+        nonlocal depth_peak
+        dispatcher = LaneDispatcher(max_concurrent=MAX_CONCURRENT, max_pending=BURST)
+        started = time.perf_counter()
+        futures = []
+        for (user, seq), duration in zip(updates, durations):
+            futures.append(await dispatcher.submit(user, recorder.work(user, seq, duration)))
+            depth_peak = max(depth_peak, dispatcher.stats()["queue_depth"])
+        await asyncio.gather(*futures)
+        return time.perf_counter() - started, dispatcher.stats()
+
+    elapsed, stats = asyncio.run(run())
+    serialized = sum(durations)
+    print(
+        f"\n{BURST} updates from {USERS} users: {elapsed:.2f}s (serialized {serialized:.2f}s), "
+        f"peak {recorder.max_in_flight} in flight, peak queue depth {depth_peak}, "
+        f"lane wait avg {stats['avg_lane_wait_ms']} ms / max {stats['max_lane_wait_ms']} ms"
+    )
+
+    # Each user's updates started in the order they were submitted
+    expected: Dict[int, List[int]] = defaultdict(list)
+    for user, seq in updates:
+        expected[user].append(seq)
+    assert _order(recorder.log) == expected
+    # ...and never overlapped
+    running = set()
+    for event, user, _ in recorder.log:
+        if event == "start":
+            assert user not in running
+            running.add(user)
+        else:
+            running.discard(user)
+
+    assert recorder.max_in_flight == MAX_CONCURRENT
+    assert stats["processed"] == BURST and stats["failed"] == 0
+    assert stats["queue_depth"] == 0 and stats["active_lanes"] == 0
+    assert elapsed < serialized / 4
@@ -0,0 +1,228 @@
+"""Micro-batched extraction (EXTRACTION_BATCH_SIZE > 1) in claude_service.
+
+The benchmark sends a burst of concurrent messages through extract_log with
+batching off and on and reports Claude calls, token cost and per-message
+latency (run with -s to see the numbers). Offline it uses a stand-in client
+whose calls take a fixed round trip plus a per-message generation time;
+set RUN_CLAUDE_BENCHMARK=1 with ANTHROPIC_API_KEY to run the same burst
+against the real API.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import statistics
+import time
+from types import SimpleNamespace
+from typing import List, Optional
+
+import anthropic
+import httpx
+import pytest
+
+from config.settings import ANTHROPIC_MAX_CONCURRENCY
+from services import claude_service
+from services.claude_service import _call_extraction_batch, extract_log
+from utils.helpers import MicroBatcher
+
+NOW = "2026-01-01T12:00:00-05:00"
+WEIGHT = {"type": "bodyweight", "timestamp": NOW, "weight_lbs": 180}
+
+# Claude Haiku 4.5, USD per million tokens
+PRICE_PER_MTOK = {
+    "input_tokens": 1.00,
+    "cache_creation_input_tokens": 1.25,
+    "cache_read_input_tokens": 0.10,
+    "output_tokens": 5.00,
+}
+
+BURST = 32
+BATCH_SIZE = 8
+BATCH_WAIT = 0.05
+
+
+class _FakeStream:
+    def __init__(self, messages: "FakeMessages", kwargs: dict):
+        self._messages = messages
+        self._kwargs = kwargs
+
+    async def __aenter__(self):
+        await self._messages.round_trip(self._kwargs, 1)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+    async def get_final_message(self):
+        return self._messages.response("record_entries", {"entries": [WEIGHT]}, self._kwargs, 1)
+
+
+class FakeMessages:
+    """Messages API stand-in: every call takes `latency` plus `per_message` per extracted message.
+
+    Set `fail` to make the next call raise it.
+    """
+
+    def __init__(self, latency: float = 0.1, per_message: float = 0.005):
+        self.latency = latency
+        self.per_message = per_message
+        self.fail: Optional[Exception] = None
+        self.calls: List[tuple] = []
+
+    async def round_trip(self, kwargs: dict, n: int) -> None:
+        self.calls.append((kwargs["tools"][0]["name"], n, kwargs["max_tokens"]))
+        if self.fail is not None:
+            error, self.fail = self.fail, None
+            raise error
+        await asyncio.sleep(self.latency + self.per_message * n)
+
+    def response(self, tool: str, tool_input: dict, kwargs: dict, n: int):
+        prompt = kwargs["messages"][-1]["content"]
+        # The system prompt is read from the cache only if it is marked cacheable
+        system = len(claude_service.SYSTEM_PROMPT) // 4
+        cached = claude_service._cache_breakpoint(kwargs)
+        usage = SimpleNamespace(
+            input_tokens=300 + len(prompt) // 4 + (0 if cached else system),
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=system if cached else 0,
+            output_tokens=20 + 60 * n,
+        )
+        block = SimpleNamespace(type="tool_use", id="toolu_1", name=tool, input=tool_input)
+        return SimpleNamespace(content=[block], usage=usage)
+
+    async def create(self, **kwargs):
+        ids = re.findall(r'<message id="(m\d+)">', kwargs["messages"][-1]["content"])
+        await self.round_trip(kwargs, len(ids))
+        results = [{"message_id": i, "entries": [WEIGHT]} for i in ids]
+        return self.response("record_batch", {"results": results}, kwargs, len(ids))
+
+    def stream(self, **kwargs):
+        return _FakeStream(self, kwargs)
+
+
+@pytest.fixture
+def fake_messages(monkeypatch):
+    messages = FakeMessages()
+    monkeypatch.setattr(claude_service, "client", SimpleNamespace(messages=messages))
+    return messages
+
+
+def _cost(usage: dict) -> float:
+    return sum(usage[field] * price for field, price in PRICE_PER_MTOK.items()) / 1e6
+
+
+def _burst(monkeypatch, n: int, batch_size: int) -> dict:
+    """Extract `n` distinct messages at once; returns calls, cost and latencies."""
+    monkeypatch.setattr(claude_service, "_semaphore", asyncio.Semaphore(ANTHROPIC_MAX_CONCURRENCY))
+    batcher = MicroBatcher(_call_extraction_batch, batch_size, BATCH_WAIT) if batch_size > 1 else None
+    monkeypatch.setattr(claude_service, "_batcher", batcher)
+    before = dict(claude_service._usage)
+    run_id = time.time_ns()
+
+    async def one(i: int) -> float:
+        started = time.perf_counter()
+        success, _, _, error = await extract_log(
+            f"weighed myself after breakfast, message {i} of burst {run_id}", user_id=f"bench-{i}",
+        )
+        assert success, error
+        return time.perf_counter() - started
+
+    async def run() -> tuple:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(n)))
+        return latencies, time.perf_counter() - started
+
+    latencies, elapsed = asyncio.run(run())
+    usage = {field: claude_service._usage[field] - before[field] for field in before}
+    return {
+        "calls": usage["calls"],
+        "cost": _cost(usage),
+        "elapsed": elapsed,
+        "mean": statistics.mean(latencies),
+        "p95": statistics.quantiles(latencies, n=20)[-1],
+        "added_wait": batcher.stats()["avg_added_wait_ms"] if batcher is not None else 0.0,
+    }
+
+
+def _report(label: str, unbatched: dict, batched: dict) -> None:
+    print(f"\n{label}: {BURST} concurrent messages, batch size {BATCH_SIZE}, wait {1000 * BATCH_WAIT:.0f} ms")
+    for name, r in (("unbatched", unbatched), ("batched", batched)):
+        print(
+            f"  {name:>9}: {r['calls']:3d} calls, ${r['cost']:.4f}, {r['elapsed']:.2f}s total, "
+            f"latency mean {1000 * r['mean']:.0f} ms / p95 {1000 * r['p95']:.0f} ms, "
+            f"batching wait {r['added_wait']:.0f} ms"
+        )
+
+
+def test_batching_benchmark(fake_messages, monkeypatch):
+    unbatched = _burst(monkeypatch, BURST, 1)
+    batched = _burst(monkeypatch, BURST, BATCH_SIZE)
+    _report("stand-in client", unbatched, batched)
+
+    assert unbatched["calls"] == BURST
+    assert batched["calls"] == BURST // BATCH_SIZE
+    # One system prompt per call instead of per message
+    assert batched["cost"] < unbatched["cost"]
+    # A full burst never waits out the window, and no message waits longer than it
+    assert batched["added_wait"] <= 1000 * BATCH_WAIT
+
+
+@pytest.mark.skipif(
+    not (os.getenv("RUN_CLAUDE_BENCHMARK") and os.getenv("ANTHROPIC_API_KEY")),
+    reason="set RUN_CLAUDE_BENCHMARK=1 and ANTHROPIC_API_KEY to benchmark against the API",
+)
+def test_batching_benchmark_live(monkeypatch):
+    unbatched = _burst(monkeypatch, BURST, 1)
+    batched = _burst(monkeypatch, BURST, BATCH_SIZE)
+    _report("Claude API", unbatched, batched)
+
+
+def test_oversized_batch_is_split(fake_messages, monkeypatch):
+    monkeypatch.setattr(claude_service, "MODEL_MAX_OUTPUT", 2 * claude_service.EXTRACTION_MAX_TOKENS)
+    items = [(f"message {i}", False, NOW) for i in range(5)]
+
+    results = asyncio.run(_call_extraction_batch(items))
+
+    assert results == [([WEIGHT], None)] * 5
+    assert sorted(fake_messages.calls) == [
+        ("record_batch", 2, 2048), ("record_batch", 2, 2048), ("record_entries", 1, 1024),
+    ]
+
+
+def _status_error(cls, status: int, message: str) -> anthropic.APIStatusError:
+    request = httpx.Request("POST", "https://api.anthropic.com")
+    return cls(message, response=httpx.Response(status, request=request), body=None)
+
+
+def test_rejected_batch_retries_each_message(fake_messages):
+    fake_messages.fail = _status_error(anthropic.BadRequestError, 400, "prompt is too long")
+    items = [(f"message {i}", False, NOW) for i in range(3)]
+
+    results = asyncio.run(_call_extraction_batch(items))
+
+    assert results == [([WEIGHT], None)] * 3
+    assert [call[0] for call in fake_messages.calls] == ["record_batch"] + ["record_entries"] * 3
+
+
+@pytest.mark.parametrize("error", [
+    _status_error(anthropic.AuthenticationError, 401, "invalid x-api-key"),
+    _status_error(anthropic.RateLimitError, 429, "rate limited"),
+    _status_error(anthropic.InternalServerError, 529, "overloaded"),
+    anthropic.APIConnectionError(request=httpx.Request("POST", "https://api.anthropic.com")),
+], ids=["auth", "rate-limit", "overloaded", "connection"])
+def test_api_failure_is_not_fanned_out(fake_messages, error):
+    # The client has already backed off and retried these; one call per message would add load
+    fake_messages.fail = error
+    items = [(f"message {i}", False, NOW) for i in range(3)]
+
+    results = asyncio.run(_call_extraction_batch(items))
+
+    assert all(entries is None and error.startswith("Claude API error") for entries, error in results)
+    assert len(fake_messages.calls) == 1
@@ -0,0 +1,70 @@
+"""Timestamps and the extraction cache: an extraction is cached only if
+every timestamp in it means "now", which is re-stamped on each hit. Any
+other time may be relative to the request ("an hour ago") and must never
+be replayed on a later one."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services import claude_service
+from services.claude_service import EASTERN, extract_log
+from services.extraction_cache import ExtractionCache
+
+FIRST = datetime(2026, 1, 1, 12, 0, tzinfo=EASTERN)
+LATER = datetime(2026, 1, 1, 15, 0, tzinfo=EASTERN)
+
+
+class Clock(datetime):
+    """datetime whose now() is whatever the test sets."""
+
+    current = FIRST
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current.astimezone(tz)
+
+
+@pytest.fixture
+def claude(monkeypatch):
+    """Stand-in extraction: a meal at the request time, or an hour before it."""
+    calls = []
+    offsets = {"had eggs an hour ago": timedelta(hours=1), "had eggs": timedelta(0)}
+
+    async def call_extraction(message, symptoms_mode, current_time, on_entry=None):
+        calls.append(message)
+        at = datetime.fromisoformat(current_time) - offsets[message]
+        return [{
+            "type": "meal", "timestamp": at.isoformat(), "description": "Eggs",
+            "calories": 150, "protein_g": 12, "carbs_g": 1, "fat_g": 10,
+        }], None
+
+    monkeypatch.setattr(claude_service, "datetime", Clock)
+    monkeypatch.setattr(claude_service, "_call_extraction", call_extraction)
+    monkeypatch.setattr(claude_service, "_batcher", None)
+    monkeypatch.setattr(claude_service, "extraction_cache", ExtractionCache(maxsize=100, ttl=3600))
+    return calls
+
+
+def _extract_at(when: datetime, message: str):
+    Clock.current = when
+    success, _, raw, _ = asyncio.run(extract_log(message, user_id="42"))
+    assert success
+    return datetime.fromisoformat(raw[0]["timestamp"])
+
+
+def test_relative_time_is_not_replayed(claude):
+    assert _extract_at(FIRST, "had eggs an hour ago") == FIRST - timedelta(hours=1)
+    # Three hours later the same words mean 14:00, not the first call's 11:00
+    assert _extract_at(LATER, "had eggs an hour ago") == LATER - timedelta(hours=1)
+    assert claude == ["had eggs an hour ago"] * 2
+    assert claude_service.extraction_cache.stats()["uncacheable"] == 2
+
+
+def test_now_is_cached_and_restamped(claude):
+    assert _extract_at(FIRST, "had eggs") == FIRST
+    assert _extract_at(LATER, "had eggs") == LATER
+    assert claude == ["had eggs"]
+    assert claude_service.extraction_cache.stats()["user_hits"] == 1
@@ -0,0 +1,72 @@
+"""Extraction repair turn in claude_service._call_extraction."""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from services import claude_service
+from services.claude_service import _call_extraction, extract_log
+
+NOW = "2026-01-01T12:00:00-05:00"
+WEIGHT = {"type": "bodyweight", "timestamp": NOW, "weight_lbs": 180}
+BAD_MEAL = {"type": "meal", "timestamp": NOW, "description": "Toast", "calories": -5,
+            "protein_g": 4, "carbs_g": 20, "fat_g": 2}
+GOOD_MEAL = {**BAD_MEAL, "calories": 150}
+
+
+def _tool_call(entries: List[dict]):
+    block = SimpleNamespace(type="tool_use", id="toolu_1", name="record_entries", input={"entries": entries})
+    return SimpleNamespace(content=[block])
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Queue of record_entries inputs, one per streamed call."""
+    queue: List[List[dict]] = []
+
+    async def stream_message(on_json, **kwargs):
+        return _tool_call(queue.pop(0))
+
+    monkeypatch.setattr(claude_service, "_stream_message", stream_message)
+    monkeypatch.setattr(claude_service, "_batcher", None)
+    return queue
+
+
+def test_successful_repair_returns_repaired_entries(replies):
+    replies += [[WEIGHT, BAD_MEAL], [WEIGHT, GOOD_MEAL]]
+    entries, error = asyncio.run(_call_extraction("180 lbs, toast", False, NOW))
+    assert entries == [WEIGHT, GOOD_MEAL]
+    assert error is None
+
+
+def test_failed_repair_keeps_first_valid_entries_and_reports_the_rest(replies):
+    replies += [[WEIGHT, BAD_MEAL], [{**WEIGHT, "weight_lbs": 181}, BAD_MEAL]]
+    entries, error = asyncio.run(_call_extraction("180 lbs, toast", False, NOW))
+    assert entries == [WEIGHT]
+    assert "entries[1] (meal)" in error
+
+
+def test_failed_repair_with_nothing_valid_is_an_error(replies):
+    replies += [[BAD_MEAL], [BAD_MEAL]]
+    entries, error = asyncio.run(_call_extraction("toast", False, NOW))
+    assert entries is None
+    assert error.startswith("Could not extract every entry")
+
+
+def test_extract_log_surfaces_dropped_entries(replies, monkeypatch):
+    stored = []
+
+    async def put(*args):
+        stored.append(args)
+
+    monkeypatch.setattr(claude_service.extraction_cache, "put", put)
+    replies += [[WEIGHT, BAD_MEAL], [WEIGHT, BAD_MEAL]]
+    success, logs, _, error = asyncio.run(extract_log("180 lbs and some toast with a lot of butter", user_id="u"))
+    assert success
+    assert [log.type for log in logs] == ["bodyweight"]
+    assert "entries[1] (meal)" in error
+    # A partial extraction is never cached
+    assert stored == []
@@ -0,0 +1,106 @@
+"""Streamed extraction previews in claude_service._call_extraction: entries
+are previewed while Claude is still streaming, and a slow preview (a Telegram
+edit) never holds one of the ANTHROPIC_MAX_CONCURRENCY slots."""
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from services import claude_service
+from services.claude_service import _call_extraction
+
+NOW = "2026-01-01T12:00:00-05:00"
+ENTRIES = [
+    {"type": "bodyweight", "timestamp": NOW, "weight_lbs": 180},
+    {"type": "bodyweight", "timestamp": NOW, "weight_lbs": 181},
+]
+
+
+def _chunks() -> List[str]:
+    """The record_entries input split so that each chunk closes one entry."""
+    text = json.dumps({"entries": ENTRIES})
+    cut = text.index("}") + 1
+    return [text[:cut], text[cut:]]
+
+
+class _Stream:
+    def __init__(self, log: List[str], gap: float):
+        self._log = log
+        self._gap = gap
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(_chunks(), 1):
+            self._log.append(f"delta {i}")
+            yield SimpleNamespace(
+                type="content_block_delta", delta=SimpleNamespace(type="input_json_delta", partial_json=chunk),
+            )
+            await asyncio.sleep(self._gap)
+        self._log.append("stream end")
+
+    async def get_final_message(self):
+        block = SimpleNamespace(type="tool_use", id="toolu_1", name="record_entries", input={"entries": ENTRIES})
+        usage = SimpleNamespace(
+            input_tokens=3500, cache_read_input_tokens=0, cache_creation_input_tokens=0, output_tokens=50,
+        )
+        return SimpleNamespace(content=[block], usage=usage)
+
+
+@pytest.fixture
+def stream_log(monkeypatch):
+    log: List[str] = []
+    messages = SimpleNamespace(stream=lambda **kwargs: _Stream(log, gap=0.02))
+    monkeypatch.setattr(claude_service, "client", SimpleNamespace(messages=messages))
+    monkeypatch.setattr(claude_service, "_semaphore", asyncio.Semaphore(1))
+    return log
+
+
+def test_entries_are_previewed_while_streaming(stream_log):
+    async def preview(entry: dict) -> None:
+        stream_log.append(f"preview {entry['weight_lbs']}")
+
+    entries, error = asyncio.run(_call_extraction("180 then 181", False, NOW, preview))
+
+    assert entries == ENTRIES and error is None
+    assert stream_log == ["delta 1", "preview 180", "delta 2", "preview 181", "stream end"]
+
+
+def test_slow_preview_does_not_hold_a_concurrency_slot(stream_log):
+    async def run():
+        edit_done = asyncio.Event()
+        previews = []
+
+        async def slow_preview(entry: dict) -> None:
+            previews.append(entry["weight_lbs"])
+            await edit_done.wait()
+
+        first = asyncio.create_task(_call_extraction("180 then 181", False, NOW, slow_preview))
+        await asyncio.sleep(0.1)
+        # The first call's stream is over while its preview is still stuck;
+        # the only slot is free for another extraction
+        second = await asyncio.wait_for(_call_extraction("180 then 181", False, NOW), 1)
+        assert not first.done()
+        edit_done.set()
+        return await first, second, previews
+
+    first, second, previews = asyncio.run(run())
+    assert first == second == (ENTRIES, None)
+    # The second entry was still queued behind the stuck edit when the stream
+    # ended, so the final result replaced its preview
+    assert previews == [180]
+
+
+def test_failing_preview_does_not_fail_the_extraction(stream_log):
+    async def broken(entry: dict) -> None:
+        raise RuntimeError("message to edit not found")
+
+    assert asyncio.run(_call_extraction("180 then 181", False, NOW, broken)) == (ENTRIES, None)
@@ -0,0 +1,88 @@
+"""Rule-based fast path in services.fast_parser."""
+from __future__ import annotations
+
+import pytest
+
+from services.fast_parser import parse_structured
+from services.validation_service import validate_log
+
+
+def _exercise(name: str, sets: int, reps: int, weight_lbs: float) -> dict:
+    return {"type": "exercise", "exercise_name": name, "sets": sets, "reps": reps,
+            "weight_lbs": weight_lbs, "notes": None}
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("bench 3x5 @ 185", _exercise("Bench Press", 3, 5, 185.0)),
+    ("Bench 3x10 @ 135", _exercise("Bench Press", 3, 10, 135.0)),
+    ("squat 3x12 at 225", _exercise("Squat", 3, 12, 225.0)),
+    ("squat 3x12 225", _exercise("Squat", 3, 12, 225.0)),
+    ("bench 3 x 10 @135lbs", _exercise("Bench Press", 3, 10, 135.0)),
+    ("deadlift 5x3@100kg", _exercise("Deadlift", 5, 3, 220.0)),
+    ("ohp 95 3x8", _exercise("Overhead Press", 3, 8, 95.0)),
+    ("bench press 185 lbs 3x5", _exercise("Bench Press", 3, 5, 185.0)),
+])
+def test_exercise_lines(message, expected):
+    assert parse_structured(message) == [expected]
+
+
+@pytest.mark.parametrize("message", [
+    # No weight: the reps must not be split into reps and a weight
+    "bench 3x10",
+    "squat 3x12",
+    "bench 3x51",
+    "bench 3 x 10",
+    "bench 3x5 @",
+    # Unknown exercise names keep Claude's normalization
+    "leg press 3x10 @ 300",
+])
+def test_exercise_lines_that_fall_back(message):
+    assert parse_structured(message) is None
+
+
+def test_every_exercise_line_must_parse():
+    assert parse_structured("bench 3x5 @ 185\nsquat 5x5 @ 225") == [
+        _exercise("Bench Press", 3, 5, 185.0),
+        _exercise("Squat", 5, 5, 225.0),
+    ]
+    assert parse_structured("bench 3x5 @ 185; squat 3x12") is None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("weighed 182.4", 182.4),
+    ("Weighed in at 182 lbs.", 182.0),
+    ("bw: 80 kg", 176.0),
+])
+def test_bodyweight(message, expected):
+    assert parse_structured(message) == [{"type": "bodyweight", "weight_lbs": expected}]
+
+
+@pytest.mark.parametrize("message", ["weighed 18", "weight 1820", "weighed 182 and ate a bagel"])
+def test_bodyweight_that_falls_back(message):
+    assert parse_structured(message) is None
+
+
+def test_scores():
+    assert parse_structured("fatigue 7/10") == [
+        {"type": "wellness", "symptom_score": 7, "symptom": "fatigue"},
+    ]
+    assert parse_structured("headache was 10 out of 10") == [
+        {"type": "wellness", "symptom_score": 10, "symptom": "headache"},
+    ]
+    assert parse_structured("session was 9/10") == [
+        {"type": "workout_quality", "performance_score": 9},
+    ]
+
+
+@pytest.mark.parametrize("message", ["fatigue 11/10", "session was 12/10"])
+def test_out_of_range_scores_fall_back(message):
+    assert parse_structured(message) is None
+
+
+@pytest.mark.parametrize("message", [
+    "bench 3x5 @ 185", "ohp 95 3x8", "weighed 182.4", "fatigue 7/10", "session was 9/10",
+])
+def test_parsed_entries_validate(message):
+    for entry in parse_structured(message):
+        valid, _, error = validate_log({**entry, "timestamp": "2026-01-01T12:00:00-05:00"})
+        assert valid, error
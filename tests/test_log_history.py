@@ -0,0 +1,287 @@
+"""/api/log-history: cursor validation, first-page totals, and paging through
+entries merged from every table (against an in-memory stand-in for the
+tables that applies the keyset filter the way PostgREST would)."""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import random
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import main
+from dependencies import get_current_user
+from services import supabase_service
+from services.aggregation_service import _LOG_HISTORY_TABLES, _decode_cursor, _encode_cursor
+from services.cache_service import dashboard_cache
+
+
+def _raw_cursor(timestamp, entry_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp, entry_id]).encode()).decode()
+
+
+class _RecordingQuery:
+    def __init__(self, client: "RecordingSupabase", table: str):
+        self._client = client
+        self._table = table
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self._client.calls.append((self._table, name, args, kwargs))
+            return self
+        return call
+
+    def execute(self):
+        return SimpleNamespace(data=[], count=self._client.counts.get(self._table))
+
+
+class RecordingSupabase:
+    """Returns no rows, `counts[table]` for count queries, and records every builder call."""
+
+    def __init__(self, counts: dict):
+        self.counts = counts
+        self.calls = []
+
+    def table(self, name: str) -> _RecordingQuery:
+        return _RecordingQuery(self, name)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = RecordingSupabase({"meals": 12, "workouts": 3, "exercises": 9, "bodyweight": 4, "wellness": 1})
+    monkeypatch.setattr(supabase_service, "_client", fake)
+    main.app.dependency_overrides[get_current_user] = lambda: {"telegram_id": f"user-{uuid.uuid4()}"}
+    yield fake
+    main.app.dependency_overrides.clear()
+
+
+def _get(params: dict) -> httpx.Response:
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await http.get("/api/log-history", params=params)
+
+    return asyncio.run(run())
+
+
+def test_cursor_round_trip():
+    entry = {"timestamp": "2026-01-01T12:00:00-05:00", "id": str(uuid.uuid4())}
+    assert _decode_cursor(_encode_cursor(entry)) == (entry["timestamp"], entry["id"])
+
+
+@pytest.mark.parametrize("cursor", [
+    _raw_cursor("2026-01-01T12:00:00-05:00", '0),user_id.neq.(x'),
+    _raw_cursor('2026-01-01",user_id.neq."x', str(uuid.uuid4())),
+    _raw_cursor(None, str(uuid.uuid4())),
+    _raw_cursor("2026-01-01T12:00:00-05:00", 7),
+    "not-base64!",
+])
+def test_malformed_cursor_is_rejected(client, cursor):
+    response = _get({"cursor": cursor})
+    assert response.status_code == 400
+    assert not any(name == "or_" for _, name, _, _ in client.calls)
+
+
+def test_cursor_filter_uses_parsed_values(client):
+    entry_id = uuid.uuid4()
+    response = _get({"type": "meal", "cursor": _raw_cursor("2026-01-01T12:00:00.5-05:00", str(entry_id).upper())})
+    assert response.status_code == 200
+    filters = [args[0] for _, name, args, _ in client.calls if name == "or_"]
+    ts = "2026-01-01T12:00:00.500000-05:00"
+    assert filters == [f'timestamp.lt."{ts}",and(timestamp.eq."{ts}",id.lt.{entry_id})']
+
+
+def test_first_page_carries_totals_for_every_type(client):
+    first = _get({"type": "meal"}).json()
+    assert first["totals"] == {"meal": 12, "workout": 3, "exercise": 9, "weight": 4, "wellness": 1, "all": 29}
+
+    later = _get({"type": "meal", "cursor": _raw_cursor("2026-01-01T12:00:00-05:00", str(uuid.uuid4()))}).json()
+    assert "totals" not in later
+
+
+def test_totals_are_served_from_the_dashboard_cache(client):
+    user = {"telegram_id": f"user-{uuid.uuid4()}"}
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    _get({})
+    before = len(client.calls)
+    hits = dashboard_cache.hits
+    _get({})
+    count_calls = [c for c in client.calls[before:] if c[1] == "select" and c[3].get("head")]
+    assert count_calls == []
+    assert dashboard_cache.hits == hits + 5
+
+
+# --- Paging through rows ---
+
+_KEYSET = re.compile(r'^timestamp\.lt\."([^"]+)",and\(timestamp\.eq\."([^"]+)",id\.lt\.([0-9a-f-]+)\)$')
+
+
+class _RowQuery:
+    """Applies eq/gte, the keyset or_ filter, order and limit to in-memory rows."""
+
+    def __init__(self, client: "RowSupabase", table: str):
+        self._client = client
+        self._table = table
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._count = False
+
+    def select(self, columns: str, count: str = None, head: bool = False):
+        self._count = head
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda r: r[column] == value)
+        return self
+
+    def gte(self, column, value):
+        self._filters.append(lambda r: datetime.fromisoformat(r[column]) >= datetime.fromisoformat(value))
+        return self
+
+    def or_(self, expression: str):
+        lt, eq, entry_id = _KEYSET.match(expression).groups()
+        assert lt == eq
+        after = (datetime.fromisoformat(lt), entry_id)
+        self._filters.append(lambda r: (datetime.fromisoformat(r["timestamp"]), r["id"]) < after)
+        return self
+
+    def order(self, column, desc: bool = False):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def execute(self):
+        rows = [r for r in self._client.tables.get(self._table, []) if all(f(r) for f in self._filters)]
+        if self._count:
+            return SimpleNamespace(data=[], count=len(rows))
+        # Postgres compares timestamptz by instant and uuid like its lowercase text
+        for column, desc in reversed(self._order):
+            key = (lambda r: datetime.fromisoformat(r[column])) if column == "timestamp" else (lambda r: r[column])
+            rows.sort(key=key, reverse=desc)
+        return SimpleNamespace(data=rows[:self._limit], count=None)
+
+
+class RowSupabase:
+    def __init__(self, tables: dict):
+        self.tables = tables
+
+    def table(self, name: str) -> _RowQuery:
+        return _RowQuery(self, name)
+
+
+def _table_rows(user_id: str, seed: int = 0) -> dict:
+    """Rows in every log-history table, with many timestamps shared within and across tables."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    instants = [now - timedelta(hours=rng.randrange(1, 24 * 20)) for _ in range(12)]
+    tables = {}
+    for table, _, _ in _LOG_HISTORY_TABLES.values():
+        rows = []
+        for _ in range(rng.randrange(4, 9)):
+            at = rng.choice(instants)
+            # The same instant written with another offset is still a tie
+            if rng.random() < 0.3:
+                at = at.astimezone(timezone(timedelta(hours=-5)))
+            rows.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))), "user_id": user_id, "timestamp": at.isoformat(),
+                "description": "entry", "calories": 100, "protein_g": 1, "carbs_g": 2, "fat_g": 3,
+                "estimated_calories_burned": 200, "exercise_name": "squat", "sets": 3, "reps": 5,
+                "weight_lbs": 180, "symptom": None, "symptom_score": 2,
+            })
+        tables[table] = rows
+    return tables
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    user = {"telegram_id": f"user-{uuid.uuid4()}"}
+    tables = _table_rows(user["telegram_id"])
+    monkeypatch.setattr(supabase_service, "_client", RowSupabase(tables))
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    yield tables
+    main.app.dependency_overrides.clear()
+
+
+def _expected(tables: dict, type_filter: str = "all") -> list:
+    """(timestamp instant, id, type) of every entry, newest first, ties by id descending."""
+    entries = [
+        (datetime.fromisoformat(r["timestamp"]), r["id"], log_type)
+        for log_type, (table, _, _) in _LOG_HISTORY_TABLES.items()
+        if type_filter in ("all", log_type)
+        for r in tables[table]
+    ]
+    return sorted(entries, reverse=True)
+
+
+def _walk(params: dict) -> list:
+    """Every page from the first, following next_cursor; returns the pages."""
+    pages = [_get(params).json()]
+    while pages[-1]["next_cursor"] is not None:
+        assert len(pages) < 100
+        pages.append(_get({**params, "cursor": pages[-1]["next_cursor"]}).json())
+    return pages
+
+
+def _keys(entries: list) -> list:
+    return [(datetime.fromisoformat(e["timestamp"]), e["id"], e["type"]) for e in entries]
+
+
+def test_merge_orders_entries_across_tables(rows):
+    page = _get({"limit": 200}).json()
+    expected = _expected(rows)
+    # Several tables share timestamps, so ties are broken by id across tables
+    assert len({t for t, _, _ in expected}) < len(expected)
+    assert _keys(page["entries"]) == expected
+    assert page["next_cursor"] is None
+    assert page["totals"]["all"] == len(expected)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 50])
+def test_next_cursor_walks_every_entry_once(rows, limit):
+    pages = _walk({"limit": limit})
+    entries = [e for page in pages for e in page["entries"]]
+
+    assert _keys(entries) == _expected(rows)
+    assert all(len(page["entries"]) == limit for page in pages[:-1])
+    assert 1 <= len(pages[-1]["entries"]) <= limit
+    # Each cursor names the last entry of its page
+    for page in pages[:-1]:
+        last = page["entries"][-1]
+        assert _decode_cursor(page["next_cursor"]) == (
+            datetime.fromisoformat(last["timestamp"]).isoformat(), last["id"],
+        )
+    assert "totals" in pages[0] and all("totals" not in page for page in pages[1:])
+
+
+def test_page_boundary_inside_a_timestamp_tie(rows):
+    shared = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(minutes=5)
+    ids = sorted(str(uuid.uuid4()) for _ in range(4))
+    # Newest instant, split across two tables and two offsets
+    for i, entry_id in enumerate(ids):
+        table = "meals" if i % 2 else "wellness"
+        at = shared if i < 2 else shared.astimezone(timezone(timedelta(hours=-5)))
+        rows[table].append({
+            "id": entry_id, "user_id": rows["meals"][0]["user_id"], "timestamp": at.isoformat(),
+            "description": "tie", "calories": 1, "protein_g": 0, "carbs_g": 0, "fat_g": 0,
+            "symptom": None, "symptom_score": 1,
+        })
+
+    first = _get({"limit": 2}).json()
+    second = _get({"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [e["id"] for e in first["entries"] + second["entries"]] == ids[::-1]
+
+
+def test_type_filter_pages_through_one_table(rows):
+    pages = _walk({"type": "exercise", "limit": 3})
+    entries = [e for page in pages for e in page["entries"]]
+    assert _keys(entries) == _expected(rows, "exercise")
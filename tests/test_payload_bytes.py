@@ -0,0 +1,208 @@
+"""Bytes transferred per dashboard endpoint with column projection vs select("*").
+
+`RowSupabase` stands in for the supabase-py client with 90 days of one
+user's rows carrying every column of their table. Each endpoint is requested
+twice: once as the app runs, selecting the columns in aggregation_service,
+and once with every select widened to "*" as before. The JSON size of the
+rows each query returns is summed per endpoint (run with -s to see the
+table). Apart from endpoints that return rows as read, which lose the
+unselected columns, responses must match both ways, so a projection that
+drops a column an endpoint reads fails here too.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, List
+
+import httpx
+from fastapi import Request
+
+import main
+from dependencies import get_current_user
+from services import supabase_service
+
+DAYS = 90
+TODAY = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+EXERCISES = ["bench press", "squat", "deadlift", "overhead press"]
+
+ENDPOINTS = [
+    ("/api/dashboard", {"range": "7d"}),
+    ("/api/kpis", {"range": "7d"}),
+    ("/api/meals", {"range": "30d"}),
+    ("/api/weight", {"range": "30d"}),
+    ("/api/wellness", {"range": "30d"}),
+    ("/api/performance", {"range": "30d"}),
+    ("/api/workouts", {"range": "30d"}),
+    ("/api/trends", {"range": "90d"}),
+    ("/api/daily", {"date": (TODAY - timedelta(days=1)).date().isoformat()}),
+    ("/api/exercises", {"range": "30d"}),
+    ("/api/exercise-history", {"name": "squat", "range": "90d"}),
+]
+
+
+def _tables(seed: int = 0) -> Dict[str, List[dict]]:
+    """One user's rows with every column of base_schema.sql and the migrations."""
+    rng = random.Random(seed)
+    tables: Dict[str, List[dict]] = defaultdict(list)
+
+    def row(table: str, at: datetime, **columns) -> None:
+        tables[table].append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))), "user_id": "123456789",
+            "timestamp": at.isoformat(), **columns, "created_at": at.isoformat(),
+        })
+
+    for d in range(DAYS):
+        day = TODAY - timedelta(days=d)
+        meals = [(rng.randrange(200, 900), rng.randrange(5, 60), rng.randrange(10, 120), rng.randrange(5, 40))
+                 for _ in range(3)]
+        for i, (kcal, protein, carbs, fat) in enumerate(meals):
+            row("meals", day - timedelta(hours=4 * i), description="chicken, rice and broccoli",
+                calories=kcal, protein_g=protein, carbs_g=carbs, fat_g=fat)
+        burned = rng.randrange(150, 600)
+        row("workouts", day, description="upper body strength session",
+            estimated_calories_burned=burned, intensity_score=rng.randrange(4, 10))
+        row("bodyweight", day, weight_lbs=round(180 + rng.uniform(-3, 3), 2))
+        row("wellness", day, symptom_score=rng.randrange(0, 10), symptom="mild bloating")
+        row("workout_quality", day, performance_score=rng.randrange(4, 10))
+        for name in rng.sample(EXERCISES, 2):
+            row("exercises", day, exercise_name=name, sets=3, reps=rng.randrange(5, 12),
+                weight_lbs=float(rng.randrange(95, 315, 5)), notes=None)
+        tables["daily_rollups"].append({
+            "user_id": "123456789", "day": day.date().isoformat(),
+            "calories": sum(m[0] for m in meals), "protein_g": sum(m[1] for m in meals),
+            "carbs_g": sum(m[2] for m in meals), "fat_g": sum(m[3] for m in meals),
+            "meal_count": len(meals), "calories_burned": burned, "workout_count": 1,
+        })
+    for rows in tables.values():
+        rows.reverse()
+    return tables
+
+
+def _at(value: str):
+    return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+
+
+class _Query:
+    """Query builder applying the filters the dashboard reads use; user_id is ignored."""
+
+    def __init__(self, client: "RowSupabase", table: str):
+        self._client = client
+        self._table = table
+        self._columns = "*"
+        self._count = False
+        self._filters = []
+        self._order = None
+        self._limit = None
+
+    def select(self, columns: str, count: str = None, head: bool = False):
+        self._columns = columns
+        self._count = head
+        return self
+
+    def eq(self, column, value):
+        if column != "user_id":
+            self._filters.append(lambda r: r[column] == value)
+        return self
+
+    def gte(self, column, value):
+        self._filters.append(lambda r: _at(r[column]) >= _at(value))
+        return self
+
+    def lte(self, column, value):
+        self._filters.append(lambda r: _at(r[column]) <= _at(value))
+        return self
+
+    def order(self, column, desc: bool = False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def execute(self):
+        rows = [r for r in self._client.tables[self._table] if all(f(r) for f in self._filters)]
+        if self._count:
+            return SimpleNamespace(data=[], count=len(rows))
+        if self._order:
+            column, desc = self._order
+            rows.sort(key=lambda r: _at(r[column]), reverse=desc)
+        rows = rows[:self._limit]
+        if self._columns != "*" and self._client.project:
+            names = [c.strip() for c in self._columns.split(",")]
+            rows = [{c: r[c] for c in names} for r in rows]
+        self._client.bytes += len(json.dumps(rows).encode())
+        return SimpleNamespace(data=rows, count=None)
+
+
+class RowSupabase:
+    def __init__(self, tables: Dict[str, List[dict]], project: bool):
+        self.tables = tables
+        self.project = project
+        self.bytes = 0
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+
+def _user_from_header(request: Request) -> dict:
+    # A new user per request, so the dashboard cache never serves a query
+    return {"telegram_id": request.headers["x-user"], "display_name": ""}
+
+
+def _measure(monkeypatch, project: bool) -> Dict[str, tuple]:
+    """Bytes read from the database and the response body, per endpoint."""
+    client = RowSupabase(_tables(), project)
+    monkeypatch.setattr(supabase_service, "_client", client)
+
+    async def run():
+        results = {}
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            for path, params in ENDPOINTS:
+                before = client.bytes
+                response = await http.get(path, params=params, headers={"x-user": f"bytes-{uuid.uuid4()}"})
+                assert response.status_code == 200, path
+                results[path] = (client.bytes - before, response.json())
+        return results
+
+    main.app.dependency_overrides[get_current_user] = _user_from_header
+    try:
+        return asyncio.run(run())
+    finally:
+        main.app.dependency_overrides.clear()
+
+
+def _within(projected, full) -> bool:
+    """Whether `projected` is `full` with only some dict keys left out."""
+    if isinstance(projected, dict):
+        return isinstance(full, dict) and all(k in full and _within(v, full[k]) for k, v in projected.items())
+    if isinstance(projected, list):
+        return isinstance(full, list) and len(projected) == len(full) and all(map(_within, projected, full))
+    return projected == full
+
+
+def test_projection_bytes_per_endpoint(monkeypatch):
+    full = _measure(monkeypatch, project=False)
+    projected = _measure(monkeypatch, project=True)
+
+    lines = [f"\n{'endpoint':<24}{'select(*)':>12}{'projected':>12}{'saved':>8}"]
+    for path, _ in ENDPOINTS:
+        before, after = full[path][0], projected[path][0]
+        lines.append(f"{path:<24}{before:>12,}{after:>12,}{1 - after / before:>8.0%}")
+    total_before = sum(b for b, _ in full.values())
+    total_after = sum(b for b, _ in projected.values())
+    lines.append(f"{'total':<24}{total_before:>12,}{total_after:>12,}{1 - total_after / total_before:>8.0%}")
+    print("\n".join(lines))
+
+    for path, _ in ENDPOINTS:
+        assert _within(projected[path][1], full[path][1]), path
+        assert 0 < projected[path][0] < full[path][0], path
+    assert total_after < total_before * 2 / 3
+
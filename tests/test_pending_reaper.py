@@ -0,0 +1,83 @@
+"""Pending-log expiry: the reap_pending_logs RPC (migration 008) and PendingLogReaper."""
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from typing import List
+
+import pytest
+
+from services import pending_reaper
+from services.pending_reaper import EXPIRED_NOTICE, PendingLogReaper
+
+
+BODYWEIGHT = {"type": "bodyweight", "timestamp": "2026-01-01T08:00:00-05:00", "weight_lbs": 180}
+
+
+def _create_pending(conn, user_id: str, age: str, message_id: int, text: str) -> str:
+    return conn.execute(
+        "INSERT INTO pending_logs (user_id, telegram_chat_id, type, payload, created_at, "
+        "telegram_message_id, telegram_message_text) "
+        "VALUES (%s, 'chat', 'bodyweight', %s, now() - %s::interval, %s, %s) RETURNING id",
+        (user_id, json.dumps(BODYWEIGHT), age, message_id, text),
+    ).fetchone()[0]
+
+
+def test_reap_claims_only_expired_unlocked_rows(database_url):
+    psycopg = pytest.importorskip("psycopg")
+    user_id = f"user-{uuid.uuid4()}"
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute("DELETE FROM pending_logs")
+        expired = _create_pending(conn, user_id, "2 days", 1, "Weight: 180 lbs")
+        confirming = _create_pending(conn, user_id, "2 days", 2, "Weight: 181 lbs")
+        fresh = _create_pending(conn, user_id, "1 minute", 3, "Weight: 182 lbs")
+
+        with psycopg.connect(database_url) as confirm:
+            # A confirm that has claimed its row but not committed yet
+            confirm.execute("SELECT * FROM confirm_pending_logs(ARRAY[%s]::uuid[])", (confirming,))
+            reaped = conn.execute(
+                "SELECT * FROM reap_pending_logs(now() - interval '1 day', 100)"
+            ).fetchall()
+            confirm.commit()
+
+        assert [(r[0], r[2], r[3]) for r in reaped] == [(expired, 1, "Weight: 180 lbs")]
+        remaining = {r[0] for r in conn.execute("SELECT id FROM pending_logs WHERE user_id = %s", (user_id,))}
+        assert remaining == {fresh}
+        assert conn.execute("SELECT count(*) FROM bodyweight WHERE user_id = %s", (user_id,)).fetchone()[0] == 1
+
+
+class FakeBot:
+    def __init__(self):
+        self.edits: List[tuple] = []
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.edits.append((chat_id, message_id, text))
+
+
+def test_reaper_appends_notice_once_per_message(monkeypatch):
+    batches = [
+        [
+            # Two rows of one batch share a confirmation message
+            {"id": "a", "telegram_chat_id": "chat", "telegram_message_id": 10, "telegram_message_text": "1. Meal"},
+            {"id": "b", "telegram_chat_id": "chat", "telegram_message_id": 10, "telegram_message_text": "1. Meal"},
+        ],
+        [
+            {"id": "c", "telegram_chat_id": "chat", "telegram_message_id": 11, "telegram_message_text": None},
+            {"id": "d", "telegram_chat_id": "chat", "telegram_message_id": None, "telegram_message_text": None},
+        ],
+    ]
+
+    async def reap(created_before: str, limit: int) -> List[dict]:
+        return batches.pop(0) if batches else []
+
+    monkeypatch.setattr(pending_reaper, "reap_pending_logs", reap)
+    bot = FakeBot()
+    reaper = PendingLogReaper(ttl=60, interval=60, batch_size=2, bot=bot)
+
+    assert asyncio.run(reaper.run_once()) == 4
+    assert sorted(bot.edits) == [
+        ("chat", 10, f"1. Meal\n\n{EXPIRED_NOTICE}"),
+        ("chat", 11, EXPIRED_NOTICE),
+    ]
+    assert reaper.stats()["messages_expired"] == 2
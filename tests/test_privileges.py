@@ -0,0 +1,57 @@
+"""Tables and functions that only the backend (service_role) may use: RLS is
+on, and no function is executable by PUBLIC, which on Supabase includes the
+anon and authenticated API roles. Needs TEST_DATABASE_URL (see conftest)."""
+from __future__ import annotations
+
+import pytest
+
+BACKEND_ONLY_TABLES = [
+    "daily_rollups",
+    "exercise_catalog",
+    "telegram_updates",
+    "service_leases",
+    "cache_invalidations",
+    "revoked_tokens",
+]
+
+BACKEND_ONLY_FUNCTIONS = [
+    "apply_rollup_delta(TEXT, DATE, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER, INTEGER)",
+    "confirm_pending_logs(UUID[], UUID)",
+    "confirm_pending(UUID)",
+    "refresh_exercise_catalog(TEXT, TEXT)",
+    "reap_pending_logs(TIMESTAMPTZ, INTEGER)",
+    "enqueue_telegram_update(BIGINT, TEXT, JSONB, INTEGER)",
+    "claim_telegram_updates(TEXT, INTEGER, DOUBLE PRECISION)",
+    "renew_telegram_updates(TEXT, BIGINT[], DOUBLE PRECISION)",
+    "complete_telegram_update(BIGINT, TEXT)",
+    "release_telegram_updates(TEXT)",
+    "acquire_lease(TEXT, TEXT, DOUBLE PRECISION)",
+    "release_lease(TEXT, TEXT)",
+    "shared_state_changes(TIMESTAMPTZ, DOUBLE PRECISION)",
+    "prune_shared_state(DOUBLE PRECISION)",
+]
+
+
+@pytest.fixture
+def conn(database_url):
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        yield conn
+
+
+@pytest.mark.parametrize("table", BACKEND_ONLY_TABLES)
+def test_row_level_security_is_enabled(conn, table):
+    enabled = conn.execute("SELECT relrowsecurity FROM pg_class WHERE oid = %s::regclass", (table,)).fetchone()[0]
+    assert enabled
+
+
+@pytest.mark.parametrize("signature", BACKEND_ONLY_FUNCTIONS)
+def test_public_cannot_execute(conn, signature):
+    # A NULL proacl means the default, which grants EXECUTE to PUBLIC (grantee 0)
+    public = conn.execute(
+        "SELECT bool_or(a.grantee = 0) FROM pg_proc p, "
+        "aclexplode(COALESCE(p.proacl, acldefault('f', p.proowner))) a "
+        "WHERE p.oid = %s::regprocedure",
+        (signature,),
+    ).fetchone()[0]
+    assert not public
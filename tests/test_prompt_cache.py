@@ -0,0 +1,159 @@
+"""Prompt caching in claude_service: the breakpoint on the extraction
+prefix, the startup count of that prefix, and the warning when a cache
+breakpoint is ignored.
+
+Set RUN_CLAUDE_BENCHMARK=1 with ANTHROPIC_API_KEY to count the extraction
+prefix with count_tokens (run with -s to see the numbers).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from services import claude_service
+from services.claude_service import (
+    BATCH_EXTRACTION_TOOL,
+    EXTRACTION_TOOL,
+    PROMPT_CACHE_MIN_TOKENS,
+    SYSTEM_BLOCKS,
+    _cache_breakpoint,
+    _record_usage,
+)
+
+MODEL = "claude-haiku-4-5-20251001"
+
+
+def _usage(input_tokens: int, read: int = 0, creation: int = 0):
+    return SimpleNamespace(
+        input_tokens=input_tokens, cache_read_input_tokens=read,
+        cache_creation_input_tokens=creation, output_tokens=50,
+    )
+
+
+@pytest.fixture
+def usage(monkeypatch):
+    totals = {field: 0 for field in claude_service._usage}
+    monkeypatch.setattr(claude_service, "_usage", totals)
+    monkeypatch.setattr(claude_service, "_prefix_tokens", None)
+    return totals
+
+
+def test_ignored_breakpoint_is_counted_and_logged(usage, caplog):
+    with caplog.at_level(logging.WARNING, logger="nutriclaude.claude"):
+        _record_usage(_usage(3500), cache_breakpoint=True)
+        # Writing or reading the cache means the breakpoint took effect
+        _record_usage(_usage(200, creation=5000), cache_breakpoint=True)
+        _record_usage(_usage(200, read=5000), cache_breakpoint=True)
+        # Without a breakpoint there is nothing to miss
+        _record_usage(_usage(3500))
+        # Later misses are counted but not warned about again
+        _record_usage(_usage(3600), cache_breakpoint=True)
+
+    assert usage["cache_ignored"] == 2
+    assert [r.getMessage() for r in caplog.records] == [
+        f"Prompt cache breakpoint ignored (3500 input tokens); the cached prefix may be under {PROMPT_CACHE_MIN_TOKENS} tokens",
+    ]
+    assert claude_service.get_usage_stats()["cache_hit_rate"] == round(5000 / 21000, 3)
+
+
+def test_extraction_prefix_carries_a_breakpoint():
+    assert _cache_breakpoint({"system": SYSTEM_BLOCKS})
+    # Tools render before the system prompt, so the one breakpoint covers both
+    assert "cache_control" in SYSTEM_BLOCKS[-1]
+
+
+@pytest.mark.parametrize("tokens", [3500, PROMPT_CACHE_MIN_TOKENS])
+def test_prefix_is_counted_and_logged(usage, monkeypatch, caplog, tokens):
+    requests = []
+
+    async def count_tokens(**kwargs):
+        requests.append(kwargs)
+        return SimpleNamespace(input_tokens=tokens)
+
+    monkeypatch.setattr(claude_service, "client", SimpleNamespace(messages=SimpleNamespace(count_tokens=count_tokens)))
+    with caplog.at_level(logging.INFO, logger="nutriclaude.claude"):
+        assert asyncio.run(claude_service.count_prompt_prefix()) == tokens
+
+    assert claude_service.get_usage_stats()["prefix_tokens"] == tokens
+    assert requests[0]["system"] == SYSTEM_BLOCKS and requests[0]["tools"] == [EXTRACTION_TOOL]
+    [record] = caplog.records
+    if tokens < PROMPT_CACHE_MIN_TOKENS:
+        assert record.levelno == logging.WARNING and "will be ignored" in record.getMessage()
+    else:
+        assert record.levelno == logging.INFO and "will be cached" in record.getMessage()
+
+
+def test_failed_prefix_count_is_logged(usage, monkeypatch, caplog):
+    async def count_tokens(**kwargs):
+        raise ConnectionError("API unreachable")
+
+    monkeypatch.setattr(claude_service, "client", SimpleNamespace(messages=SimpleNamespace(count_tokens=count_tokens)))
+    assert asyncio.run(claude_service.count_prompt_prefix()) is None
+    assert claude_service.get_usage_stats()["prefix_tokens"] is None
+    assert "Could not count the extraction prompt prefix" in caplog.text
+
+
+def test_cache_breakpoint_is_found_in_any_block():
+    marked = {"type": "text", "text": "x", "cache_control": {"type": "ephemeral"}}
+    assert _cache_breakpoint({"system": [marked]})
+    assert _cache_breakpoint({"tools": [{**EXTRACTION_TOOL, "cache_control": {"type": "ephemeral"}}]})
+    assert _cache_breakpoint({"messages": [{"role": "user", "content": [marked]}]})
+    assert not _cache_breakpoint({"system": "plain", "messages": [{"role": "user", "content": "hi"}]})
+
+
+def test_streamed_extraction_reports_its_breakpoint(usage, monkeypatch):
+    recorded = []
+
+    class Stream:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            raise StopAsyncIteration
+
+        async def get_final_message(self):
+            return SimpleNamespace(usage=_usage(3500))
+
+    monkeypatch.setattr(claude_service, "client", SimpleNamespace(messages=SimpleNamespace(stream=lambda **kw: Stream())))
+    monkeypatch.setattr(claude_service, "_record_usage", lambda u, breakpoint: recorded.append(breakpoint))
+
+    asyncio.run(claude_service._stream_message(None, system=SYSTEM_BLOCKS, messages=[]))
+    assert recorded == [_cache_breakpoint({"system": SYSTEM_BLOCKS})]
+
+
+@pytest.mark.skipif(
+    not (os.getenv("RUN_CLAUDE_BENCHMARK") and os.getenv("ANTHROPIC_API_KEY")),
+    reason="set RUN_CLAUDE_BENCHMARK=1 and ANTHROPIC_API_KEY to count tokens with the API",
+)
+@pytest.mark.parametrize("tool", [EXTRACTION_TOOL, BATCH_EXTRACTION_TOOL], ids=lambda t: t["name"])
+def test_extraction_prefix_size(tool):
+    """Both extraction prefixes carry a breakpoint; the count shows whether it takes effect."""
+    import anthropic
+
+    async def count() -> int:
+        async with anthropic.AsyncAnthropic() as client:
+            result = await client.messages.count_tokens(
+                model=MODEL,
+                system=SYSTEM_BLOCKS,
+                tools=[tool],
+                tool_choice={"type": "tool", "name": tool["name"]},
+                # The shortest user turn; everything else is the cacheable prefix
+                messages=[{"role": "user", "content": "."}],
+            )
+            return result.input_tokens
+
+    tokens = asyncio.run(count())
+    cached = "cached" if tokens >= PROMPT_CACHE_MIN_TOKENS else "breakpoint ignored"
+    print(f"\n{tool['name']} prefix: {tokens} tokens (minimum cacheable: {PROMPT_CACHE_MIN_TOKENS}, {cached})")
+    assert tokens > 0
+    assert _cache_breakpoint({"system": SYSTEM_BLOCKS, "tools": [tool]})
@@ -0,0 +1,165 @@
+"""Query-plan regression tests for the dashboard, log-history and PR reads.
+
+Each case is the SQL PostgREST runs for one query builder in
+aggregation_service (filters, ordering and limit; the column list does not
+affect the plan). The test EXPLAINs it against a seeded, ANALYZEd copy of the
+migrated schema and fails if the expected index is not used, or if the plan
+falls back to a sequential scan or an explicit sort.
+
+Seq scans, bitmap scans and sorts are disabled for the session. Postgres
+still plans them when nothing else can answer the query, so a missing or
+unusable index shows up in the plan however small the seeded tables are,
+instead of depending on which plan happens to be cheapest for this data.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+USER = "user-7"
+NOW = datetime.now(timezone.utc)
+MONTH_AGO = (NOW - timedelta(days=30)).isoformat()
+DAY_START = NOW.replace(hour=0, minute=0, second=0, microsecond=0).isoformat()
+DAY_END = NOW.replace(hour=23, minute=59, second=59, microsecond=0).isoformat()
+CURSOR_TS = (NOW - timedelta(days=10)).isoformat()
+CURSOR_ID = "80000000-0000-0000-0000-000000000000"
+
+# 200 users with ~2 years of history each, one row every 17 minutes overall
+SEED_ROWS = 60000
+SEED = f"""
+INSERT INTO meals (user_id, timestamp, description, calories, protein_g, carbs_g, fat_g)
+SELECT 'user-' || (i % 200), now() - i * interval '17 minutes', 'meal', 500, 30, 50, 20
+FROM generate_series(1, {SEED_ROWS}) i;
+
+INSERT INTO workouts (user_id, timestamp, description, estimated_calories_burned, intensity_score)
+SELECT 'user-' || (i % 200), now() - i * interval '17 minutes', 'run', 300, 6
+FROM generate_series(1, {SEED_ROWS}) i;
+
+INSERT INTO bodyweight (user_id, timestamp, weight_lbs)
+SELECT 'user-' || (i % 200), now() - i * interval '17 minutes', 180 + (i % 10)
+FROM generate_series(1, {SEED_ROWS}) i;
+
+INSERT INTO wellness (user_id, timestamp, symptom_score, symptom)
+SELECT 'user-' || (i % 200), now() - i * interval '17 minutes', i % 11, 'fatigue'
+FROM generate_series(1, {SEED_ROWS}) i;
+
+INSERT INTO workout_quality (user_id, timestamp, performance_score)
+SELECT 'user-' || (i % 200), now() - i * interval '17 minutes', i % 11
+FROM generate_series(1, {SEED_ROWS}) i;
+
+INSERT INTO exercises (user_id, timestamp, exercise_name, sets, reps, weight_lbs)
+SELECT 'user-' || (i % 200), now() - i * interval '17 minutes',
+       (ARRAY['Bench Press', 'Squat', 'Deadlift', 'Overhead Press', 'Row'])[1 + i % 5],
+       3, 5, 100 + (i % 200)
+FROM generate_series(1, {SEED_ROWS}) i;
+
+ANALYZE;
+"""
+
+RANGE = 'WHERE user_id = %(user)s AND "timestamp" >= %(start)s'
+DAY = 'WHERE user_id = %(user)s AND "timestamp" >= %(day_start)s AND "timestamp" <= %(day_end)s'
+AFTER_CURSOR = 'AND ("timestamp" < %(ts)s OR ("timestamp" = %(ts)s AND id < %(id)s))'
+NEWEST_FIRST = 'ORDER BY "timestamp" DESC, id DESC LIMIT 51'
+
+# (case id, SQL, index the plan must use)
+DASHBOARD_QUERIES = [
+    ("meals_range", f'SELECT * FROM meals {RANGE} ORDER BY "timestamp"', "idx_meals_user_timestamp"),
+    ("workouts_range", f'SELECT * FROM workouts {RANGE} ORDER BY "timestamp"', "idx_workouts_user_timestamp"),
+    ("bodyweight_range", f'SELECT * FROM bodyweight {RANGE} ORDER BY "timestamp"', "idx_bodyweight_user_timestamp"),
+    ("wellness_range", f'SELECT * FROM wellness {RANGE} ORDER BY "timestamp"', "idx_wellness_user_timestamp"),
+    ("workout_quality_range", f'SELECT * FROM workout_quality {RANGE} ORDER BY "timestamp"',
+     "idx_workout_quality_user_timestamp"),
+    ("rollups_range", "SELECT * FROM daily_rollups WHERE user_id = %(user)s AND day >= %(start)s::date ORDER BY day",
+     "daily_rollups_pkey"),
+    ("latest_bodyweight", 'SELECT weight_lbs FROM bodyweight WHERE user_id = %(user)s ORDER BY "timestamp" DESC LIMIT 1',
+     "idx_bodyweight_user_timestamp"),
+    ("daily_meals", f'SELECT * FROM meals {DAY} ORDER BY "timestamp"', "idx_meals_user_timestamp"),
+    ("daily_wellness", f"SELECT * FROM wellness {DAY}", "idx_wellness_user_timestamp"),
+    ("daily_workout_quality", f"SELECT * FROM workout_quality {DAY}", "idx_workout_quality_user_timestamp"),
+    ("daily_workouts", f'SELECT * FROM workouts {DAY} ORDER BY "timestamp"', "idx_workouts_user_timestamp"),
+    ("daily_exercises", f'SELECT * FROM exercises {DAY} ORDER BY "timestamp"', "idx_exercises_user_timestamp"),
+    ("logged_dates", f'SELECT "timestamp" FROM meals {RANGE}', "idx_meals_user_timestamp"),
+    ("recent_exercises", f'SELECT * FROM exercises {RANGE} ORDER BY "timestamp" DESC', "idx_exercises_user_timestamp"),
+    ("exercise_history",
+     f'SELECT * FROM exercises {RANGE} AND exercise_name = %(exercise)s ORDER BY "timestamp"',
+     "idx_exercises_user_name_timestamp"),
+]
+
+LOG_HISTORY_TABLES = ["meals", "workouts", "exercises", "bodyweight", "wellness"]
+LOG_HISTORY_QUERIES = [
+    (f"{table}_first_page", f"SELECT * FROM {table} {RANGE} {NEWEST_FIRST}", f"idx_{table}_user_timestamp")
+    for table in LOG_HISTORY_TABLES
+] + [
+    (f"{table}_after_cursor", f"SELECT * FROM {table} {RANGE} {AFTER_CURSOR} {NEWEST_FIRST}",
+     f"idx_{table}_user_timestamp")
+    for table in LOG_HISTORY_TABLES
+] + [
+    (f"{table}_total", f"SELECT count(*) FROM {table} {RANGE}", f"idx_{table}_user_timestamp")
+    for table in LOG_HISTORY_TABLES
+]
+
+PR_QUERIES = [
+    ("exercise_names", "SELECT exercise_name FROM exercise_catalog WHERE user_id = %(user)s ORDER BY exercise_name",
+     "exercise_catalog_pkey"),
+    ("exercise_prs",
+     "SELECT exercise_name, pr_weight_lbs, pr_sets, pr_reps, pr_timestamp FROM exercise_catalog "
+     "WHERE user_id = %(user)s ORDER BY exercise_name",
+     "exercise_catalog_pkey"),
+]
+
+PARAMS = {
+    "user": USER,
+    "start": MONTH_AGO,
+    "day_start": DAY_START,
+    "day_end": DAY_END,
+    "ts": CURSOR_TS,
+    "id": CURSOR_ID,
+    "exercise": "Bench Press",
+}
+
+
+@pytest.fixture(scope="module")
+def conn(database_url):
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute(SEED)
+        yield conn
+        conn.execute(
+            "TRUNCATE meals, workouts, bodyweight, wellness, workout_quality, exercises, "
+            "daily_rollups, exercise_catalog"
+        )
+
+
+def _nodes(plan: dict) -> Iterator[dict]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _nodes(child)
+
+
+def _explain(conn, sql: str) -> dict:
+    with psycopg.ClientCursor(conn) as cur:
+        cur.execute("SET enable_seqscan = off; SET enable_bitmapscan = off; SET enable_sort = off")
+        cur.execute("EXPLAIN (FORMAT JSON) " + sql, PARAMS)
+        return cur.fetchone()[0][0]["Plan"]
+
+
+@pytest.mark.parametrize(
+    "sql, index",
+    [pytest.param(sql, index, id=case) for case, sql, index in DASHBOARD_QUERIES + LOG_HISTORY_QUERIES + PR_QUERIES],
+)
+def test_query_uses_index(conn, sql, index):
+    plan = _explain(conn, sql)
+    nodes = list(_nodes(plan))
+    node_types = [node["Node Type"] for node in nodes]
+
+    assert "Seq Scan" not in node_types, f"sequential scan in plan: {plan}"
+    assert not any("Sort" in t for t in node_types), f"sort in plan: {plan}"
+    assert index in {node.get("Index Name") for node in nodes}, f"{index} not used: {plan}"
+
+
+def test_superseded_pr_index_is_dropped(conn):
+    """PRs come from exercise_catalog, so 007 drops the 006 PR index."""
+    assert conn.execute("SELECT to_regclass('idx_exercises_user_weight')").fetchone()[0] is None
@@ -0,0 +1,341 @@
+"""State shared by several worker processes (migration 009): cache
+invalidations and token revocations tailed by SharedStateSync, and leases
+that elect one process to poll Telegram or reap pending logs."""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from typing import List, Optional
+
+import pytest
+from cachetools import TLRUCache
+
+import dependencies
+import main
+from services import leases, pending_reaper, shared_state
+from services.cache_service import dashboard_cache
+from services.leases import Lease, LeaseKeeper
+from services.pending_reaper import PendingLogReaper
+from services.shared_state import SharedStateSync
+
+
+@pytest.fixture(autouse=True)
+def fresh_auth_state(monkeypatch):
+    monkeypatch.setattr(dependencies, "_verified", TLRUCache(
+        maxsize=dependencies.AUTH_CACHE_SIZE, ttu=dependencies._until_exp, timer=time.time,
+    ))
+    monkeypatch.setattr(dependencies, "_revoked", {})
+    monkeypatch.setattr(dependencies, "_revoked_by_exp", [])
+
+
+@pytest.fixture
+def changes(monkeypatch):
+    """Queue of shared_state_changes results, one per poll; records each `since`."""
+    queue: List[dict] = []
+    calls: List[Optional[str]] = []
+
+    async def fetch(since, overlap_seconds):
+        calls.append(since)
+        return queue.pop(0)
+
+    monkeypatch.setattr(shared_state, "shared_state_changes", fetch)
+    return queue, calls
+
+
+def test_sync_applies_other_processes_writes(changes):
+    queue, calls = changes
+    user_id = f"user-{uuid.uuid4()}"
+
+    async def run():
+        loads = []
+
+        async def load():
+            loads.append(1)
+            return ["row"]
+
+        await dashboard_cache.get_or_load(user_id, "meals", ("range", 7), load)
+        sync = SharedStateSync(1, main.apply_invalidation, dependencies.apply_revocation)
+        queue.append({"now": "t1", "invalidations": [], "revocations": []})
+        await sync.load()
+        queue.append({"now": "t2", "revocations": [], "invalidations": [
+            {"id": 1, "user_id": user_id, "table_name": "meals"},
+        ]})
+        await sync.poll()
+        await dashboard_cache.get_or_load(user_id, "meals", ("range", 7), load)
+        # The overlap re-read returns the same row; it is not applied twice
+        queue.append({"now": "t3", "revocations": [], "invalidations": [
+            {"id": 1, "user_id": user_id, "table_name": "meals"},
+        ]})
+        await sync.poll()
+        await dashboard_cache.get_or_load(user_id, "meals", ("range", 7), load)
+        return len(loads), sync.stats()
+
+    loads, stats = asyncio.run(run())
+    assert loads == 2
+    assert stats["invalidations"] == 1
+    assert calls == [None, "t1", "t2"]
+
+
+def test_sync_applies_revocations(changes):
+    queue, _ = changes
+    token_hash = "a" * 64
+
+    async def run():
+        sync = SharedStateSync(1, main.apply_invalidation, dependencies.apply_revocation)
+        # The first poll loads every live revocation, including one without exp
+        queue.append({"now": "t1", "invalidations": [], "revocations": [
+            {"token_hash": token_hash, "exp": time.time() + 60},
+            {"token_hash": "b" * 64, "exp": None},
+        ]})
+        await sync.load()
+        queue.append({"now": "t2", "invalidations": [], "revocations": [
+            {"token_hash": token_hash, "exp": time.time() + 60},
+        ]})
+        await sync.poll()
+        return sync.stats()
+
+    stats = asyncio.run(run())
+    assert token_hash in dependencies._revoked
+    assert dependencies._revoked["b" * 64] == float("inf")
+    assert stats["revocations"] == 2
+
+
+def test_failed_load_is_retried_by_the_next_poll(monkeypatch):
+    calls: List[Optional[str]] = []
+
+    async def fetch(since, overlap_seconds):
+        calls.append(since)
+        if len(calls) == 1:
+            raise ConnectionError("database unreachable")
+        return {"now": "t1", "invalidations": [], "revocations": []}
+
+    monkeypatch.setattr(shared_state, "shared_state_changes", fetch)
+
+    async def run():
+        sync = SharedStateSync(0.01, main.apply_invalidation, dependencies.apply_revocation)
+        await sync.load()
+        assert not sync.stats()["loaded"]
+        sync.start()
+        await asyncio.sleep(0.05)
+        await sync.stop()
+        return sync.stats()
+
+    stats = asyncio.run(run())
+    # The retry still asks for everything
+    assert calls[:2] == [None, None]
+    assert stats["loaded"] and stats["failures"] == 1
+
+
+def test_idle_polls_back_off(monkeypatch):
+    polled: List[float] = []
+
+    async def fetch(since, overlap_seconds):
+        polled.append(time.monotonic())
+        # One write from another process on the fifth poll
+        invalidations = [{"id": 1, "user_id": "42", "table_name": "meals"}] if len(polled) == 5 else []
+        return {"now": "t", "invalidations": invalidations, "revocations": []}
+
+    monkeypatch.setattr(shared_state, "shared_state_changes", fetch)
+
+    async def run():
+        sync = SharedStateSync(0.01, main.apply_invalidation, dependencies.apply_revocation, max_interval=0.08)
+        sync.start()
+        while len(polled) < 7:
+            await asyncio.sleep(0.01)
+        await sync.stop()
+
+    asyncio.run(run())
+    gaps = [b - a for a, b in zip(polled, polled[1:])]
+    # 0.02, 0.04, 0.08, 0.08 while idle, then back to 0.01 after the change
+    assert gaps[3] > 0.06
+    assert gaps[5] < gaps[3] / 2
+
+
+def test_single_worker_stops_polling_once_loaded(monkeypatch):
+    calls: List[Optional[str]] = []
+
+    async def fetch(since, overlap_seconds):
+        calls.append(since)
+        if len(calls) == 1:
+            raise ConnectionError("database unreachable")
+        return {"now": "t1", "invalidations": [], "revocations": []}
+
+    monkeypatch.setattr(shared_state, "shared_state_changes", fetch)
+
+    async def run():
+        sync = SharedStateSync(0.01, main.apply_invalidation, dependencies.apply_revocation)
+        await sync.load()
+        sync.start(tail=False)
+        await asyncio.sleep(0.1)
+        await sync.stop()
+        return sync.stats()
+
+    stats = asyncio.run(run())
+    # The failed load is retried, and nothing is polled after it succeeds
+    assert calls == [None, None]
+    assert stats["loaded"]
+
+
+def test_logout_stores_the_revocation(monkeypatch):
+    stored = []
+
+    async def store(token_hash, exp):
+        stored.append((token_hash, exp))
+
+    monkeypatch.setattr("routes.auth.store_revoked_token", store)
+    token = dependencies.jwt.encode(
+        {"telegram_id": "42", "type": "session", "exp": int(time.time()) + 60},
+        dependencies.JWT_SECRET, algorithm="HS256",
+    )
+    from routes.auth import logout
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    asyncio.run(logout(credentials, user={"telegram_id": "42"}))
+    assert stored == [(dependencies._token_key(token), pytest.approx(time.time() + 60, abs=2))]
+
+
+# --- Leases ---
+
+@pytest.fixture
+def lease_table(monkeypatch):
+    """In-memory service_leases with the acquire_lease rule."""
+    table = {}
+
+    async def acquire(name, holder, ttl):
+        current = table.get(name)
+        if current is None or current[0] == holder or current[1] < time.monotonic():
+            table[name] = (holder, time.monotonic() + ttl)
+            return True
+        return False
+
+    async def release(name, holder):
+        if table.get(name, (None,))[0] == holder:
+            del table[name]
+
+    monkeypatch.setattr(leases, "acquire_lease", acquire)
+    monkeypatch.setattr(leases, "release_lease", release)
+    return table
+
+
+def test_one_process_holds_a_lease(lease_table):
+    async def run():
+        first, second = Lease("reaper", ttl=0.05), Lease("reaper", ttl=0.05)
+        assert await first.acquire()
+        assert not await second.acquire()
+        # Renewing keeps it
+        assert await first.acquire()
+        assert first.held and not second.held
+        # Once the holder stops renewing, another process takes over
+        await asyncio.sleep(0.06)
+        assert not first.held
+        assert await second.acquire()
+        await second.release()
+        assert await first.acquire()
+
+    asyncio.run(run())
+
+
+def test_lease_keeper_hands_over_polling(lease_table):
+    events = []
+
+    def keeper(name: str) -> LeaseKeeper:
+        async def acquired():
+            events.append(f"{name} started")
+
+        async def lost():
+            events.append(f"{name} stopped")
+
+        return LeaseKeeper(Lease("telegram-polling", ttl=0.03), acquired, lost)
+
+    async def run():
+        first, second = keeper("first"), keeper("second")
+        first.start()
+        await asyncio.sleep(0.005)
+        second.start()
+        await asyncio.sleep(0.05)
+        assert first.leading and not second.leading
+        await first.stop()
+        await asyncio.sleep(0.05)
+        leading = second.leading
+        await second.stop()
+        return leading
+
+    assert asyncio.run(run())
+    assert events == ["first started", "first stopped", "second started", "second stopped"]
+
+
+def test_only_the_lease_holder_reaps(lease_table, monkeypatch):
+    reaps = []
+
+    async def reap(created_before, limit):
+        reaps.append(created_before)
+        return []
+
+    monkeypatch.setattr(pending_reaper, "reap_pending_logs", reap)
+
+    async def run():
+        reapers = [
+            PendingLogReaper(ttl=60, interval=0.01, batch_size=10, lease=Lease("pending-reaper", ttl=1))
+            for _ in range(3)
+        ]
+        for reaper in reapers:
+            reaper.start()
+        await asyncio.sleep(0.05)
+        for reaper in reapers:
+            await reaper.stop()
+        return [reaper.stats() for reaper in reapers]
+
+    stats = asyncio.run(run())
+    assert [s["runs"] > 0 for s in stats] == [True, False, False]
+    assert len(reaps) == stats[0]["runs"]
+
+
+# --- Against a real database ---
+
+def test_writes_are_logged_for_other_processes(database_url):
+    psycopg = pytest.importorskip("psycopg")
+    user_id = f"user-{uuid.uuid4()}"
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        since = conn.execute("SELECT shared_state_changes(NULL, 10)").fetchone()[0]["now"]
+        conn.execute(
+            "INSERT INTO bodyweight (user_id, timestamp, weight_lbs) VALUES (%s, now(), 180)", (user_id,),
+        )
+        conn.execute("UPDATE bodyweight SET user_id = %s WHERE user_id = %s", (f"{user_id}-b", user_id))
+        conn.execute("INSERT INTO users (telegram_id) VALUES (%s)", (user_id,))
+        conn.execute(
+            "INSERT INTO revoked_tokens (token_hash, expires_at) VALUES (%s, now() + interval '1 day')",
+            (user_id,),
+        )
+        changes = conn.execute("SELECT shared_state_changes(%s, 10)", (since,)).fetchone()[0]
+
+    logged = [
+        (row["user_id"], row["table_name"]) for row in changes["invalidations"]
+        if row["user_id"].startswith(user_id)
+    ]
+    assert logged == [
+        (user_id, "bodyweight"),
+        (f"{user_id}-b", "bodyweight"),
+        (user_id, "bodyweight"),
+        (user_id, "users"),
+    ]
+    assert user_id in {row["token_hash"] for row in changes["revocations"]}
+
+
+def test_acquire_lease(database_url):
+    psycopg = pytest.importorskip("psycopg")
+    name = f"lease-{uuid.uuid4()}"
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        def acquire(holder: str, ttl: float) -> bool:
+            return conn.execute("SELECT acquire_lease(%s, %s, %s)", (name, holder, ttl)).fetchone()[0]
+
+        assert acquire("a", 60)
+        assert not acquire("b", 60)
+        assert acquire("a", 0.01)
+        time.sleep(0.02)
+        assert acquire("b", 60)
+        conn.execute("SELECT release_lease(%s, 'a')", (name,))
+        assert not acquire("a", 60)
+        conn.execute("SELECT release_lease(%s, 'b')", (name,))
+        assert acquire("a", 60)
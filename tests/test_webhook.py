@@ -0,0 +1,333 @@
+"""Telegram webhook (/api/log) body handling and the shared Postgres update queue (migration 009)."""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+import httpx
+import pytest
+
+import main
+from routes import telegram
+from services import update_queue as update_queue_module
+from services.update_queue import InMemoryUpdateQueue, PostgresUpdateQueue, QueueFull, update_lane
+
+SECRET = "webhook-secret"
+
+
+@pytest.fixture
+def update_queue(monkeypatch):
+    monkeypatch.setattr(telegram, "TELEGRAM_WEBHOOK_SECRET", SECRET)
+    queue = InMemoryUpdateQueue(maxsize=10)
+    main.app.state.update_queue = queue
+    yield queue
+    main.app.state.update_queue = None
+
+
+def _post(content: bytes) -> httpx.Response:
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/api/log", content=content,
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET, "Content-Type": "application/json"},
+            )
+
+    return asyncio.run(run())
+
+
+def test_update_is_enqueued(update_queue):
+    response = _post(b'{"update_id": 1}')
+    assert response.json() == {"ok": True}
+    assert update_queue.depth() == 1
+
+
+@pytest.mark.parametrize("body", [b"", b"{not json", b"\xff\xfe", b"[1, 2]", b'"text"', b'{"message": {}}'])
+def test_malformed_body_is_rejected(update_queue, body):
+    response = _post(body)
+    assert response.status_code == 400
+    assert update_queue.depth() == 0
+
+
+def _message(update_id: int, user_id: int) -> dict:
+    return {"update_id": update_id, "message": {"message_id": update_id, "from": {"id": user_id}, "text": "hi"}}
+
+
+def test_update_lane():
+    assert update_lane(_message(1, 42)) == "42"
+    assert update_lane({"update_id": 2, "callback_query": {"id": "q", "from": {"id": 42}}}) == "42"
+    assert update_lane({"update_id": 3, "poll_answer": {"user": {"id": 7}}}) == "7"
+    assert update_lane({"update_id": 4, "poll": {"id": "p"}}) == "update:4"
+
+
+@pytest.fixture
+def fake_table(monkeypatch):
+    """In-memory stand-in for the update queue RPCs, with the same lane and lease rules."""
+    rows: List[dict] = []
+    # update_id -> (holder, claimed until, on the monotonic clock)
+    claims = {}
+
+    def held(update_id, holder=None):
+        claim = claims.get(update_id)
+        return claim is not None and claim[1] > time.monotonic() and holder in (None, claim[0])
+
+    async def enqueue(update_id, lane, payload, max_depth):
+        if len(rows) >= max_depth:
+            return False
+        if all(r["update_id"] != update_id for r in rows):
+            rows.append({"update_id": update_id, "lane": lane, "payload": payload})
+        return True
+
+    async def claim(holder, limit, lease_seconds):
+        heads = {}
+        for row in sorted(rows, key=lambda r: r["update_id"]):
+            heads.setdefault(row["lane"], row)
+        free = [r for r in heads.values() if not held(r["update_id"])][:limit]
+        for row in free:
+            claims[row["update_id"]] = (holder, time.monotonic() + lease_seconds)
+        return [r["payload"] for r in free]
+
+    async def renew(holder, update_ids, lease_seconds):
+        renewed = [u for u in update_ids if u in claims and claims[u][0] == holder]
+        for update_id in renewed:
+            claims[update_id] = (holder, time.monotonic() + lease_seconds)
+        return renewed
+
+    async def complete(update_id, holder):
+        if update_id not in claims or claims[update_id][0] != holder:
+            return False
+        rows[:] = [r for r in rows if r["update_id"] != update_id]
+        del claims[update_id]
+        return True
+
+    async def release(holder):
+        for update_id in [u for u, (h, _) in claims.items() if h == holder]:
+            del claims[update_id]
+
+    monkeypatch.setattr(update_queue_module, "enqueue_telegram_update", enqueue)
+    monkeypatch.setattr(update_queue_module, "claim_telegram_updates", claim)
+    monkeypatch.setattr(update_queue_module, "renew_telegram_updates", renew)
+    monkeypatch.setattr(update_queue_module, "complete_telegram_update", complete)
+    monkeypatch.setattr(update_queue_module, "release_telegram_updates", release)
+    return SimpleNamespace(rows=rows, claims=claims)
+
+
+def test_postgres_queue_orders_each_user_across_processes(fake_table):
+    """Two queues stand in for two worker processes draining the same table."""
+
+    async def run():
+        first, second = (PostgresUpdateQueue(maxsize=10, poll_interval=0.01, claim_size=1) for _ in range(2))
+        for update_id, user_id in [(1, 42), (2, 42), (3, 7)]:
+            await first.put(_message(update_id, user_id))
+
+        a = await first.get()
+        b = await second.get()
+        # User 42's second update waits until the first is done
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(second.get(), 0.05)
+        await first.done(a)
+        c = await second.get()
+        return [u["update_id"] for u in (a, b, c)]
+
+    assert asyncio.run(run()) == [1, 3, 2]
+
+
+def test_postgres_queue_full_and_redelivery(fake_table):
+    async def run():
+        queue = PostgresUpdateQueue(maxsize=2)
+        await queue.put(_message(1, 42))
+        # Telegram redelivering an update doesn't add a second copy
+        await queue.put(_message(1, 42))
+        await queue.put(_message(2, 42))
+        with pytest.raises(QueueFull):
+            await queue.put(_message(3, 42))
+
+    asyncio.run(run())
+    assert [r["update_id"] for r in fake_table.rows] == [1, 2]
+
+
+def test_postgres_queue_close_releases_claims(fake_table):
+    async def run():
+        stopping, other = PostgresUpdateQueue(maxsize=10), PostgresUpdateQueue(maxsize=10, poll_interval=0.01)
+        await stopping.put(_message(1, 42))
+        await stopping.get()
+        await stopping.close()
+        return await asyncio.wait_for(other.get(), 1)
+
+    assert asyncio.run(run())["update_id"] == 1
+
+
+def test_postgres_queue_holds_at_most_max_in_flight(fake_table):
+    async def run():
+        queue = PostgresUpdateQueue(maxsize=10, poll_interval=0.01, max_in_flight=2)
+        for update_id in range(1, 5):
+            await queue.put(_message(update_id, update_id))
+        first = await queue.get()
+        await queue.get()
+        # The other two users' updates stay unclaimed for other processes
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(queue.get(), 0.05)
+        assert len(fake_table.claims) == 2
+        await queue.done(first)
+        third = await asyncio.wait_for(queue.get(), 1)
+        await queue.close()
+        return third
+
+    assert asyncio.run(run())["update_id"] == 3
+
+
+def test_postgres_queue_renews_claims_while_processing(fake_table):
+    async def run():
+        busy = PostgresUpdateQueue(maxsize=10, lease_seconds=0.06)
+        other = PostgresUpdateQueue(maxsize=10, poll_interval=0.01)
+        await busy.put(_message(1, 42))
+        update = await busy.get()
+        # Processing outlasts the lease several times over; the renewed
+        # claim keeps another process from running the update as well
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(other.get(), 0.3)
+        await busy.done(update)
+        await busy.close()
+
+    asyncio.run(run())
+    assert fake_table.rows == []
+
+
+def test_postgres_queue_done_after_losing_the_claim(fake_table, caplog):
+    async def run():
+        stalled, other = PostgresUpdateQueue(maxsize=10), PostgresUpdateQueue(maxsize=10, poll_interval=0.01)
+        await stalled.put(_message(1, 42))
+        update = await stalled.get()
+        # The claim expires without being renewed and another process takes it
+        fake_table.claims[1] = ("gone", 0.0)
+        retry = await asyncio.wait_for(other.get(), 1)
+        await stalled.done(update)
+        # The late acknowledgement leaves the other process's row alone
+        assert [r["update_id"] for r in fake_table.rows] == [1]
+        await other.done(retry)
+
+    with caplog.at_level(logging.WARNING, logger="nutriclaude.update_queue"):
+        asyncio.run(run())
+    assert fake_table.rows == []
+    assert "Update 1 was processed after its claim passed to another process" in caplog.text
+
+
+def test_idle_postgres_queue_backs_off(fake_table, monkeypatch):
+    claim = update_queue_module.claim_telegram_updates
+    polls: List[float] = []
+
+    async def counting_claim(holder, limit, lease_seconds):
+        polls.append(time.monotonic())
+        return await claim(holder, limit, lease_seconds)
+
+    monkeypatch.setattr(update_queue_module, "claim_telegram_updates", counting_claim)
+
+    async def run():
+        queue = PostgresUpdateQueue(maxsize=10, poll_interval=0.01, max_poll_interval=0.08)
+        waiting = asyncio.create_task(queue.get())
+        await asyncio.sleep(0.3)
+        idle_polls = len(polls)
+        # A put in the same process still wakes the poller at once
+        started = time.monotonic()
+        await queue.put(_message(1, 42))
+        update = await asyncio.wait_for(waiting, 1)
+        return idle_polls, time.monotonic() - started, update
+
+    idle_polls, latency, update = asyncio.run(run())
+    # 0.01 + 0.02 + 0.04 + 0.08 + ... rather than 30 polls at a fixed 0.01
+    assert idle_polls <= 7
+    assert latency < 0.05 and update["update_id"] == 1
+
+
+# --- Against a real database ---
+
+def _enqueue(conn, update_id: int, lane: str) -> None:
+    conn.execute(
+        "SELECT enqueue_telegram_update(%s, %s, %s, 1000)",
+        (update_id, lane, json.dumps({"update_id": update_id})),
+    )
+
+
+def _claim(conn, holder: str, limit: int = 10) -> List[int]:
+    rows = conn.execute("SELECT * FROM claim_telegram_updates(%s, %s, 60)", (holder, limit)).fetchall()
+    return sorted(r[0]["update_id"] for r in rows)
+
+
+def test_claim_hands_out_lane_heads_once(database_url):
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute("DELETE FROM telegram_updates")
+        for update_id, lane in [(1, "a"), (2, "a"), (3, "b"), (4, "c")]:
+            _enqueue(conn, update_id, lane)
+
+        with psycopg.connect(database_url) as other:
+            # A concurrent claim holding lane b's head until it commits
+            assert _claim(other, "p2", limit=1) == [3]
+            assert _claim(conn, "p1") == [1, 4]
+            other.commit()
+
+        # Heads are all claimed; lane a's next update waits for its head
+        assert _claim(conn, "p3") == []
+        conn.execute("DELETE FROM telegram_updates WHERE update_id = 1")
+        assert _claim(conn, "p3") == [2]
+
+        # A stopping process hands its claims back
+        conn.execute("SELECT release_telegram_updates('p2')")
+        assert _claim(conn, "p3") == [3]
+
+
+def test_only_the_holder_renews_and_completes(database_url):
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute("DELETE FROM telegram_updates")
+        _enqueue(conn, 1, "a")
+        _enqueue(conn, 2, "b")
+        assert _claim(conn, "p1") == [1, 2]
+
+        renewed = conn.execute("SELECT * FROM renew_telegram_updates('p1', ARRAY[1, 2, 3]::BIGINT[], 60)").fetchall()
+        assert sorted(r[0] for r in renewed) == [1, 2]
+        assert conn.execute("SELECT * FROM renew_telegram_updates('p2', ARRAY[1]::BIGINT[], 60)").fetchall() == []
+
+        assert conn.execute("SELECT complete_telegram_update(1, 'p2')").fetchone()[0] is False
+        assert conn.execute("SELECT complete_telegram_update(1, 'p1')").fetchone()[0] is True
+        remaining = conn.execute("SELECT update_id FROM telegram_updates").fetchall()
+        assert [r[0] for r in remaining] == [2]
+
+
+def test_concurrent_claims_never_share_an_update(database_url):
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        conn.execute("DELETE FROM telegram_updates")
+        for update_id in range(1, 201):
+            _enqueue(conn, update_id, f"user-{update_id % 20}")
+
+    claimed: List[int] = []
+    lock = threading.Lock()
+
+    def worker(holder: str) -> None:
+        with psycopg.connect(database_url, autocommit=True) as conn:
+            while True:
+                ids = _claim(conn, holder, limit=3)
+                if not ids and conn.execute("SELECT count(*) FROM telegram_updates").fetchone()[0] == 0:
+                    return
+                with lock:
+                    claimed.extend(ids)
+                for update_id in ids:
+                    conn.execute("DELETE FROM telegram_updates WHERE update_id = %s", (update_id,))
+
+    threads = [threading.Thread(target=worker, args=(f"p{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert sorted(claimed) == list(range(1, 201))
+    # Within each lane, updates were claimed in update_id order
+    for lane in range(20):
+        ids = [u for u in claimed if u % 20 == lane]
+        assert ids == sorted(ids)